@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from textureManager import decode_image, texture_manager
+
+
+def print_asset_progress(done, total, label):
+    print(f"Assets {done}/{total}: {label}")
+
+
+class AssetLoader:
+    """Background asset pipeline.
+
+    OBJ/MTL parsing (Model.prepare) and PNG decoding run on a thread pool; Pillow and the NumPy
+    parser release the GIL for the heavy parts. Finished CPU payloads are queued and turned into
+    GL objects by `process_uploads`, which the render thread calls once per frame with a time budget.
+    """
+
+    def __init__(self, max_workers=None, upload_budget_ms=4.0, on_progress=print_asset_progress,
+                 textures=texture_manager, decoder=decode_image):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1))
+        self.upload_budget_ms = upload_budget_ms
+        self.on_progress = on_progress
+        self.textures = textures
+        self.decoder = decoder
+        self.ready = queue.Queue()  # (label, GL-thread callable)
+        self.lock = threading.Lock()
+        self.total = 0
+        self.done = 0
+        self.errors = []
+
+    @property
+    def pending(self):
+        return self.done < self.total
+
+    def _task(self, label, work, finish, failed=None):
+        """Run `work` on the pool, then queue `finish(result)` (or `failed()`) for the GL thread."""
+        def done(future):
+            error = future.exception()
+            if error is None:
+                self.ready.put((label, lambda: finish(future.result())))
+                return
+
+            def report():
+                if failed:
+                    failed()
+                raise error
+            self.ready.put((label, report))
+        self.pool.submit(work).add_done_callback(done)
+
+    def load_model(self, model, path, on_loaded=None):
+        """Prepare `model` from `path` in the background; textures and buffers are uploaded as they arrive."""
+        with self.lock:
+            self.total += 1
+
+        def prepare():
+            payload = model.prepare(path)
+            if payload is None:
+                raise RuntimeError(f"Error loading model {path}")
+            return payload
+
+        def prepared(payload):
+            paths = sorted({p for p in payload.texture_paths
+                            if p and not self.textures.contains(p)})
+            preloaded = {}  # path -> id, filled on the GL thread
+            remaining = [len(paths)]
+
+            def upload_model():
+                try:
+                    # failed textures are passed as 0 so the model does not decode them again
+                    model.upload(payload, {p: preloaded.get(p, 0) for p in paths})
+                finally:
+                    # drop the pipeline's own references, the meshes hold theirs now
+                    for tex in preloaded.values():
+                        self.textures.release(tex)
+                if on_loaded:
+                    on_loaded(model)
+
+            def texture_settled():
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self.ready.put((path, upload_model))
+
+            def texture_done(item):
+                p, image = item
+                try:
+                    preloaded[p] = self.textures.acquire(p, image=image)
+                finally:
+                    texture_settled()
+
+            with self.lock:
+                self.total += len(paths) + 1
+            for p in paths:
+                self._task(p, lambda p=p: (p, self.decoder(p)), texture_done, texture_settled)
+            if not paths:
+                self.ready.put((path, upload_model))
+
+        self._task(path, prepare, prepared)
+
+    def process_uploads(self, budget_ms=None):
+        """Run queued GL work until the frame budget is spent (at least one item per call)."""
+        budget = self.upload_budget_ms if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget / 1000.0
+        while True:
+            try:
+                label, finish = self.ready.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                finish()
+            except Exception as e:
+                self.errors.append(f"{label}: {e}")
+                print(f"Error: asset {label}: {e}")
+            with self.lock:
+                self.done += 1
+            if self.on_progress:
+                self.on_progress(self.done, self.total, label)
+            if time.perf_counter() >= deadline:
+                return
+
+    def wait(self, timeout=None):
+        """Block until every submitted asset is uploaded (headless use); False on timeout."""
+        end = None if timeout is None else time.perf_counter() + timeout
+        while self.pending:
+            self.process_uploads(budget_ms=float('inf'))
+            if end is not None and time.perf_counter() > end:
+                return False
+            time.sleep(0.001)
+        return True
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,560 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import meshCache
+import textureBaker
+from meshOptimizer import optimize_mesh
+from meshSimplifier import simplify_lods
+from bvh import BVH, closest_points_on_triangles
+from chunkStreaming import ChunkSource, ChunkStreamer
+from constants import loopSettings, lodSettings, streamingSettings
+from frameLoop import FixedTimestep, FramePacer, PacingStats
+from instancing import INSTANCE_STRIDE, changed_ranges, grid_transforms, normal_matrices, pack_instances
+from model import SEPARATE_VERTEX_BYTES, VERTEX_FORMATS, build_vertex_array
+from objLoader import STREAM_MEMORY_BUDGET, Loader, ObjRecords, parse_obj_block, parse_obj_parallel
+
+
+def write_synthetic_obj(path, faces, groups=8):
+    """Write a triangulated height-field grid with v/vt/vn faces split into `groups` usemtl sections."""
+    side = int(np.ceil(np.sqrt(faces / 2.0))) + 1
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, side), np.linspace(0.0, 1.0, side))
+    u, v = u.ravel(), v.ravel()
+    h = 0.1 * np.sin(u * 12.0) * np.cos(v * 9.0)
+    quad = np.arange(side * side).reshape(side, side)[:-1, :-1].ravel()
+    # both triangles of a quad next to each other, quads row by row: each group is a connected band of rows
+    tris = np.stack((np.stack((quad, quad + 1, quad + side + 1), axis=1),
+                     np.stack((quad, quad + side + 1, quad + side), axis=1)), axis=1).reshape(-1, 3)[:faces] + 1
+    with open(path, 'w') as f:
+        f.write("# synthetic benchmark mesh\n")
+        np.savetxt(f, np.stack((u, h, v), axis=1), fmt='v %.6f %.6f %.6f')
+        np.savetxt(f, np.stack((u, v), axis=1), fmt='vt %.6f %.6f')
+        np.savetxt(f, np.tile([0.0, 1.0, 0.0], (len(u), 1)), fmt='vn %.4f %.4f %.4f')
+        for g, chunk in enumerate(np.array_split(tris, groups)):
+            f.write(f"o group_{g}\nusemtl mat_{g % 3}\n")
+            np.savetxt(f, np.repeat(chunk, 3, axis=1), fmt='f %d/%d/%d %d/%d/%d %d/%d/%d')
+
+
+def _timed_load(path, vectorized):
+    loader = Loader()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = loader.load_numpy(path) if vectorized else loader.load(path)
+    return ok, time.perf_counter() - start, loader
+
+
+def bench_loader(sizes, max_legacy_faces):
+    with tempfile.TemporaryDirectory() as tmp:
+        for faces in sizes:
+            path = os.path.join(tmp, f"synthetic_{faces}.obj")
+            write_synthetic_obj(path, faces)
+            size_mb = os.path.getsize(path) / 2**20
+            _, t_np, loader = _timed_load(path, True)
+            tris = sum(len(m.indices) for m in loader.meshes) // 3
+            line = f"{faces:>10} faces ({size_mb:8.1f} MB, {tris} tris) | numpy {t_np:8.2f}s"
+            if faces <= max_legacy_faces:
+                _, t_py, _ = _timed_load(path, False)
+                line += f" | legacy {t_py:8.2f}s | speed-up x{t_py / t_np:.1f}"
+            else:
+                line += " | legacy skipped"
+            print(line)
+
+
+def _triangle_soup(positions, normals, texcoords, indices):
+    corners = np.hstack((positions[indices], normals[indices], texcoords[indices]))
+    return np.unique(corners.reshape(-1, 3 * corners.shape[1]), axis=0)
+
+
+def bench_meshopt(path):
+    loader = Loader()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.load_numpy(path)
+    for mesh in loader.meshes:
+        arrays = mesh.as_arrays()
+        start = time.perf_counter()
+        *optimized, stats = optimize_mesh(*arrays)
+        elapsed = time.perf_counter() - start
+        same = np.array_equal(_triangle_soup(*arrays), _triangle_soup(*optimized))
+        print(f"{mesh.name:>20} | {stats} | {elapsed:6.2f}s | geometry {'ok' if same else 'CHANGED'}")
+
+
+def _cpu_load_model(path, options):
+    """CPU side of Model.load_model (no GL): cache lookup, parse on miss, collider, cache write."""
+    cached = meshCache.load(path, options)
+    if cached:
+        return cached.meshes
+    loader = Loader(optimize_meshes=options['optimize_meshes'], lod_ratios=options['lod_ratios'])
+    loader.load_numpy(path)
+    coords = np.concatenate([m.as_arrays()[0] for m in loader.meshes])
+    meshCache.save(path, loader.meshes, loader.materials, loader.mtl_paths,
+                   coords.min(axis=0), coords.max(axis=0), options)
+    return loader.meshes
+
+
+def bench_startup(path, runs):
+    options = {'numpy_loader': True, 'optimize_meshes': True, 'lod_ratios': list(lodSettings.ratios)}
+    if os.path.exists(meshCache.cache_path(path)):
+        os.remove(meshCache.cache_path(path))
+    timings = []
+    for run in range(runs + 1):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            meshes = _cpu_load_model(path, options)
+            # read every byte the upload would read
+            arrays = [a for m in meshes for a in m.as_arrays()]
+            checksum = sum(float(np.sum(a, dtype=np.float64)) for a in arrays)
+            nbytes = sum(a.nbytes for a in arrays)
+        timings.append(time.perf_counter() - start)
+    warm = sorted(timings[1:])
+    print(f"{path}: {len(meshes)} meshes, {nbytes / 2**20:.1f} MB of vertex/index data")
+    print(f"cold (parse + optimize + write cache): {timings[0]:8.3f}s")
+    print(f"warm (memory-mapped cache), median of {runs}: {warm[len(warm) // 2]:8.3f}s")
+
+
+def bench_vertex_layout(path):
+    """Bytes per layout, and a check that the interleaved fields decode to the separate-buffer data."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader = Loader(optimize_meshes=True)
+        loader.load_numpy(path)
+    arrays = [m.as_arrays() for m in loader.meshes]
+    count = sum(len(a[0]) for a in arrays)
+    print(f"{path}: {count} vertices")
+    print(f"{'separate vec4/vec4/vec2':>24}: {SEPARATE_VERTEX_BYTES:3d} B/vertex, "
+          f"{count * SEPARATE_VERTEX_BYTES / 2**20:8.2f} MB")
+    for name, layout in VERTEX_FORMATS.items():
+        worst = 0.0
+        for positions, normals, texcoords, _ in arrays:
+            data = build_vertex_array(positions, normals, texcoords, name).view(np.uint8)
+            data = data.reshape(len(positions), layout.itemsize)
+            for field, reference in (('position', positions), ('normal', normals), ('texcoord', texcoords)):
+                dtype, offset = layout.fields[field]
+                raw = np.ascontiguousarray(data[:, offset:offset + dtype.itemsize]).view(dtype.base)
+                if dtype.base == np.uint32:
+                    words = raw.astype(np.int64).reshape(-1, 1) >> np.array([0, 10, 20])
+                    q = words & 0x3FF
+                    decoded = np.where(q >= 512, q - 1024, q) / 511.0
+                    length = np.linalg.norm(reference, axis=1, keepdims=True)
+                    reference = np.divide(reference, length, out=np.zeros_like(reference), where=length > 0)
+                else:
+                    decoded = raw.reshape(reference.shape).astype(np.float64)
+                worst = max(worst, float(np.abs(decoded - reference).max(initial=0.0)))
+        print(f"{name:>24}: {layout.itemsize:3d} B/vertex, {count * layout.itemsize / 2**20:8.2f} MB, "
+              f"max attribute error {worst:.2e}")
+
+
+def bench_textures(paths, filter):
+    print(f"{'texture':>48} | {'format':>6} | {'decode':>8} | {'uploaded':>9} | {'VRAM':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for src in paths:
+            start = time.perf_counter()
+            with Image.open(src) as im:
+                rgba = np.asarray(im.convert('RGBA'), dtype=np.uint8)
+            t_png = time.perf_counter() - start
+            name = os.path.basename(src)
+            print(f"{name:>48} | {'png':>6} | {t_png * 1000:6.1f}ms | {rgba.nbytes / 2**20:7.2f}MB"
+                  f" | {rgba.nbytes * 4 / 3 / 2**20:7.2f}MB")
+            for compressed in (False, True):
+                dst = textureBaker.bake(src, os.path.join(tmp, name + '.mtex'), filter=filter,
+                                        compressed=compressed)
+                start = time.perf_counter()
+                baked = textureBaker.open_baked(dst)
+                # the upload reads every level once
+                checksum = sum(int(level.data[::4096].sum()) for level in baked.levels)
+                t_baked = time.perf_counter() - start
+                print(f"{'':>48} | {baked.format:>6} | {t_baked * 1000:6.1f}ms | {baked.nbytes / 2**20:7.2f}MB"
+                      f" | {baked.nbytes / 2**20:7.2f}MB")
+
+
+def _grid_triangles(faces, seed=0):
+    """Triangle corners (T, 3, 3) of a wavy height-field grid 20 units across."""
+    side = int(np.ceil(np.sqrt(faces / 2.0))) + 1
+    u, v = np.meshgrid(np.linspace(-10.0, 10.0, side), np.linspace(-10.0, 10.0, side))
+    points = np.stack((u.ravel(), np.sin(u.ravel()) * np.cos(v.ravel()), v.ravel()), axis=1)
+    quad = np.arange(side * side).reshape(side, side)[:-1, :-1].ravel()
+    tris = np.concatenate((np.stack((quad, quad + 1, quad + side + 1), axis=1),
+                           np.stack((quad, quad + side + 1, quad + side), axis=1)))[:faces]
+    return points[tris].astype(np.float32)
+
+
+def _rate(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(*q)
+    return len(queries) / (time.perf_counter() - start)
+
+
+def bench_bvh(sizes, queries, brute_force_faces):
+    rng = np.random.default_rng(0)
+    for faces in sizes:
+        triangles = _grid_triangles(faces)
+        start = time.perf_counter()
+        bvh = BVH.build(triangles)
+        t_build = time.perf_counter() - start
+        centers = np.column_stack((rng.uniform(-10, 10, queries), rng.uniform(-1.5, 1.5, queries),
+                                   rng.uniform(-10, 10, queries)))
+        radii = rng.uniform(0.05, 0.5, queries)
+        moves = rng.normal(0.0, 0.5, (queries, 3))
+        directions = rng.normal(0.0, 1.0, (queries, 3))
+        spheres = _rate(bvh.sphere_contacts, list(zip(centers, radii)))
+        sweeps = _rate(bvh.sweep_sphere, list(zip(centers, radii, moves)))
+        rays = _rate(bvh.raycast, list(zip(centers + [0.0, 3.0, 0.0], directions)))
+        line = (f"{len(triangles):>10} tris | build {t_build:6.2f}s | {len(bvh.node_child):>8} nodes"
+                f" | sphere {spheres:7.0f}/s | sweep {sweeps:7.0f}/s | ray {rays:7.0f}/s")
+        if faces <= brute_force_faces:
+            t = triangles.astype(np.float64)
+            same = all(set(bvh.order[bvh.sphere_contacts(c, r)[0]]) ==
+                       set(np.flatnonzero(np.linalg.norm(closest_points_on_triangles(c, t[:, 0], t[:, 1], t[:, 2])
+                                                         - c, axis=1) <= r))
+                       for c, r in zip(centers[:50], radii[:50]))
+            line += f" | brute force {'ok' if same else 'MISMATCH'}"
+        print(line)
+
+
+def _best_of(fn, runs=5):
+    best = np.inf
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_instancing(counts, meshes, moving):
+    """CPU cost and upload bytes per frame of the instance buffer vs one uniform + draw per copy."""
+    rng = np.random.default_rng(0)
+    print(f"{'instances':>9} | {'pack':>8} | {'moved':>14} | {'upload':>10} | {'draw calls':>10}"
+          f" | {'per-copy uniforms':>17} | normal matrix error")
+    for n in counts:
+        side = int(np.ceil(np.sqrt(n)))
+        transforms = grid_transforms(side, side, 8.0)[:n]
+        # random rotation and non-uniform scale per instance
+        angle = rng.uniform(0, 2 * np.pi, n)
+        scale = rng.uniform(0.5, 2.0, (n, 3))
+        transforms[:, 0, 0], transforms[:, 0, 2] = np.cos(angle) * scale[:, 0], np.sin(angle) * scale[:, 2]
+        transforms[:, 2, 0], transforms[:, 2, 2] = -np.sin(angle) * scale[:, 0], np.cos(angle) * scale[:, 2]
+        transforms[:, 1, 1] = scale[:, 1]
+        t_pack = _best_of(lambda: pack_instances(transforms))
+        data = pack_instances(transforms)
+
+        # a few instances move: only their rows are re-uploaded
+        moved = transforms.copy()
+        movers = rng.choice(n, max(1, int(n * moving)), replace=False)
+        moved[movers, 0, 3] += 1.0
+        ranges = []
+        def frame():
+            ranges[:] = changed_ranges(data, pack_instances(moved))
+        t_moved = _best_of(frame)
+        upload = sum(stop - start for start, stop in ranges) * INSTANCE_STRIDE
+
+        # former path: one model uniform (64 B) and one multi-draw per copy, normals inverted per vertex
+        t_uniforms = _best_of(lambda: [np.ascontiguousarray(m.T) for m in transforms])
+        reference = np.linalg.inv(transforms[:, :3, :3].astype(np.float64)).transpose(0, 2, 1)
+        error = np.abs(normal_matrices(transforms) - reference).max()
+        print(f"{n:>9} | {t_pack * 1000:6.2f}ms | {t_moved * 1000:6.2f}ms {len(ranges):>3} rng"
+              f" | {upload / 1024:7.1f}KB | {meshes:>10} | {t_uniforms * 1000:7.2f}ms {n * meshes:>7} calls"
+              f" | {error:.1e}")
+    print(f"full upload is {INSTANCE_STRIDE} B per instance; unchanged frames upload nothing")
+
+
+def _seam_grid(faces):
+    """Welded wavy grid whose right half is a separate UV island (a seam down the middle)."""
+    side = int(np.ceil(np.sqrt(faces / 2.0))) + 1
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, side), np.linspace(0.0, 1.0, side))
+    u, v = u.ravel(), v.ravel()
+    points = np.stack((u * 10.0, np.sin(u * 6.0) * np.cos(v * 5.0), v * 10.0), axis=1)
+    quad = np.arange(side * side).reshape(side, side)[:-1, :-1].ravel()
+    tris = np.concatenate((np.stack((quad, quad + side + 1, quad + 1), axis=1),
+                           np.stack((quad, quad + side, quad + side + 1), axis=1)))
+    corners = tris.ravel()
+    texcoords = np.stack((u, v), axis=1)[corners]
+    texcoords[np.repeat(points[tris].mean(axis=1)[:, 0] > 5.0, 3), 0] += 2.0
+    normals = np.tile([0.0, 1.0, 0.0], (len(corners), 1))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return optimize_mesh(points[corners].astype(np.float32), normals.astype(np.float32),
+                             texcoords.astype(np.float32), np.arange(len(corners)))[:4]
+
+
+def bench_lod(sizes, ratios, samples):
+    """Simplification time, triangle counts against their targets and distance to the original."""
+    rng = np.random.default_rng(0)
+    for faces in sizes:
+        positions, normals, texcoords, indices = _seam_grid(faces)
+        count = len(indices) // 3
+        start = time.perf_counter()
+        levels, errors = simplify_lods(positions, normals, texcoords, indices, ratios)
+        print(f"{count:>9} tris | simplified in {time.perf_counter() - start:6.2f}s")
+        points = positions[rng.choice(np.unique(indices), min(samples, len(positions)), replace=False)]
+        for ratio, level, error in zip(ratios, levels, errors):
+            tris = level.reshape(-1, 3)
+            # seam kept: no triangle mixes the two UV islands; border kept: same projected area
+            islands = texcoords[tris][:, :, 0] > 1.5
+            seams = 'ok' if not np.any(islands.any(axis=1) & ~islands.all(axis=1)) else 'BROKEN'
+            corners = positions[tris].astype(np.float64)
+            area = np.abs(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])[:, 1]).sum() / 2
+            bvh = BVH.build(corners)
+            # original vertices to the simplified surface
+            distance = max(min(bvh.sphere_contacts(p, 10.0 * error + 1e-3)[2], default=np.inf) for p in points)
+            print(f"{'':>9}   ratio {ratio:5.3f}: {len(tris):>8} tris (target {max(1, int(count * ratio)):>8})"
+                  f" | error {error:.4f} | measured {distance:.4f} | seam {seams}"
+                  f" | border {'ok' if abs(area - 100.0) < 1e-3 else 'MOVED'}")
+
+        # the same grid as two materials split along the seam: both sides must keep identical edges
+        tris = indices.reshape(-1, 3)
+        right = texcoords[tris][:, 0, 0] > 1.5
+        sides = [simplify_lods(positions, normals, texcoords, tris[mask].ravel(), ratios)[0]
+                 for mask in (~right, right)]
+        for ratio, left_level, right_level in zip(ratios, *sides):
+            edge = [set(map(tuple, positions[level][np.isclose(positions[level][:, 0], 5.0)].tolist()))
+                    for level in (left_level, right_level)]
+            print(f"{'':>9}   ratio {ratio:5.3f}, split at the seam: {len(left_level) // 3 + len(right_level) // 3:>8}"
+                  f" tris | material edge {'ok' if edge[0] == edge[1] else 'CRACKED'}")
+
+
+def bench_pacing(frames, target_ms, work_ms, spin_values):
+    """Frame-interval jitter of the pacer under a random CPU load, for several spin margins (0 = sleep only)."""
+    rng = np.random.default_rng(0)
+    work = rng.uniform(work_ms[0], work_ms[1], frames) / 1000.0
+    for spin_ms in spin_values:
+        pacer = FramePacer(target_ms, spin_ms)
+        pacing = PacingStats(window=frames)
+        timestep = FixedTimestep(1.0 / loopSettings.simulation_hz, loopSettings.max_steps)
+        simulated = 0.0
+        for seconds in work:
+            pacer.wait()
+            simulated += timestep.advance(pacing.tick()) * timestep.step
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                pass
+        s = pacing.stats()
+        real = sum(pacing.intervals)
+        print(f"spin {spin_ms:4.1f} ms | frame {s['mean']:6.3f} ms (target {target_ms:.3f}) | jitter {s['jitter']:6.3f} ms"
+              f" | p99 {s['p99']:6.3f} ms | late {pacer.late:>4} | simulated {simulated:.3f}s of {real:.3f}s")
+
+
+def _peak_rss_mb():
+    # ru_maxrss survives exec, so a spawned child would report the parent's peak; VmHWM does not
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load_in_child(path, budget):
+    """Run in a fresh process: (ok, seconds, baseline MB, peak RSS MB, triangles, digest of the meshes)."""
+    baseline = _peak_rss_mb()
+    digest = hashlib.sha1()
+    triangles = 0
+
+    def consume(mesh):
+        nonlocal triangles
+        digest.update(mesh.name.encode() + (mesh.materials.name.encode() if mesh.materials else b'-'))
+        for array in mesh.as_arrays():
+            digest.update(np.ascontiguousarray(array).data)
+        triangles += len(mesh.indices) // 3
+
+    loader = Loader(progress=lambda progress: None)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if budget is None:
+            ok = loader.load_numpy(path)
+            for mesh in loader.meshes:
+                consume(mesh)
+        else:
+            ok = loader.load_streaming(path, consume, memory_budget=budget)
+    seconds = time.perf_counter() - start
+    peak = _peak_rss_mb()
+    return ok, seconds, baseline, peak, triangles, digest.hexdigest()
+
+
+def bench_streaming(faces, budgets):
+    """Peak RSS of load_numpy vs the out-of-core loader, each in its own process, and whether the meshes match."""
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"synthetic_{faces}.obj")
+        write_synthetic_obj(path, faces)
+        print(f"{faces} faces, {os.path.getsize(path) / 2**20:.1f} MB")
+        reference = None
+        for budget in [None] + budgets:
+            with context.Pool(1) as pool:
+                ok, seconds, baseline, peak, tris, digest = pool.apply(_load_in_child, (path, budget))
+            reference = reference or digest
+            name = "load_numpy" if budget is None else f"stream {budget / 2**20:g} MB"
+            print(f"{name:>18} | {seconds:7.2f}s | peak RSS {peak:8.1f} MB (+{peak - baseline:7.1f} over imports)"
+                  f" | {tris} tris | {'ok' if ok and digest == reference else 'MISMATCH'}")
+
+
+def _same_records(a, b):
+    return all(a.events == b.events if name == 'events' else
+               getattr(a, name).dtype == getattr(b, name).dtype and np.array_equal(getattr(a, name), getattr(b, name))
+               for name in ObjRecords.__dataclass_fields__)
+
+
+def bench_parallel(faces, worker_counts):
+    """Serial vs multi-process OBJ parsing: parse time per worker count, identical records and meshes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"synthetic_{faces}.obj")
+        write_synthetic_obj(path, faces)
+        print(f"{faces} faces, {os.path.getsize(path) / 2**20:.1f} MB, {os.cpu_count()} CPUs")
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            reference = parse_obj_block(f.read())
+        serial = time.perf_counter() - start
+        print(f"{'serial':>10} | parse {serial:7.2f}s")
+        for workers in worker_counts:
+            start = time.perf_counter()
+            rec = parse_obj_parallel(path, workers)
+            seconds = time.perf_counter() - start
+            print(f"{workers:>7} pr | parse {seconds:7.2f}s | speed-up x{serial / seconds:4.2f}"
+                  f" | {'identical' if _same_records(reference, rec) else 'MISMATCH'}")
+        del reference, rec
+        _, t_serial, serial_loader = _timed_load(path, True)
+        loader = Loader()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loader.load_numpy(path, max(worker_counts))
+        t_parallel = time.perf_counter() - start
+        same = len(loader.meshes) == len(serial_loader.meshes) and all(
+            a.name == b.name and all(np.array_equal(x, y) for x, y in zip(a.as_arrays(), b.as_arrays()))
+            for a, b in zip(serial_loader.meshes, loader.meshes))
+        print(f"load_numpy end to end: serial {t_serial:.2f}s | {max(worker_counts)} processes {t_parallel:.2f}s"
+              f" | meshes {'identical' if same else 'MISMATCH'}")
+
+
+class _NullChunkUploader:
+    """Stands in for GLChunkUploader: payloads are built for real, nothing reaches a GPU."""
+
+    def upload(self, chunk, payload):
+        return payload.nbytes
+
+    def delete(self, handle):
+        pass
+
+
+def bench_chunks(faces, extent, frames, speed, budget_mb):
+    """Chunk residency along a scripted walk: resident bytes, loads/evictions and stalls per setting."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"synthetic_{faces}.obj")
+        write_synthetic_obj(path, faces)
+        _, _, loader = _timed_load(path, True)
+    for mesh in loader.meshes:
+        mesh.positions = mesh.positions * np.float32([extent, 1.0, extent])
+    start = time.perf_counter()
+    source = ChunkSource(loader.meshes, streamingSettings.cell_size)
+    print(f"{faces} faces over {extent:g} x {extent:g} units: {len(source)} chunks,"
+          f" {source.nbytes.sum() / 2**20:.1f} MB, partitioned in {time.perf_counter() - start:.2f}s")
+    # a walk across the scene, turning back half way, then stepping back and forth every half second
+    t = np.arange(frames) / 60.0
+    heading = np.where(t < t[-1] / 2, 1.0, -1.0)[:, None] * np.array([1.0, 0.0, 0.6])
+    dither = np.arange(frames - int(frames * 0.8)) // 30 % 2
+    heading[int(frames * 0.8):] *= np.where(dither, 1.0, -1.0)[:, None]
+    velocity = heading / np.linalg.norm(heading[0]) * speed
+    positions = extent * 0.1 + np.cumsum(velocity, axis=0) / 60.0
+    s = streamingSettings
+    for name, look_ahead, evict_radius in (("no look-ahead", 0.0, s.evict_radius),
+                                           ("no hysteresis", s.look_ahead_s, s.load_radius),
+                                           ("default", s.look_ahead_s, s.evict_radius)):
+        streamer = ChunkStreamer(int(budget_mb * 2**20), s.load_radius, evict_radius, look_ahead,
+                                 uploader=_NullChunkUploader(), max_in_flight=s.max_in_flight)
+        with contextlib.redirect_stdout(io.StringIO()):
+            streamer.open(source)
+        pacer = FramePacer(1000.0 / 60.0)
+        for position, v in zip(positions, velocity):
+            pacer.wait()
+            streamer.update(position, v)
+        streamer.shutdown()
+        r = streamer.stats()
+        print(f"{name:>14} | resident {r['resident_mb']:6.1f} MB (peak {r['peak_resident_mb']:6.1f} of {budget_mb:g})"
+              f" | loads {r['loads']:>4} | evictions {r['evictions']:>4} | dropped {r['dropped']:>3}"
+              f" | stall frames {r['stall_frames']:>4}"
+              f" | stall p50 {r['stall_ms_p50']:6.1f} ms p99 {r['stall_ms_p99']:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loader/renderer benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('loader', help="legacy vs numpy OBJ parsing on synthetic files")
+    p.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    p.add_argument('--max-legacy-faces', type=int, default=1_000_000,
+                   help="skip the per-line loader above this face count")
+    p = sub.add_parser('meshopt', help="vertex welding / cache reordering stats for an OBJ")
+    p.add_argument('path', nargs='?', default='models/piano.obj')
+    p = sub.add_parser('startup', help="cold vs warm model load through the mesh cache")
+    p.add_argument('path', nargs='?', default='models/piano.obj')
+    p.add_argument('--runs', type=int, default=5)
+    p = sub.add_parser('layout', help="vertex buffer bytes per layout and attribute equivalence")
+    p.add_argument('path', nargs='?', default='models/piano.obj')
+    p = sub.add_parser('textures', help="PNG decode vs baked .mtex load time and bytes uploaded")
+    p.add_argument('paths', nargs='*', default=sorted(glob.glob('textures/bench/*.png')))
+    p.add_argument('--filter', default='box', choices=['box', 'kaiser'])
+    p = sub.add_parser('bvh', help="BVH build time and sphere/sweep/ray queries per second")
+    p.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 2_000_000])
+    p.add_argument('--queries', type=int, default=500)
+    p.add_argument('--brute-force-faces', type=int, default=100_000,
+                   help="check sphere queries against all triangles up to this face count")
+    p = sub.add_parser('instancing', help="instance buffer packing, changed-range uploads and draw calls")
+    p.add_argument('--counts', type=int, nargs='+', default=[1, 10, 100, 1000, 10_000])
+    p.add_argument('--meshes', type=int, default=1, help="meshes per copy of the model (one instanced call each)")
+    p.add_argument('--moving', type=float, default=0.01, help="fraction of instances moved per frame")
+    p = sub.add_parser('lod', help="QEM simplification: time, triangle counts, error and seam/border checks")
+    p.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    p.add_argument('--ratios', type=float, nargs='+', default=list(lodSettings.ratios))
+    p.add_argument('--samples', type=int, default=2000, help="original vertices measured against each level")
+    p = sub.add_parser('pacing', help="frame pacing jitter: sleep-only vs sleep/spin under a random CPU load")
+    p.add_argument('--frames', type=int, default=600)
+    p.add_argument('--target-ms', type=float, default=loopSettings.target_ms)
+    p.add_argument('--work-ms', type=float, nargs=2, default=[2.0, 12.0], help="per-frame busy time range")
+    p.add_argument('--spin-ms', type=float, nargs='+', default=[0.0, loopSettings.spin_ms])
+    p = sub.add_parser('stream', help="peak memory of load_numpy vs the streaming loader on a large synthetic OBJ")
+    p.add_argument('--faces', type=int, default=10_000_000)
+    p.add_argument('--budgets', type=float, nargs='+', default=[STREAM_MEMORY_BUDGET / 2**20, 64.0],
+                   help="streaming memory budgets in MB")
+    p = sub.add_parser('parallel', help="multi-process OBJ parsing: scaling over worker counts and identical output")
+    p.add_argument('--faces', type=int, default=2_000_000)
+    p.add_argument('--workers', type=int, nargs='+', default=list(range(1, (os.cpu_count() or 1) + 1)))
+    p = sub.add_parser('chunks', help="chunk streaming residency along a scripted walk (no GL)")
+    p.add_argument('--faces', type=int, default=2_000_000)
+    p.add_argument('--extent', type=float, default=400.0, help="scene edge length in units")
+    p.add_argument('--frames', type=int, default=600)
+    p.add_argument('--speed', type=float, default=20.0, help="camera speed in units per second")
+    p.add_argument('--budget-mb', type=float, default=streamingSettings.gpu_budget_mb)
+    args = parser.parse_args()
+
+    if args.command == 'loader':
+        bench_loader(args.sizes, args.max_legacy_faces)
+    elif args.command == 'meshopt':
+        bench_meshopt(args.path)
+    elif args.command == 'startup':
+        bench_startup(args.path, args.runs)
+    elif args.command == 'layout':
+        bench_vertex_layout(args.path)
+    elif args.command == 'textures':
+        bench_textures(args.paths, args.filter)
+    elif args.command == 'bvh':
+        bench_bvh(args.sizes, args.queries, args.brute_force_faces)
+    elif args.command == 'instancing':
+        bench_instancing(args.counts, args.meshes, args.moving)
+    elif args.command == 'lod':
+        bench_lod(args.sizes, args.ratios, args.samples)
+    elif args.command == 'pacing':
+        bench_pacing(args.frames, args.target_ms, args.work_ms, args.spin_ms)
+    elif args.command == 'stream':
+        bench_streaming(args.faces, [int(mb * 2**20) for mb in args.budgets])
+    elif args.command == 'parallel':
+        bench_parallel(args.faces, args.workers)
+    elif args.command == 'chunks':
+        bench_chunks(args.faces, args.extent, args.frames, args.speed, args.budget_mb)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+"""Triangle BVH in flat NumPy arrays: binned-SAH build, sphere/swept-sphere/ray queries.
+
+Both the build and the traversal run level by level over arrays of nodes, so the Python loop count
+grows with tree depth rather than with the number of triangles or visited nodes.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+
+@dataclass
+class RayHit:
+    distance: float
+    point: np.ndarray
+    normal: np.ndarray
+    triangle: int  # index into the triangles the BVH was built from
+
+
+def _ranges(starts, counts):
+    """Concatenated np.arange(s, s + c) for every (s, c)."""
+    total = int(counts.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    return np.arange(total) + offsets
+
+
+def _area(extent):
+    extent = np.maximum(extent, 0.0)
+    return extent[..., 0] * extent[..., 1] + extent[..., 1] * extent[..., 2] + extent[..., 2] * extent[..., 0]
+
+
+def _prefix_min(a):
+    """np.minimum.accumulate along the (short) first axis, one contiguous slice at a time."""
+    out = a.copy()
+    for i in range(1, len(a)):
+        np.minimum(out[i - 1], out[i], out=out[i])
+    return out
+
+
+def _dot(u, v):
+    return np.einsum('ij,ij->i', u, v)
+
+
+def _closest_points_on_edges(p, a, b, c):
+    best, best_d = a, np.full(len(a), np.inf)
+    for v0, v1 in ((a, b), (b, c), (c, a)):
+        e = v1 - v0
+        ee = _dot(e, e)
+        t = np.clip(_dot(p - v0, e) / np.where(ee > 0, ee, 1.0), 0.0, 1.0)
+        q = v0 + t[:, None] * e
+        d = _dot(p - q, p - q)
+        closer = d < best_d
+        best = np.where(closer[:, None], q, best)
+        best_d = np.where(closer, d, best_d)
+    return best
+
+
+def closest_points_on_triangles(p, a, b, c):
+    """Closest point to `p` on each triangle (a, b, c: (n, 3)).
+
+    Picks the Voronoi region of `p` (vertex, edge or face) from six dot products per triangle;
+    degenerate triangles fall back to their closest edge.
+    """
+    ab, ac = b - a, c - a
+    ap, bp, cp = p - a, p - b, p - c
+    d1, d2 = _dot(ab, ap), _dot(ac, ap)
+    d3, d4 = _dot(ab, bp), _dot(ac, bp)
+    d5, d6 = _dot(ab, cp), _dot(ac, cp)
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+    area = va + vb + vc  # |ab x ac|^2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # barycentric (v, w) of the face, then overridden region by region; earlier regions win
+        v, w = vb / area, vc / area
+        bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        for region, rv, rw in ((((va <= 0) & (d4 >= d3) & (d5 >= d6)), 1.0 - bc, bc),   # edge bc
+                               (((vb <= 0) & (d2 >= 0) & (d6 <= 0)), 0.0, d2 / (d2 - d6)),  # edge ac
+                               (((d6 >= 0) & (d5 <= d6)), 0.0, 1.0),                    # vertex c
+                               (((vc <= 0) & (d1 >= 0) & (d3 <= 0)), d1 / (d1 - d3), 0.0),  # edge ab
+                               (((d3 >= 0) & (d4 <= d3)), 1.0, 0.0),                    # vertex b
+                               (((d1 <= 0) & (d2 <= 0)), 0.0, 0.0)):                    # vertex a
+            v, w = np.where(region, rv, v), np.where(region, rw, w)
+    best = a + v[:, None] * ab + w[:, None] * ac
+    degenerate = ~(area > 1e-12 * _dot(ab, ab) * _dot(ac, ac)) | ~np.isfinite(best).all(axis=1)
+    if degenerate.any():
+        best[degenerate] = _closest_points_on_edges(p, a[degenerate], b[degenerate], c[degenerate])
+    return best
+
+
+class BVH:
+    def __init__(self, node_min, node_max, node_child, node_start, node_count, triangles, order):
+        self.node_min = node_min      # (N, 3)
+        self.node_max = node_max      # (N, 3)
+        self.node_child = node_child  # (N,) left child; right is left + 1; -1 for leaves
+        self.node_start = node_start  # (N,) first triangle of a leaf
+        self.node_count = node_count  # (N,) triangles in a leaf, 0 for inner nodes
+        self.triangles = triangles    # (T, 3, 3) float32 in leaf order
+        self.order = order            # (T,) original triangle index of each leaf-ordered triangle
+
+    def __len__(self):
+        return len(self.triangles)
+
+    @classmethod
+    def build(cls, triangles, leaf_size=4, bins=16):
+        """Binned SAH over (T, 3, 3) triangle corners; all nodes of a tree level are split together."""
+        tris = np.asarray(triangles, dtype=np.float32).reshape(-1, 3, 3)
+        count = len(tris)
+        # per triangle: box min, -box max, centroid, -centroid; negated maxima let one
+        # np.minimum reduction produce both bounds, and each level gathers a single array
+        boxes = np.empty((12, count), dtype=np.float32)
+        boxes[0:3], boxes[3:6] = tris.min(axis=1).T, -tris.max(axis=1).T
+        boxes[6:9] = (boxes[0:3] - boxes[3:6]) * 0.5
+        boxes[9:12] = -boxes[6:9]
+        order = np.arange(count)
+
+        mins, maxs, childs, starts_out, counts_out = [], [], [], [], []
+        level_starts = np.array([0])
+        level_counts = np.array([count])
+        next_node = 1
+        while len(level_starts):
+            k = len(level_starts)
+            # triangle arrays are kept in current order, so each node's range is contiguous
+            idx = _ranges(level_starts, level_counts)
+            seg = np.repeat(np.arange(k), level_counts)
+            first = np.concatenate(([0], np.cumsum(level_counts)[:-1]))
+            level = np.take(boxes, idx, axis=1)
+            bounds = (np.minimum.reduceat(level, first, axis=1).T if count
+                      else np.zeros((k, 12), dtype=np.float32))
+            c_min, c_max = bounds[:, 6:9], -bounds[:, 9:12]
+
+            # best split plane per node over up to `bins` buckets along the widest centroid axis
+            nb = int(min(bins, max(2, level_counts.max())))
+            axis = np.argmax(c_max - c_min, axis=1)
+            lo = c_min[np.arange(k), axis]
+            width = (c_max - c_min)[np.arange(k), axis]
+            scale = np.where(width > 0, nb / np.where(width > 0, width, 1.0), 0.0)
+            centroid = np.choose(axis[seg], level[6:9])
+            bucket = np.clip(((centroid - lo[seg]) * scale[seg]).astype(np.int64), 0, nb - 1)
+            # bucket-major layout (nb, k, ...): prefix sweeps below step over contiguous slices
+            key = bucket * k + seg
+            bin_count = np.bincount(key, minlength=nb * k).reshape(nb, k)
+            bin_box = np.full((nb * k, 6), np.inf, dtype=np.float32)  # min, -max
+            if count:
+                # per-bucket bounds: sort by bucket, reduce each run
+                by_key = np.argsort(key, kind='stable')
+                sorted_key = key[by_key]
+                runs = np.flatnonzero(np.concatenate(([True], sorted_key[1:] != sorted_key[:-1])))
+                bin_box[sorted_key[runs]] = np.minimum.reduceat(np.take(level[:6], by_key, axis=1), runs, axis=1).T
+            bin_box = bin_box.reshape(nb, k, 6)
+
+            left_n = np.cumsum(bin_count, axis=0)[:-1]
+            right_n = level_counts - left_n
+            left = _prefix_min(bin_box)[:-1]
+            right = _prefix_min(bin_box[::-1])[::-1][1:]
+            left_area = _area(-left[..., 3:6] - left[..., 0:3])
+            right_area = _area(-right[..., 3:6] - right[..., 0:3])
+            cost = np.where((left_n > 0) & (right_n > 0), left_area * left_n + right_area * right_n, np.inf)
+            split = np.argmin(cost, axis=0) + 1  # buckets below go left
+            valid = np.isfinite(cost[split - 1, np.arange(k)])
+            leaf = level_counts <= leaf_size
+
+            # inner nodes: partition their triangle ranges in place, left side first,
+            # scattering each triangle straight to its rank within its side
+            inner = ~leaf
+            go_left = np.where(valid[seg], bucket < split[seg],
+                               (np.arange(len(idx)) - first[seg]) < level_counts[seg] // 2)
+            ranks = np.concatenate(([0], np.cumsum(go_left)))
+            left_rank = ranks[:-1] - ranks[first][seg]
+            n_left = np.bincount(seg, weights=go_left, minlength=k).astype(np.int64)
+            right_rank = (np.arange(len(idx)) - first[seg]) - left_rank
+            dest = level_starts[seg] + np.where(go_left, left_rank, n_left[seg] + right_rank)
+            moving = inner[seg]
+            level_order = order[idx[moving]]
+            boxes[:, dest[moving]] = level[:, moving]
+            order[dest[moving]] = level_order
+            n_left = n_left[inner]
+
+            child = np.full(k, -1, dtype=np.int64)
+            child[inner] = next_node + 2 * np.arange(int(inner.sum()))
+            next_node += 2 * int(inner.sum())
+            mins.append(bounds[:, 0:3])
+            maxs.append(-bounds[:, 3:6])
+            childs.append(child)
+            starts_out.append(np.where(leaf, level_starts, 0))
+            counts_out.append(np.where(leaf, level_counts, 0))
+
+            inner_starts, inner_counts = level_starts[inner], level_counts[inner]
+            level_starts = np.stack((inner_starts, inner_starts + n_left), axis=1).ravel()
+            level_counts = np.stack((n_left, inner_counts - n_left), axis=1).ravel()
+
+        return cls(np.concatenate(mins), np.concatenate(maxs), np.concatenate(childs).astype(np.int32),
+                   np.concatenate(starts_out).astype(np.int64), np.concatenate(counts_out).astype(np.int64),
+                   tris[order], order)
+
+    def _leaves(self, test):
+        """Every leaf node whose box passes `test(box_min, box_max) -> mask`."""
+        nodes = np.array([0])
+        leaves = []
+        while len(nodes):
+            nodes = nodes[test(self.node_min[nodes], self.node_max[nodes])]
+            is_leaf = self.node_child[nodes] < 0
+            leaves.append(nodes[is_leaf])
+            inner = self.node_child[nodes[~is_leaf]]
+            nodes = np.concatenate((inner, inner + 1))
+        return np.concatenate(leaves)
+
+    def _candidates(self, test):
+        """Leaf-ordered triangle indices of every leaf whose box passes `test(box_min, box_max) -> mask`."""
+        leaves = self._leaves(test)
+        return _ranges(self.node_start[leaves], self.node_count[leaves])
+
+    def sphere_contacts(self, center, radius):
+        """(leaf-ordered triangle indices, closest points, distances) of triangles within `radius`."""
+        if not len(self.triangles):
+            return self._contacts(np.zeros(0, dtype=np.int64), center, radius)
+        center = np.asarray(center, dtype=np.float64)
+        cand = self._candidates(lambda lo, hi: (((np.clip(center, lo, hi) - center) ** 2).sum(axis=1)
+                                                <= radius * radius))
+        return self._contacts(cand, center, radius)
+
+    def _contacts(self, cand, center, radius):
+        if not len(cand):
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 3)), np.zeros(0)
+        t = self.triangles[cand].astype(np.float64)
+        q = closest_points_on_triangles(center, t[:, 0], t[:, 1], t[:, 2])
+        d = np.sqrt(((q - center) ** 2).sum(axis=1))
+        hit = d <= radius
+        return cand[hit], q[hit], d[hit]
+
+    def sphere_overlaps(self, center, radius) -> bool:
+        return len(self.sphere_contacts(center, radius)[0]) > 0
+
+    def _triangle_normal(self, i):
+        a, b, c = self.triangles[i].astype(np.float64)
+        n = np.cross(b - a, c - a)
+        length = np.linalg.norm(n)
+        return n / length if length > 0 else np.array([0.0, 1.0, 0.0])
+
+    def _depenetrate(self, center, radius, plane_normal, iterations, contacts):
+        """Push the sphere out of the mesh, deepest contact first; None when it cannot get free."""
+        for _ in range(iterations):
+            tris, points, dists = contacts(center)
+            if not len(tris):
+                return center
+            i = np.argmin(dists)
+            n = center - points[i]
+            n = n / dists[i] if dists[i] > 1e-9 else self._triangle_normal(tris[i])
+            depth = radius - dists[i] + 1e-4
+            if plane_normal is not None:
+                # only move within the plane: push further along its in-plane part
+                n = n - np.dot(n, plane_normal) * plane_normal
+                length = np.linalg.norm(n)
+                if length < 0.2:
+                    return None
+                n /= length
+                depth /= length
+            center = center + n * depth
+        return center if not len(contacts(center)[0]) else None
+
+    def sweep_sphere(self, center, radius, displacement, plane_normal=None, iterations=4):
+        """Move a sphere by `displacement`, sliding along whatever it touches.
+
+        The move is split into steps of at most half the radius, so the sphere cannot pass through
+        thin geometry; after each step contacts are resolved by pushing out along their normals,
+        which keeps the tangential part of the motion. With `plane_normal` the sphere stays in that
+        plane (e.g. a walking camera) and contacts that could only be resolved across it block.
+
+        The tree is traversed once for the whole sweep: leaves touching its box (grown by one radius
+        of slack for push-outs) are gathered up front, and the steps only test those while the
+        sphere stays inside the box. A sweep through free space touches no triangles at all.
+        """
+        center = np.asarray(center, dtype=np.float64)
+        displacement = np.asarray(displacement, dtype=np.float64)
+        if plane_normal is not None:
+            plane_normal = np.asarray(plane_normal, dtype=np.float64)
+            plane_normal = plane_normal / np.linalg.norm(plane_normal)
+        end = center + displacement
+        inner_lo = np.minimum(center, end) - radius
+        inner_hi = np.maximum(center, end) + radius
+        lo, hi = inner_lo - radius, inner_hi + radius
+        leaves = (self._leaves(lambda a, b: np.all((a <= hi) & (b >= lo), axis=1))
+                  if len(self.triangles) else np.zeros(0, dtype=np.int64))
+        if not len(leaves):
+            return end
+        # leaf boxes as rows (min xyz, -max xyz): one comparison per row tests them all
+        boxes = np.concatenate((self.node_min[leaves].T, -self.node_max[leaves].T)).astype(np.float64)
+        starts, counts = self.node_start[leaves], self.node_count[leaves]
+
+        def contacts(c):
+            if not (np.all(c >= inner_lo) and np.all(c <= inner_hi)):
+                return self.sphere_contacts(c, radius)
+            near = np.logical_and.reduce(boxes <= np.concatenate((c + radius, radius - c))[:, None])
+            return self._contacts(_ranges(starts[near], counts[near]), c, radius)
+
+        steps = max(1, int(np.ceil(np.linalg.norm(displacement) / (0.5 * radius))))
+        for _ in range(steps):
+            moved = self._depenetrate(center + displacement / steps, radius, plane_normal, iterations, contacts)
+            if moved is None:
+                break
+            center = moved
+        return center
+
+    def raycast(self, origin, direction, max_distance=np.inf) -> Optional[RayHit]:
+        if not len(self.triangles):
+            return None
+        origin = np.asarray(origin, dtype=np.float64)
+        direction = np.asarray(direction, dtype=np.float64)
+        direction = direction / np.linalg.norm(direction)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv = 1.0 / direction
+
+            def slab(lo, hi):
+                t0, t1 = (lo - origin) * inv, (hi - origin) * inv
+                near = np.nanmax(np.minimum(t0, t1), axis=1)
+                far = np.nanmin(np.maximum(t0, t1), axis=1)
+                return (near <= far) & (far >= 0) & (near <= max_distance)
+
+            cand = self._candidates(slab)
+        if not len(cand):
+            return None
+
+        # Moller-Trumbore on all candidates
+        t = self.triangles[cand].astype(np.float64)
+        e1, e2 = t[:, 1] - t[:, 0], t[:, 2] - t[:, 0]
+        p = np.cross(direction, e2)
+        det = (e1 * p).sum(axis=1)
+        ok = np.abs(det) > 1e-12
+        inv_det = np.where(ok, 1.0 / np.where(ok, det, 1.0), 0.0)
+        s = origin - t[:, 0]
+        u = (s * p).sum(axis=1) * inv_det
+        q = np.cross(s, e1)
+        v = (direction * q).sum(axis=1) * inv_det
+        dist = (e2 * q).sum(axis=1) * inv_det
+        ok &= (u >= 0) & (v >= 0) & (u + v <= 1) & (dist >= 0) & (dist <= max_distance)
+        if not ok.any():
+            return None
+        best = np.flatnonzero(ok)[np.argmin(dist[ok])]
+        normal = np.cross(e1[best], e2[best])
+        normal /= np.linalg.norm(normal)
+        if np.dot(normal, direction) > 0:
+            normal = -normal
+        return RayHit(float(dist[best]), origin + direction * dist[best], normal, int(self.order[cand[best]]))
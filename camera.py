@@ -5,7 +5,7 @@ import pygame
 from model import Model
 from helper import clamp
 import math
-from shaderProgram import ShaderProgram
+from uniformBuffer import UniformBuffer
 
 class Camera:
     """
@@ -29,9 +29,19 @@ class Camera:
         self.first_mouse_move = True
 
         self.move_speed = 10.0 
-        self.mouse_sens = 5.0
+        # intended movement of the last input step, units per second (chunk streaming looks ahead along it)
+        self.velocity = glm.vec3(0.0, 0.0, 0.0)
+        self.mouse_sens = 0.08  # degrees per pixel
 
         self.boundary_margin = 20
+        # radius of the sphere swept against model triangles
+        self.collision_radius = 1.0
+
+        # Projection
+        self.fov = 50.0
+        self.near = 1.0
+        self.far = 50.0
+        self.view_projection = None
     
     def process_keyboard_input(self, dt):
         keys = pygame.key.get_pressed()
@@ -49,20 +59,13 @@ class Camera:
             displacement -= flat_right * camera_speed
         if keys[K_d]:
             displacement += flat_right * camera_speed
+        self.velocity = displacement / dt if dt > 0 else glm.vec3(0.0, 0.0, 0.0)
         return displacement
 
     def check_for_collision(self, model: Model, displacement):
-        new_pos = self.pos
-        # X-axis collision test
-        test_x = new_pos.x + displacement.x
-        if not model.does_collide(glm.vec3(test_x, new_pos.y, new_pos.z)):
-            new_pos.x = test_x
-        # Z-axis collision test
-        test_z = new_pos.z + displacement.z
-        if not model.does_collide(glm.vec3(new_pos.x, new_pos.y, test_z)):
-            new_pos.z = test_z
-        # Update the camera poosition - if there was a collision then position is unchanged
-        self.pos = new_pos
+        # Swept sphere against the model's triangles, sliding along walls and staying at eye height
+        new_pos = model.sweep_sphere(self.pos, self.collision_radius, displacement, plane_normal=self.up)
+        self.pos = glm.vec3(*new_pos)
 
     def check_if_out_of_bounds(self, max_size):
         new_pos = self.pos
@@ -72,23 +75,23 @@ class Camera:
         new_pos.z = clamp(new_pos.z, min_bound, max_bound)
         self.pos = new_pos
 
-    def process_mouse_movement(self, dt):
-        xrel, yrel = pygame.mouse.get_rel()
-
+    def process_mouse_movement(self, xrel, yrel):
+        """Look by the mouse movement of a whole frame (all MOUSEMOTION events of it coalesced)."""
         if self.first_mouse_move:
             self.first_mouse_move = False
             return
 
-        # Scale by time-based sensitivity
-        sensitivity = self.mouse_sens * dt
-        xoffset = xrel * sensitivity
-        yoffset = -yrel * sensitivity  # invert y
+        # per pixel, so the look speed does not depend on the frame rate
+        xoffset = xrel * self.mouse_sens
+        yoffset = -yrel * self.mouse_sens  # invert y
 
         self.yaw += xoffset
         self.pitch += yoffset
         # 
         self.pitch = clamp(self.pitch, -89.0, 89.0)
+        self.update_front()
 
+    def update_front(self):
         front = glm.vec3(
             math.cos(glm.radians(self.yaw)) * math.cos(glm.radians(self.pitch)),
             math.sin(glm.radians(self.pitch)),
@@ -96,8 +99,21 @@ class Camera:
         )
         self.front = glm.normalize(front)
 
-    def set_up_in_scene(self, shader: ShaderProgram, aspect_ratio):
-        view = glm.lookAt(self.pos, self.pos + self.front, self.up)
-        projection = glm.perspective(glm.radians(50.0), aspect_ratio, 1.0, 50.0)
-        shader.set_mat4("view", view)
-        shader.set_mat4("projection", projection)
\ No newline at end of file
+    def screen_fraction(self, center, radius):
+        """Projected diameter of a sphere as a fraction of the viewport height (1 when inside it)."""
+        distance = glm.length(glm.vec3(*center) - self.pos)
+        if distance <= radius:
+            return 1.0
+        return radius / (distance * math.tan(glm.radians(self.fov) / 2.0))
+
+    def view_matrix(self):
+        return glm.lookAt(self.pos, self.pos + self.front, self.up)
+
+    def set_up_in_scene(self, frame: UniformBuffer, aspect_ratio):
+        view = self.view_matrix()
+        projection = glm.perspective(glm.radians(self.fov), aspect_ratio, self.near, self.far)
+        frame["view"] = view
+        frame["projection"] = projection
+        # kept for frustum culling of this frame
+        self.view_projection = projection * view
+        frame["viewPos"] = self.pos
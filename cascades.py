@@ -0,0 +1,80 @@
+"""Cascaded shadow map fitting in plain NumPy (no GL), matrices indexed [row, column] like glm."""
+import numpy as np
+
+MAX_CASCADES = 4
+
+
+def practical_splits(near, far, count, blend=0.75):
+    """Split distances [near, ..., far] blending logarithmic (blend=1) and uniform (blend=0) schemes."""
+    i = np.arange(count + 1) / count
+    log = near * (far / near) ** i
+    uniform = near + (far - near) * i
+    return blend * log + (1.0 - blend) * uniform
+
+
+def slice_corners(inv_view, fov_y, aspect, near, far):
+    """World-space corners (8, 3) of the view frustum between `near` and `far`; fov_y in radians."""
+    t = np.tan(fov_y / 2.0)
+    d = np.array([near, near, near, near, far, far, far, far], dtype=np.float64)
+    sx = np.array([-1, 1, 1, -1, -1, 1, 1, -1])
+    sy = np.array([-1, -1, 1, 1, -1, -1, 1, 1])
+    view_space = np.stack((sx * d * t * aspect, sy * d * t, -d, np.ones(8)), axis=1)
+    return (view_space @ np.asarray(inv_view, dtype=np.float64).T)[:, :3]
+
+
+def look_at(eye, target, up):
+    eye, target, up = (np.asarray(v, dtype=np.float64) for v in (eye, target, up))
+    f = target - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, up)
+    s /= np.linalg.norm(s)
+    u = np.cross(s, f)
+    m = np.eye(4)
+    m[0, :3], m[1, :3], m[2, :3] = s, u, -f
+    m[:3, 3] = -m[:3, :3] @ eye
+    return m
+
+
+def ortho(left, right, bottom, top, near, far):
+    m = np.eye(4)
+    m[0, 0] = 2.0 / (right - left)
+    m[1, 1] = 2.0 / (top - bottom)
+    m[2, 2] = -2.0 / (far - near)
+    m[:3, 3] = (-(right + left) / (right - left), -(top + bottom) / (top - bottom), -(far + near) / (far - near))
+    return m
+
+
+def light_view(light_dir):
+    """Rotation-only view looking along `light_dir`; fixed so snapping stays stable as the camera moves."""
+    light_dir = np.asarray(light_dir, dtype=np.float64)
+    up = (0.0, 0.0, 1.0) if abs(light_dir[1]) > 0.99 else (0.0, 1.0, 0.0)
+    return look_at((0.0, 0.0, 0.0), light_dir, up)
+
+
+def fit_cascade(corners, view, resolution, depth_margin):
+    """Ortho light projection * view covering `corners`, snapped to whole shadow-map texels.
+
+    The box is sized from the slice's bounding sphere, so its extent does not change with camera rotation,
+    and its centre moves in texel steps: static geometry rasterizes identically between frames.
+    `depth_margin` pulls the near plane towards the light for casters outside the slice.
+    """
+    center = corners.mean(axis=0)
+    radius = np.linalg.norm(corners - center, axis=1).max()
+    radius = np.ceil(radius * 16.0) / 16.0
+    texel = 2.0 * radius / resolution
+    c = view[:3, :3] @ center + view[:3, 3]
+    x, y = np.floor(c[:2] / texel) * texel
+    proj = ortho(x - radius, x + radius, y - radius, y + radius,
+                 -c[2] - radius - depth_margin, -c[2] + radius)
+    return proj @ view
+
+
+def cascade_matrices(view, fov_y, aspect, near, far, light_dir, count, resolution, blend=0.75, depth_margin=50.0):
+    """(count, 4, 4) light-space matrices and the (count,) view-space far distance of each cascade."""
+    splits = practical_splits(near, far, count, blend)
+    inv_view = np.linalg.inv(np.asarray(view, dtype=np.float64))
+    lv = light_view(light_dir)
+    matrices = np.stack([fit_cascade(slice_corners(inv_view, fov_y, aspect, splits[i], splits[i + 1]),
+                                     lv, resolution, depth_margin)
+                         for i in range(count)])
+    return matrices, splits[1:]
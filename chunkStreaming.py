@@ -0,0 +1,346 @@
+"""Large meshes cut into a grid of chunks that are streamed onto the GPU around the camera."""
+import contextlib
+import io
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from culling import MeshBounds
+from model import VERTEX_FORMATS, Model, ModelPayload, build_vertex_array
+from objLoader import Loader
+
+# triangles binned per step, bounds the temporary (k, 3, 3) corner array
+_PARTITION_BLOCK = 1 << 20
+
+
+class Chunk:
+    """One XZ grid cell of a source: triangle ids per source mesh, bounds and exact GPU bytes."""
+    __slots__ = ('key', 'parts', 'box_min', 'box_max', 'nbytes')
+
+    def __init__(self, key):
+        self.key = key
+        self.parts = []  # (mesh index, triangle ids)
+        self.box_min = np.full(3, np.inf, dtype=np.float32)
+        self.box_max = np.full(3, -np.inf, dtype=np.float32)
+        self.nbytes = 0
+
+
+class ChunkSource:
+    """Meshes (loader output, possibly memory-mapped) partitioned into grid chunks; no GL.
+
+    Triangles go to the cell of their centroid on the XZ plane, so a chunk's box can stick out of
+    its cell by up to half a triangle. `payload` builds a chunk's compacted vertex and index
+    arrays on demand, which is the only time its vertex data is read.
+    """
+
+    def __init__(self, meshes, cell_size, vertex_format='float'):
+        self.meshes = meshes
+        self.cell_size = cell_size
+        self.vertex_format = vertex_format
+        stride = VERTEX_FORMATS[vertex_format].itemsize
+        chunks = {}
+        for mesh_index, mesh in enumerate(meshes):
+            positions, _, _, indices = mesh.as_arrays()
+            triangles = np.asarray(indices).reshape(-1, 3)
+            for start in range(0, len(triangles), _PARTITION_BLOCK):
+                corners = positions[triangles[start:start + _PARTITION_BLOCK]]
+                cells = np.floor(corners.mean(axis=1)[:, [0, 2]] / cell_size).astype(np.int64)
+                keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+                inverse = inverse.reshape(-1)
+                order = np.argsort(inverse, kind='stable')
+                bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+                for k, key in enumerate(map(tuple, keys.tolist())):
+                    ids = order[bounds[k]:bounds[k + 1]]
+                    chunk = chunks.get(key) or chunks.setdefault(key, Chunk(key))
+                    chunk.parts.append((mesh_index, ids + start))
+                    chunk.box_min = np.minimum(chunk.box_min, corners[ids].min(axis=(0, 1)))
+                    chunk.box_max = np.maximum(chunk.box_max, corners[ids].max(axis=(0, 1)))
+            for chunk in chunks.values():
+                if chunk.parts and chunk.parts[-1][0] == mesh_index:
+                    ids = np.concatenate([ids for m, ids in chunk.parts if m == mesh_index])
+                    chunk.parts = [part for part in chunk.parts if part[0] != mesh_index] + [(mesh_index, ids)]
+                    chunk.nbytes += len(np.unique(triangles[ids])) * stride + ids.size * 3 * 4
+        self.chunks = [chunks[key] for key in sorted(chunks)]
+        self.box_min = np.array([c.box_min for c in self.chunks], dtype=np.float32).reshape(-1, 3)
+        self.box_max = np.array([c.box_max for c in self.chunks], dtype=np.float32).reshape(-1, 3)
+        self.nbytes = np.array([c.nbytes for c in self.chunks], dtype=np.int64)
+
+    @classmethod
+    def from_obj(cls, path, cell_size, vertex_format='float', memory_budget=None):
+        """Partition an OBJ read with Loader.iter_meshes, so files larger than memory work too."""
+        loader = Loader(progress=lambda progress: None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            meshes = list(loader.iter_meshes(path, **({'memory_budget': memory_budget} if memory_budget else {})))
+        if not meshes:
+            raise RuntimeError(f"No meshes in {path}")
+        return cls(meshes, cell_size, vertex_format)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def payload(self, index) -> ModelPayload:
+        """CPU half of a chunk upload (worker thread): one batched mesh per source mesh it touches."""
+        chunk = self.chunks[index]
+        payload = ModelPayload(f"chunk {chunk.key}")
+        positions_per_mesh = []
+        for mesh_index, ids in chunk.parts:
+            mesh = self.meshes[mesh_index]
+            positions, normals, texcoords, indices = mesh.as_arrays()
+            used, local = np.unique(np.asarray(indices).reshape(-1, 3)[ids], return_inverse=True)
+            material = mesh.materials
+            payload.texture_paths.append(material.map_Kd if material and material.map_Kd else None)
+            payload.vertex_datas.append(build_vertex_array(positions[used], normals[used], texcoords[used],
+                                                           self.vertex_format))
+            payload.index_arrays.append(local.reshape(-1).astype(np.uint32))
+            payload.lod_index_arrays.append([])
+            positions_per_mesh.append(positions[used])
+        payload.bounds = MeshBounds.from_positions(positions_per_mesh)
+        return payload
+
+
+class ResidencyPolicy:
+    """Which chunks belong on the GPU, from the camera position and velocity alone (no GL).
+
+    Distances are from a point to a chunk's box on the XZ plane. A chunk is wanted once the
+    camera, or where it will be `look_ahead` seconds on at its current velocity, comes within
+    `load_radius`; a resident chunk stays until both are beyond `evict_radius`, so a camera on a
+    cell border does not load and evict the same chunk every frame. Wanted chunks load nearest to
+    the camera first (look-ahead only widens what is wanted); when the budget is full they
+    displace resident chunks farther away than themselves.
+    """
+
+    def __init__(self, box_min, box_max, nbytes, budget_bytes, load_radius, evict_radius, look_ahead=1.0):
+        if evict_radius < load_radius:
+            raise ValueError("evict_radius must not be smaller than load_radius")
+        self.box_min = np.asarray(box_min, dtype=np.float64)[:, [0, 2]]
+        self.box_max = np.asarray(box_max, dtype=np.float64)[:, [0, 2]]
+        self.nbytes = np.asarray(nbytes, dtype=np.int64)
+        self.budget_bytes = budget_bytes
+        self.load_radius = load_radius
+        self.evict_radius = evict_radius
+        self.look_ahead = look_ahead
+        self.budget_limited = 0  # wanted chunks left out for lack of budget
+
+    def distances(self, position) -> np.ndarray:
+        p = np.asarray(position, dtype=np.float64)[[0, 2]]
+        gap = np.maximum(np.maximum(self.box_min - p, p - self.box_max), 0.0)
+        return np.hypot(gap[:, 0], gap[:, 1])
+
+    def priorities(self, position, velocity) -> np.ndarray:
+        ahead = np.asarray(position, dtype=np.float64) + np.asarray(velocity, dtype=np.float64) * self.look_ahead
+        return np.minimum(self.distances(position), self.distances(ahead))
+
+    def plan(self, position, velocity, resident, loading, max_loads=None):
+        """(chunks to load, nearest first; resident chunks to evict) for boolean masks of the
+        resident and in-flight chunks. In-flight chunks count against the budget."""
+        now = self.distances(position)
+        priority = self.priorities(position, velocity)
+        resident = np.asarray(resident, dtype=bool)
+        loading = np.asarray(loading, dtype=bool)
+        keep = resident & (priority <= self.evict_radius)
+        evict = np.flatnonzero(resident & ~keep).tolist()
+        committed = int(self.nbytes[keep | loading].sum())
+        wanted = np.flatnonzero((priority <= self.load_radius) & ~resident & ~loading)
+        wanted = wanted[np.argsort(now[wanted], kind='stable')]
+        kept = np.flatnonzero(keep)
+        victims = kept[np.argsort(-priority[kept], kind='stable')].tolist()  # farthest first
+        loads = []
+        for i in wanted.tolist():
+            if max_loads is not None and len(loads) >= max_loads:
+                break
+            size = int(self.nbytes[i])
+            while committed + size > self.budget_bytes and victims and priority[victims[0]] > priority[i]:
+                victim = victims.pop(0)
+                evict.append(victim)
+                committed -= int(self.nbytes[victim])
+            if committed + size > self.budget_bytes:
+                self.budget_limited += len(wanted) - len(loads)
+                break
+            loads.append(i)
+            committed += size
+        return loads, evict
+
+
+class GLChunkUploader:
+    """Turns chunk payloads into drawable models; swap for a stub to run the streamer without a context.
+
+    With a `render_queue`, deleted chunk VAOs are dropped from its key indices.
+    """
+
+    def __init__(self, render_queue=None):
+        self.render_queue = render_queue
+
+    def upload(self, chunk, payload):
+        model = Model(use_cache=False, lod_ratios=(), verbose=False)
+        model.upload(payload)
+        model.box_min, model.box_max = chunk.box_min, chunk.box_max
+        return model
+
+    def delete(self, model):
+        vaos = {mesh.VAO for mesh in model.meshes}
+        model.delete()
+        if self.render_queue is not None:
+            self.render_queue.forget(vaos=vaos)
+
+
+class ChunkStreamer:
+    """Keeps the chunks of a ChunkSource near the camera resident on the GPU.
+
+    `update` runs once per frame on the GL thread: it uploads chunks whose payload a worker has
+    built (within `upload_budget_ms`), evicts and starts loads as the ResidencyPolicy decides.
+    A stall is a chunk within load_radius of the camera right now that is not resident yet (a
+    hole in the scene); its stall time runs until it is uploaded. The velocity is smoothed over
+    a few frames before the look-ahead uses it, so turning on the spot does not swing the
+    look-ahead point back and forth.
+    """
+
+    def __init__(self, budget_bytes, load_radius, evict_radius, look_ahead=1.0, uploader=None, executor=None,
+                 max_in_flight=4, upload_budget_ms=2.0, velocity_smoothing=0.1, clock=time.perf_counter):
+        self.settings = (budget_bytes, load_radius, evict_radius, look_ahead)
+        self.uploader = uploader or GLChunkUploader()
+        self.executor = executor or ThreadPoolExecutor(max_workers=2)
+        self.max_in_flight = max_in_flight
+        self.upload_budget_ms = upload_budget_ms
+        self.velocity_smoothing = velocity_smoothing  # weight of the newest velocity per update
+        self.velocity = np.zeros(3)
+        self.position = None  # camera position of the latest update
+        self.clock = clock
+        self.source = None
+        self.policy = None
+        self.resident = {}  # chunk index -> uploaded handle
+        self.loading = set()
+        self.ready = queue.Queue()  # (chunk index or None for the source, future)
+        self.errors = []
+        self._waiting = {}  # stalled chunk index -> clock when it was first needed
+        # metrics
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+        self.uploaded_bytes = 0
+        self.loads = 0
+        self.evictions = 0
+        self.dropped = 0  # payloads finished after their chunk stopped being wanted
+        self.frames = 0
+        self.stall_frames = 0
+        self.stalled = 0  # chunks stalled in the last frame
+        self.stall_ms = deque(maxlen=1000)
+
+    # --- source
+    def open(self, source: ChunkSource):
+        self.source = source
+        self.policy = ResidencyPolicy(source.box_min, source.box_max, source.nbytes, *self.settings)
+        print(f"Streaming {len(source)} chunks of {source.cell_size:g} units,"
+              f" {source.nbytes.sum() / 2**20:.1f} MB in total, {self.settings[0] / 2**20:.0f} MB budget")
+
+    def open_obj(self, path, cell_size, vertex_format='float'):
+        """Partition `path` on the worker pool; chunks start streaming once it is done."""
+        future = self.executor.submit(ChunkSource.from_obj, path, cell_size, vertex_format)
+        future.add_done_callback(lambda f: self.ready.put((None, f)))
+
+    # --- per frame
+    def update(self, position, velocity=(0.0, 0.0, 0.0)):
+        self.position = np.asarray(position, dtype=np.float64)
+        self.velocity += (np.asarray(velocity, dtype=np.float64) - self.velocity) * self.velocity_smoothing
+        self.process_uploads()
+        if self.policy is None:
+            return
+        count = len(self.source)
+        resident = np.zeros(count, dtype=bool)
+        resident[list(self.resident)] = True
+        loading = np.zeros(count, dtype=bool)
+        loading[list(self.loading)] = True
+        loads, evict = self.policy.plan(position, self.velocity, resident, loading,
+                                        max(self.max_in_flight - len(self.loading), 0))
+        for index in evict:
+            self._evict(index)
+        for index in loads:
+            self._start(index)
+        self._track_stalls(self.policy.distances(position) <= self.policy.load_radius)
+        self.frames += 1
+
+    def _start(self, index):
+        self.loading.add(index)
+        future = self.executor.submit(self.source.payload, index)
+        future.add_done_callback(lambda f: self.ready.put((index, f)))
+
+    def _evict(self, index):
+        self.uploader.delete(self.resident.pop(index))
+        self.resident_bytes -= int(self.source.nbytes[index])
+        self.evictions += 1
+
+    def process_uploads(self, budget_ms=None):
+        """Upload finished payloads until the budget is spent (at least one per call)."""
+        budget = self.upload_budget_ms if budget_ms is None else budget_ms
+        deadline = self.clock() + budget / 1000.0
+        keep = None
+        while True:
+            try:
+                index, future = self.ready.get_nowait()
+            except queue.Empty:
+                return
+            error = future.exception()
+            if index is None:
+                if error is None:
+                    self.open(future.result())
+            else:
+                self.loading.discard(index)
+                if error is None:
+                    keep = self._keep() if keep is None else keep
+                    if keep[index]:
+                        self._upload(index, future.result())
+                    else:
+                        # the camera moved on while the payload was built: it would only be evicted again
+                        self.dropped += 1
+            if error is not None:
+                self.errors.append(f"{'source' if index is None else f'chunk {index}'}: {error}")
+                print(f"Error: streaming {self.errors[-1]}")
+            if self.clock() >= deadline:
+                return
+
+    def _upload(self, index, payload):
+        self.resident[index] = self.uploader.upload(self.source.chunks[index], payload)
+        self.resident_bytes += int(self.source.nbytes[index])
+        self.peak_resident_bytes = max(self.peak_resident_bytes, self.resident_bytes)
+        self.uploaded_bytes += int(self.source.nbytes[index])
+        self.loads += 1
+        started = self._waiting.pop(index, None)
+        if started is not None:
+            self.stall_ms.append((self.clock() - started) * 1000.0)
+
+    def _keep(self):
+        """Chunks the policy would keep resident at the latest camera position (all before any update)."""
+        if self.position is None:
+            return np.ones(len(self.source), dtype=bool)
+        return self.policy.priorities(self.position, self.velocity) <= self.policy.evict_radius
+
+    def _track_stalls(self, needed):
+        missing = set(np.flatnonzero(needed).tolist()) - self.resident.keys()
+        now = self.clock()
+        self._waiting = {index: self._waiting.get(index, now) for index in missing}
+        self.stalled = len(missing)
+        self.stall_frames += bool(missing)
+
+    # --- drawing and reporting
+    def models(self):
+        return list(self.resident.values())
+
+    def stats(self) -> dict:
+        stall = np.array(self.stall_ms, dtype=np.float64)
+        p50, p99 = np.percentile(stall, (50, 99)) if len(stall) else (0.0, 0.0)
+        return {'chunks': len(self.source) if self.source else 0, 'resident': len(self.resident),
+                'resident_mb': self.resident_bytes / 2**20, 'peak_resident_mb': self.peak_resident_bytes / 2**20,
+                'loads': self.loads, 'evictions': self.evictions, 'dropped': self.dropped, 'frames': self.frames,
+                'stall_frames': self.stall_frames, 'stall_ms_p50': float(p50), 'stall_ms_p99': float(p99),
+                'budget_limited': self.policy.budget_limited if self.policy else 0}
+
+    def report(self) -> str:
+        if self.source is None:
+            return "chunks: partitioning"
+        s = self.stats()
+        return (f"chunks {s['resident']}/{s['chunks']} ({s['resident_mb']:.0f} MB)"
+                f" | stalls {s['stall_frames']} frames, p99 {s['stall_ms_p99']:.0f} ms")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
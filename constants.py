@@ -11,3 +11,50 @@ default_window_size = WindowSize()
 # Alias for direct import as windowSize
 windowSize = default_window_size
 
+# Shadow maps
+@dataclass
+class ShadowSettings:
+    cascaded: bool = True   # False: one fixed ortho box around the origin
+    cascades: int = 4       # 1..4
+    resolution: int = 2048  # per cascade layer
+    split_blend: float = 0.75  # 0 = uniform splits, 1 = logarithmic
+    quality: str = "pcss-high"  # hard, pcf3x3, pcss-low, pcss-high (keys 1-4 at runtime)
+
+shadowSettings = ShadowSettings()
+
+
+# Levels of detail
+@dataclass
+class LodSettings:
+    ratios: tuple = (0.5, 0.25, 0.125)  # triangles kept by levels 1..3
+    # level i is drawn while the model's bounding sphere covers at least screen_fractions[i] of the
+    # screen height; below the last one, the coarsest level
+    screen_fractions: tuple = (0.4, 0.2, 0.1)
+
+lodSettings = LodSettings()
+
+
+# Main loop
+@dataclass
+class LoopSettings:
+    mode: str = "target"        # vsync, uncapped or target (frame time below)
+    target_ms: float = 1000.0 / 60.0
+    spin_ms: float = 1.5        # last stretch before a target deadline is spun instead of slept
+    simulation_hz: float = 120.0  # fixed step of input, collision and light updates
+    max_steps: int = 8          # per frame; longer hitches drop simulated time
+
+loopSettings = LoopSettings()
+
+
+# Streaming of a large scene in grid chunks around the camera
+@dataclass
+class StreamingSettings:
+    scene_path: str = ""        # OBJ to stream; empty = off
+    cell_size: float = 10.0     # chunk edge on the XZ plane
+    load_radius: float = 40.0   # chunks this close to the camera (now or look_ahead_s ahead) are loaded
+    evict_radius: float = 55.0  # and stay until farther than this
+    look_ahead_s: float = 1.0
+    gpu_budget_mb: float = 256.0  # vertex and index data of resident chunks
+    max_in_flight: int = 4      # chunks being built on workers at once
+
+streamingSettings = StreamingSettings()
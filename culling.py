@@ -0,0 +1,93 @@
+"""View-frustum culling on NumPy arrays (matrices indexed [row, column] like glm)."""
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def extract_planes(matrix) -> np.ndarray:
+    """(6, 4) normalized planes (a, b, c, d) of a clip matrix, inside where a*x + b*y + c*z + d >= 0.
+
+    Planes come out in the space the matrix maps from: world space for projection * view,
+    mesh-local space for projection * view * model.
+    """
+    m = np.asarray(matrix, dtype=np.float64)
+    planes = np.stack((m[3] + m[0], m[3] - m[0],    # left, right
+                       m[3] + m[1], m[3] - m[1],    # bottom, top
+                       m[3] + m[2], m[3] - m[2]))   # near, far
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+
+def spheres_visible(planes, centers, radii) -> np.ndarray:
+    distance = centers @ planes[:, :3].T + planes[:, 3]
+    return np.all(distance >= -radii[:, None], axis=1)
+
+
+def boxes_visible(planes, box_min, box_max) -> np.ndarray:
+    """(N,) bool, False only for boxes entirely outside one plane (conservative near frustum corners)."""
+    center = (box_min + box_max) * 0.5
+    extent = (box_max - box_min) * 0.5
+    distance = center @ planes[:, :3].T + planes[:, 3]
+    reach = extent @ np.abs(planes[:, :3]).T
+    return np.all(distance + reach >= 0, axis=1)
+
+
+@dataclass
+class MeshBounds:
+    """Per-mesh AABBs and bounding spheres of a model, in model space."""
+    box_min: np.ndarray  # (N, 3)
+    box_max: np.ndarray  # (N, 3)
+    center: np.ndarray   # (N, 3)
+    radius: np.ndarray   # (N,)
+
+    @classmethod
+    def from_positions(cls, position_arrays):
+        count = len(position_arrays)
+        bounds = cls(np.zeros((count, 3)), np.zeros((count, 3)), np.zeros((count, 3)), np.zeros(count))
+        for i, positions in enumerate(position_arrays):
+            p = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+            if not len(p):
+                continue
+            bounds.box_min[i], bounds.box_max[i] = p.min(axis=0), p.max(axis=0)
+            bounds.center[i] = (bounds.box_min[i] + bounds.box_max[i]) * 0.5
+            bounds.radius[i] = np.sqrt(((p - bounds.center[i]) ** 2).sum(axis=1).max())
+        return bounds
+
+    def __len__(self):
+        return len(self.radius)
+
+    def __getitem__(self, index):
+        return MeshBounds(self.box_min[index], self.box_max[index], self.center[index], self.radius[index])
+
+    def append(self, other: 'MeshBounds') -> 'MeshBounds':
+        return MeshBounds(*(np.concatenate((a, b)) for a, b in
+                            ((self.box_min, other.box_min), (self.box_max, other.box_max),
+                             (self.center, other.center), (self.radius, other.radius))))
+
+    def visible(self, planes) -> np.ndarray:
+        """All meshes at once: sphere test first, boxes only for what survives."""
+        mask = spheres_visible(planes, self.center, self.radius)
+        if mask.any():
+            mask[mask] = boxes_visible(planes, self.box_min[mask], self.box_max[mask])
+        return mask
+
+
+class CullCounter:
+    """Visible / culled meshes of one pass; `last_*` hold the last frame that ran the pass."""
+    def __init__(self):
+        self.visible = 0
+        self.culled = 0
+        self.last_visible = 0
+        self.last_culled = 0
+
+    def add(self, mask):
+        visible = int(np.count_nonzero(mask))
+        self.visible += visible
+        self.culled += len(mask) - visible
+
+    def end_frame(self):
+        if self.visible or self.culled:
+            self.last_visible, self.last_culled = self.visible, self.culled
+        self.visible = self.culled = 0
+
+    def __str__(self):
+        return f"{self.last_visible} visible / {self.last_culled} culled"
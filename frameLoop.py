@@ -0,0 +1,102 @@
+"""Fixed-timestep simulation, frame pacing and pacing statistics for the main loop."""
+import time
+from collections import deque
+
+import numpy as np
+
+
+class FixedTimestep:
+    """Accumulates real time and hands it out as whole simulation steps.
+
+    `alpha` is how far the rendered frame is past the last step, as a fraction of a step, for
+    interpolating between the previous and current simulation state.
+    """
+
+    def __init__(self, step=1.0 / 120.0, max_steps=8):
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.steps = 0
+        self.dropped = 0.0  # seconds skipped after hitches
+
+    def advance(self, dt) -> int:
+        self.accumulator += dt
+        steps = int(self.accumulator / self.step)
+        if steps > self.max_steps:
+            # after a hitch, drop the backlog instead of spiralling into ever longer frames
+            self.dropped += (steps - self.max_steps) * self.step
+            steps = self.max_steps
+            self.accumulator = self.step * steps
+        self.accumulator = max(self.accumulator - steps * self.step, 0.0)
+        self.steps += steps
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        return min(self.accumulator / self.step, 1.0)
+
+
+class FramePacer:
+    """Holds frames to a target frame time.
+
+    Sleeps until shortly before the deadline, then spins for the rest; sleep alone overshoots by
+    up to a scheduler tick. Deadlines follow a fixed schedule so one slow frame is caught up by the
+    next; a frame more than a whole period late restarts the schedule.
+    """
+
+    def __init__(self, target_ms, spin_ms=1.5, clock=time.perf_counter, sleep=time.sleep):
+        self.period = target_ms / 1000.0
+        self.spin = spin_ms / 1000.0
+        self.clock = clock
+        self.sleep = sleep
+        self.deadline = None
+        self.late = 0
+
+    def wait(self):
+        now = self.clock()
+        if self.deadline is None:
+            self.deadline = now
+            return
+        self.deadline += self.period
+        if now >= self.deadline:
+            self.late += 1
+            if now - self.deadline > self.period:
+                self.deadline = now
+            return
+        remaining = self.deadline - now
+        if remaining > self.spin:
+            self.sleep(remaining - self.spin)
+        while self.clock() < self.deadline:
+            pass
+
+
+class PacingStats:
+    """Intervals between frame starts; jitter is how much they spread."""
+
+    def __init__(self, window=600, clock=time.perf_counter):
+        self.intervals = deque(maxlen=window)
+        self.clock = clock
+        self.last = None
+
+    def tick(self) -> float:
+        """Seconds since the previous tick (0 on the first)."""
+        now = self.clock()
+        dt = 0.0 if self.last is None else now - self.last
+        self.last = now
+        if dt:
+            self.intervals.append(dt)
+        return dt
+
+    def stats(self) -> dict:
+        """Frame interval mean / p50 / p99 and jitter (standard deviation), in ms."""
+        if not self.intervals:
+            return {}
+        ms = np.array(self.intervals) * 1000.0
+        p50, p99 = np.percentile(ms, (50, 99))
+        return {'mean': float(ms.mean()), 'p50': float(p50), 'p99': float(p99), 'jitter': float(ms.std())}
+
+    def report(self) -> str:
+        s = self.stats()
+        if not s:
+            return "pacing: no frames"
+        return f"frame {s['mean']:.2f} ms, jitter {s['jitter']:.2f} ms (p99 {s['p99']:.2f})"
@@ -5,18 +5,18 @@ class Ground(Model):
         super().__init__()
         self.size = 50.0   # half-extent of the ground
         self.ground_positions = np.array([
-            -self.size, 0.0, -self.size, 1.0,
-            self.size, 0.0, -self.size, 1.0,
-            self.size, 0.0,  self.size, 1.0,
-            -self.size, 0.0,  self.size, 1.0,
-        ], dtype=np.float32)
+            -self.size, 0.0, -self.size,
+            self.size, 0.0, -self.size,
+            self.size, 0.0,  self.size,
+            -self.size, 0.0,  self.size,
+        ], dtype=np.float32).reshape(-1, 3)
 
         self.ground_normals = np.array([
-            0.0, 1.0, 0.0, 0.0,
-            0.0, 1.0, 0.0, 0.0,
-            0.0, 1.0, 0.0, 0.0,
-            0.0, 1.0, 0.0, 0.0,
-        ], dtype=np.float32)
+            0.0, 1.0, 0.0,
+            0.0, 1.0, 0.0,
+            0.0, 1.0, 0.0,
+            0.0, 1.0, 0.0,
+        ], dtype=np.float32).reshape(-1, 3)
 
         # repeat UVs so the texture tiles across the plane
         self.repeat = 10.0
@@ -25,7 +25,7 @@ class Ground(Model):
             self.repeat, 0.0,
             self.repeat, self.repeat,
             0.0, self.repeat,
-        ], dtype=np.float32)
+        ], dtype=np.float32).reshape(-1, 2)
 
         self.ground_indices = np.array([0,1,2,  2,3,0], dtype=np.uint32)
 
@@ -33,4 +33,7 @@ class Ground(Model):
         self.ground = MeshEntry()
         self.ground.texture_id = self.read_texture(texure_path)
 
-        self.init_mesh(self.ground, self.ground_positions, self.ground_normals, self.ground_texcoords, self.ground_indices)
\ No newline at end of file
+        vertex_data = build_vertex_array(self.ground_positions, self.ground_normals, self.ground_texcoords,
+                                         self.vertex_format)
+        self.init_mesh(self.ground, vertex_data, self.ground_indices)
+        self.build_bvh(self.ground_positions[self.ground_indices.reshape(-1, 3)])
\ No newline at end of file
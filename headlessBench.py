@@ -0,0 +1,258 @@
+"""Offscreen render benchmark: no window, no mouse, optionally no GPU (Mesa llvmpipe / OSMesa).
+
+Loads the same scene as main.py into an offscreen framebuffer, replays a scripted orbit of the
+camera and light for a number of frames and writes a JSON report with load time, frame-time
+percentiles and per-pass CPU/GPU timings. Frames can be dumped as PNGs and compared against a
+directory of golden images.
+
+    python headlessBench.py --frames 300 --report bench.json
+    python headlessBench.py --model big.obj --dump-dir out --dump-every 50 --golden golden/
+    python headlessBench.py --stream-scene venue.obj --frames 600
+"""
+import argparse
+import ctypes
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+BACKENDS = ('egl', 'osmesa')
+
+
+def select_backend(backend):
+    """Must run before OpenGL is first imported: PyOpenGL binds its platform on import."""
+    os.environ['PYOPENGL_PLATFORM'] = backend
+    if backend == 'egl' and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        # Mesa otherwise tries X11 first and fails without a display
+        os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+
+def create_egl_context():
+    """Surfaceless GL 4.5 core context; everything renders into our own framebuffer objects."""
+    from OpenGL import EGL
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("eglInitialize failed")
+    attribs = (EGL.EGLint * 7)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                               EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_NONE)
+    config, count = EGL.EGLConfig(), EGL.EGLint()
+    if not EGL.eglChooseConfig(display, attribs, ctypes.pointer(config), 1, ctypes.pointer(count)) or not count.value:
+        raise RuntimeError("no EGL config with desktop OpenGL")
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context_attribs = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, 4, EGL.EGL_CONTEXT_MINOR_VERSION, 5,
+                                       EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                                       EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT, EGL.EGL_NONE)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, context_attribs)
+    if not context or not EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context):
+        raise RuntimeError("could not make a surfaceless EGL context current")
+    return display, context
+
+
+def create_osmesa_context(width, height):
+    """Software GL 3.3 core context from libOSMesa; it draws into a client-side buffer we never read."""
+    from OpenGL import GL, arrays, osmesa
+    attribs = arrays.GLintArray.asArray([osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA, osmesa.OSMESA_DEPTH_BITS, 24,
+                                         osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+                                         osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+                                         osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3, 0])
+    context = osmesa.OSMesaCreateContextAttribs(attribs, None)
+    if not context:
+        raise RuntimeError("OSMesaCreateContextAttribs failed")
+    buffer = arrays.GLubyteArray.zeros((height, width, 4))
+    if not osmesa.OSMesaMakeCurrent(context, buffer, GL.GL_UNSIGNED_BYTE, width, height):
+        raise RuntimeError("OSMesaMakeCurrent failed")
+    return context, buffer
+
+
+class OffscreenTarget:
+    """Color + depth renderbuffers in one framebuffer object, read back as an RGB image."""
+
+    def __init__(self, width, height):
+        from OpenGL.GL import (GL_COLOR_ATTACHMENT0, GL_DEPTH24_STENCIL8, GL_DEPTH_STENCIL_ATTACHMENT,
+                               GL_FRAMEBUFFER, GL_FRAMEBUFFER_COMPLETE, GL_RENDERBUFFER, GL_RGBA8,
+                               glBindFramebuffer, glBindRenderbuffer, glCheckFramebufferStatus,
+                               glFramebufferRenderbuffer, glGenFramebuffers, glGenRenderbuffers,
+                               glRenderbufferStorage)
+        self.width, self.height = width, height
+        self.fbo = glGenFramebuffers(1)
+        self.color, self.depth = glGenRenderbuffers(2)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        for rb, fmt, attachment in ((self.color, GL_RGBA8, GL_COLOR_ATTACHMENT0),
+                                    (self.depth, GL_DEPTH24_STENCIL8, GL_DEPTH_STENCIL_ATTACHMENT)):
+            glBindRenderbuffer(GL_RENDERBUFFER, rb)
+            glRenderbufferStorage(GL_RENDERBUFFER, fmt, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment, GL_RENDERBUFFER, rb)
+        assert glCheckFramebufferStatus(GL_FRAMEBUFFER) == GL_FRAMEBUFFER_COMPLETE
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    def read(self) -> np.ndarray:
+        """(height, width, 3) uint8, top row first."""
+        from OpenGL.GL import GL_FRAMEBUFFER, GL_PACK_ALIGNMENT, GL_RGB, GL_UNSIGNED_BYTE, \
+            glBindFramebuffer, glPixelStorei, glReadPixels
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)[::-1]
+
+
+def scripted_pose(camera, light, t, radius=14.0, height=6.0):
+    """Camera on an orbit around the origin looking at it, light sweeping once around; t in [0, 1)."""
+    import glm
+    angle = 2.0 * math.pi * t
+    camera.pos = glm.vec3(radius * math.sin(angle), height, radius * math.cos(angle))
+    camera.front = glm.normalize(glm.vec3(0.0, 1.0, 0.0) - camera.pos)
+    light.yaw = 360.0 * t
+    light.pitch = -60.0 + 15.0 * math.sin(angle)
+    light.update_from_angles()
+
+
+def compare_images(image, golden, threshold=8):
+    """Mean absolute difference (0-255) and fraction of pixels with any channel off by more than threshold."""
+    diff = np.abs(image.astype(np.int16) - golden.astype(np.int16))
+    return float(diff.mean()), float(np.mean(diff.max(axis=2) > threshold))
+
+
+def run(args):
+    select_backend(args.backend)
+    if args.backend == 'egl':
+        context = create_egl_context()
+    else:
+        context = create_osmesa_context(args.width, args.height)
+
+    from OpenGL.GL import GL_RENDERER, GL_VERSION, glFinish, glGetString
+    from constants import shadowSettings, streamingSettings, windowSize
+    from profiler import profiler
+    import main as app
+
+    windowSize.x, windowSize.y = args.width, args.height
+    if args.shadow_quality:
+        shadowSettings.quality = args.shadow_quality
+    if args.stream_scene:
+        streamingSettings.scene_path = args.stream_scene
+
+    start = time.perf_counter()
+    app.init_scene(args.model)
+    scene_seconds = time.perf_counter() - start
+    if not app.asset_loader.wait(timeout=args.load_timeout) or app.asset_loader.errors:
+        print(f"Failed to load {args.model}: {app.asset_loader.errors or 'timed out'}", file=sys.stderr)
+        return 1
+    streamer = app.chunk_streamer
+    while streamer and streamer.source is None and not streamer.errors:
+        streamer.process_uploads()
+        time.sleep(0.001)
+    if streamer and streamer.errors:
+        print(f"Failed to stream {args.stream_scene}: {streamer.errors}", file=sys.stderr)
+        return 1
+    load_seconds = time.perf_counter() - start
+    app.asset_loader.shutdown()
+    target = OffscreenTarget(args.width, args.height)
+
+    if args.dump_dir:
+        os.makedirs(args.dump_dir, exist_ok=True)
+    images = []
+    total = args.warmup + args.frames
+    for i in range(total):
+        if i == args.warmup:
+            profiler.toggle()
+        profiler.begin_frame()
+        previous = app.camera.pos
+        scripted_pose(app.camera, app.light, (i - args.warmup) / args.frames)
+        if streamer:
+            with profiler.scope("uploads"):
+                # as if the orbit ran at 60 frames per second
+                streamer.update(app.camera.pos, (app.camera.pos - previous) * 60.0)
+        app.draw_scene(target.fbo)
+        with profiler.scope("finish"):
+            # no swap to wait on: block until the GPU is done so frame times are complete
+            glFinish()
+        profiler.end_frame()
+        if i == total - 1:
+            profiler.finish()
+        frame = i - args.warmup
+        if frame >= 0 and args.dump_every and frame % args.dump_every == 0:
+            name = f"frame_{frame:05d}.png"
+            image = target.read()
+            entry = {'name': name}
+            if args.dump_dir:
+                Image.fromarray(image).save(os.path.join(args.dump_dir, name))
+            if args.golden:
+                golden_path = os.path.join(args.golden, name)
+                if os.path.exists(golden_path):
+                    golden = np.asarray(Image.open(golden_path).convert('RGB'))
+                    if golden.shape != image.shape:
+                        entry.update(mean_abs_diff=None, passed=False, error="size mismatch")
+                    else:
+                        mean_diff, bad = compare_images(image, golden, args.pixel_threshold)
+                        entry.update(mean_abs_diff=mean_diff, bad_pixels=bad, passed=bad <= args.max_bad_pixels)
+                else:
+                    entry.update(passed=False, error="no golden image")
+            images.append(entry)
+
+    stats = profiler.stats()
+    frame_ms = profiler._series('cpu', 'frame')
+    report = {
+        'backend': args.backend,
+        'renderer': glGetString(GL_RENDERER).decode(),
+        'gl_version': glGetString(GL_VERSION).decode(),
+        'size': [args.width, args.height],
+        'model': args.model,
+        'shadow_quality': shadowSettings.quality,
+        'frames': args.frames,
+        'warmup': args.warmup,
+        'load_seconds': load_seconds,
+        'scene_init_seconds': scene_seconds,
+        'frame_ms': {**stats['cpu'].pop('frame'), 'mean': float(frame_ms.mean()), 'max': float(frame_ms.max())},
+        'passes_cpu_ms': stats['cpu'],
+        'passes_gpu_ms': stats['gpu'],
+        'counters': stats['counters'],
+        'images': images,
+    }
+    if streamer:
+        report['streaming'] = streamer.stats()
+        streamer.shutdown()
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(text)
+        print(f"Wrote {args.report}")
+    else:
+        print(text)
+    if args.csv:
+        profiler.export_csv(args.csv)
+    failed = [entry['name'] for entry in images if entry.get('passed') is False]
+    if failed:
+        print(f"{len(failed)} frame(s) differ from the golden images: {', '.join(failed)}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--backend', choices=BACKENDS, default='egl',
+                        help="egl: surfaceless EGL (GPU or Mesa llvmpipe); osmesa: libOSMesa software rendering")
+    parser.add_argument('--model', default="models/piano.obj")
+    parser.add_argument('--width', type=int, default=960)
+    parser.add_argument('--height', type=int, default=540)
+    parser.add_argument('--frames', type=int, default=120, help="measured frames, one full orbit")
+    parser.add_argument('--warmup', type=int, default=10, help="frames rendered before measuring")
+    parser.add_argument('--shadow-quality', help="hard, pcf3x3, pcss-low or pcss-high (default: constants.py)")
+    parser.add_argument('--load-timeout', type=float, default=600.0)
+    parser.add_argument('--stream-scene', help="OBJ streamed in chunks around the camera (constants.StreamingSettings)")
+    parser.add_argument('--report', help="JSON report path (default: stdout)")
+    parser.add_argument('--csv', help="also write per-frame profiler rows")
+    parser.add_argument('--dump-every', type=int, default=0, help="read back every Nth measured frame")
+    parser.add_argument('--dump-dir', help="write the read-back frames as PNGs")
+    parser.add_argument('--golden', help="directory of PNGs with the same names to compare against")
+    parser.add_argument('--pixel-threshold', type=int, default=8, help="per-channel difference that counts")
+    parser.add_argument('--max-bad-pixels', type=float, default=0.001, help="allowed fraction of differing pixels")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
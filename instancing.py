@@ -0,0 +1,129 @@
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+
+# Per-instance attributes: model matrix columns at locations 3-6, normal matrix columns at 7-9
+INSTANCE_LOCATION = 3
+INSTANCE_FLOATS = 16 + 9
+INSTANCE_STRIDE = INSTANCE_FLOATS * 4
+
+
+def as_transforms(matrices) -> np.ndarray:
+    """(N, 4, 4) float32 [row, column] from one glm.mat4 / (4, 4) array or an (N, 4, 4) array."""
+    return np.asarray(matrices, dtype=np.float32).reshape(-1, 4, 4)
+
+
+def normal_matrices(transforms) -> np.ndarray:
+    """(N, 3, 3) inverse-transpose of each upper 3x3, indexed [row, column] like the input.
+
+    For columns a, b, c the inverse transpose has columns (b x c, c x a, a x b) / det, which is
+    three batched cross products instead of N matrix inversions.
+    """
+    m = np.asarray(transforms, dtype=np.float32)[:, :3, :3]
+    a, b, c = m[:, :, 0], m[:, :, 1], m[:, :, 2]
+    cofactor = np.stack((np.cross(b, c), np.cross(c, a), np.cross(a, b)), axis=2)
+    det = (a * cofactor[:, :, 0]).sum(axis=1)
+    # singular matrices keep the (unnormalized) cofactor; the fragment shader normalizes anyway
+    return cofactor / np.where(det != 0, det, 1.0)[:, None, None]
+
+
+def pack_instances(transforms, normals=None) -> np.ndarray:
+    """(N, INSTANCE_FLOATS) float32 rows: column-major model matrix, then column-major normal matrix.
+
+    `normals` are (N, 3, 3) normal matrices already computed (sceneGraph.TransformTree).
+    """
+    t = as_transforms(transforms)
+    data = np.empty((len(t), INSTANCE_FLOATS), dtype=np.float32)
+    data[:, :16] = t.transpose(0, 2, 1).reshape(-1, 16)
+    normals = normal_matrices(t) if normals is None else np.asarray(normals, dtype=np.float32).reshape(-1, 3, 3)
+    data[:, 16:] = normals.transpose(0, 2, 1).reshape(-1, 9)
+    return data
+
+
+def changed_ranges(old, new, max_ranges=64):
+    """[(start, stop), ...] instance ranges of `new` that differ from `old`.
+
+    Runs separated by the smallest gaps are merged so there are at most `max_ranges` uploads.
+    """
+    if old is None:
+        return [(0, len(new))] if len(new) else []
+    shared = min(len(old), len(new))
+    idx = np.flatnonzero(np.any(old[:shared] != new[:shared], axis=1))
+    ranges = []
+    if len(idx):
+        gaps = np.diff(idx) - 1
+        breaks = np.flatnonzero(gaps > 0)
+        if len(breaks) >= max_ranges:
+            breaks = np.sort(breaks[np.argsort(gaps[breaks], kind='stable')[len(breaks) - max_ranges + 1:]])
+        starts = idx[np.concatenate(([0], breaks + 1))]
+        stops = idx[np.concatenate((breaks, [len(idx) - 1]))] + 1
+        ranges = list(zip(starts.tolist(), stops.tolist()))
+    if len(new) > shared:
+        ranges.append((shared, len(new)))
+    return ranges
+
+
+class InstanceBuffer:
+    """Per-instance transforms of one model in a GL buffer; only changed instance ranges are re-uploaded."""
+
+    def __init__(self):
+        self.vbo = glGenBuffers(1)
+        self.capacity = 0
+        self.count = 0
+        self.transforms = None  # last input, to skip repacking unchanged frames
+        self.data = None        # packed rows currently in the buffer
+        self.uploads = 0
+        self.uploaded_bytes = 0
+
+    def attach(self, vao):
+        """Point the per-instance attributes of `vao` at this buffer (divisor 1)."""
+        glBindVertexArray(vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        for i in range(4):
+            glEnableVertexAttribArray(INSTANCE_LOCATION + i)
+            glVertexAttribPointer(INSTANCE_LOCATION + i, 4, GL_FLOAT, GL_FALSE, INSTANCE_STRIDE,
+                                  ctypes.c_void_p(16 * i))
+            glVertexAttribDivisor(INSTANCE_LOCATION + i, 1)
+        for i in range(3):
+            glEnableVertexAttribArray(INSTANCE_LOCATION + 4 + i)
+            glVertexAttribPointer(INSTANCE_LOCATION + 4 + i, 3, GL_FLOAT, GL_FALSE, INSTANCE_STRIDE,
+                                  ctypes.c_void_p(64 + 12 * i))
+            glVertexAttribDivisor(INSTANCE_LOCATION + 4 + i, 1)
+        glBindVertexArray(0)
+
+    def update(self, transforms, normals=None):
+        """Make the buffer hold `transforms` ((N, 4, 4) [row, column]); returns the instance count."""
+        transforms = as_transforms(transforms)
+        if self.transforms is not None and np.array_equal(transforms, self.transforms):
+            return self.count
+        data = pack_instances(transforms, normals)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        if len(data) > self.capacity:
+            # grow geometrically; the whole buffer is rewritten
+            self.capacity = max(len(data), 2 * self.capacity)
+            glBufferData(GL_ARRAY_BUFFER, self.capacity * INSTANCE_STRIDE, None, GL_DYNAMIC_DRAW)
+            ranges = [(0, len(data))]
+        else:
+            ranges = changed_ranges(self.data, data)
+        for start, stop in ranges:
+            glBufferSubData(GL_ARRAY_BUFFER, start * INSTANCE_STRIDE, (stop - start) * INSTANCE_STRIDE, data[start:stop])
+            self.uploads += 1
+            self.uploaded_bytes += (stop - start) * INSTANCE_STRIDE
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.transforms = transforms.copy()
+        self.data = data
+        self.count = len(data)
+        return self.count
+
+    def delete(self):
+        glDeleteBuffers(1, [self.vbo])
+
+
+def grid_transforms(rows, cols, spacing, y=0.0) -> np.ndarray:
+    """(rows * cols, 4, 4) translations on a grid centred on the origin, e.g. a hall of pianos."""
+    x, z = np.meshgrid((np.arange(cols) - (cols - 1) / 2.0) * spacing,
+                       (np.arange(rows) - (rows - 1) / 2.0) * spacing)
+    transforms = np.tile(np.eye(4, dtype=np.float32), (rows * cols, 1, 1))
+    transforms[:, 0, 3], transforms[:, 1, 3], transforms[:, 2, 3] = x.ravel(), y, z.ravel()
+    return transforms
@@ -1,8 +1,12 @@
 from OpenGL.GL import *
 import glm
+import numpy as np
 from shaderProgram import ShaderProgram
+from uniformBuffer import UniformBuffer
 import pygame
 from helper import clamp
+from cascades import MAX_CASCADES, cascade_matrices
+from constants import ShadowSettings, shadowSettings
 
 class Light:
     def __init__(self, distance = 10.0):
@@ -56,17 +60,36 @@ class Light:
         # now recompute dir & pos
         self.update_from_angles()
 
+    def shadow_key(self):
+        """Everything update_from_angles derives the light frustum from."""
+        return self.pitch, self.yaw, self.distance, self.ortho_size
+
     def calculate_light_space_matrix(self):
         ortho = self.ortho_size
         lightProj = glm.ortho(-ortho, ortho, -ortho, ortho, 1.0, 50.0)
         lightView = glm.lookAt(self.light_pos, glm.vec3(0.0), glm.vec3(0.0, 1.0, 0.0))
         light_space_matrix = lightProj * lightView
         return light_space_matrix
-    
-    def set_up_in_scene(self, shader: ShaderProgram, camera_pos, light_space_matrix):
-        shader.set_vec3("lightPos", self.light_pos)
-        shader.set_vec3("viewPos", camera_pos)
-        shader.set_mat4("lightSpaceMatrix", light_space_matrix)
-        shader.set_float("lightRadius", 64.0)      # np. 1.0 jednostki
-        shader.set_int("blockerSamples", 32)    # 16 próbek na blocker search
-        shader.set_int("pcfSamples", 32)    # 32 próbek końcowego PCF
\ No newline at end of file
+
+    def calculate_light_space_matrices(self, camera, aspect_ratio, settings: ShadowSettings = shadowSettings):
+        """Light-space matrix per shadow cascade (N, 4, 4) and the view-space depth each cascade ends at."""
+        if not settings.cascaded:
+            return np.asarray(self.calculate_light_space_matrix(), dtype=np.float32)[None], np.array([camera.far])
+        matrices, splits = cascade_matrices(camera.view_matrix(), np.radians(camera.fov), aspect_ratio,
+                                            camera.near, camera.far, self.light_dir,
+                                            settings.cascades, settings.resolution, settings.split_blend)
+        return matrices.astype(np.float32), splits
+
+    def set_up_in_frame(self, frame: UniformBuffer, light_space_matrices, splits):
+        count = len(light_space_matrices)
+        matrices = np.zeros((MAX_CASCADES, 4, 4), dtype=np.float32)
+        matrices[:count] = light_space_matrices
+        frame["lightPos"] = self.light_pos
+        frame["lightSpaceMatrices"] = matrices
+        frame["cascadeSplits"] = np.pad(splits, (0, MAX_CASCADES - count), mode='edge')
+        frame["cascadeCount"] = count
+
+    def set_up_in_scene(self, shader: ShaderProgram):
+        # sample counts are compile-time per quality tier (shadowMap.SHADOW_TIERS)
+        if shader.has_uniform("lightRadius"):
+            shader.set_float("lightRadius", 64.0)      # np. 1.0 jednostki
\ No newline at end of file
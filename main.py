@@ -7,38 +7,69 @@ import glm
 import math
 import numpy as np
 
-from constants import windowSize
+from constants import loopSettings, shadowSettings, streamingSettings, windowSize
 from shaderProgram import ShaderProgram
 from camera import Camera
-from model import Model
+from model import Model, draw_counter
 from ground import Ground
-from shadowMap import ShadowMap
+from shadowMap import SHADOW_TIERS, ShadowMap
 from light import Light
+from textureManager import texture_manager
+from assetLoader import AssetLoader
+from chunkStreaming import ChunkStreamer, GLChunkUploader
+from culling import CullCounter
+from frameLoop import FixedTimestep, FramePacer, PacingStats
+from sceneGraph import TransformTree
+from renderQueue import PASS_MAIN, RenderQueue
+from profiler import profiler
+from uniformBuffer import FRAME_BINDING, FRAME_BLOCK, FRAME_LAYOUT, UniformBuffer
 
 # Global state
 aspect_ratio = 1.0
 sp: ShaderProgram
+shadow_programs: dict
 depth_shader: ShaderProgram
 camera: Camera
 piano: Model
 ground: Ground
 shadow_map: ShadowMap
 light: Light
+asset_loader: AssetLoader
+frame_uniforms: UniformBuffer
+scene: TransformTree
+render_queue: RenderQueue
+piano_node: int
+ground_node: int
+chunk_streamer = None  # ChunkStreamer when streamingSettings.scene_path is set
+chunks_node: int
+main_culling = CullCounter()
+shadow_culling = CullCounter()
 
 def clamp(val, lo, hi):
     return max(lo, min(val, hi))
 
 
 def init_pygame_opengl():
-    global sp, camera, aspect_ratio, piano, depth_shader, ground, shadow_map, light
-
     # Initialize Pygame and OpenGL context
     pygame.init()
     screen = pygame.display.set_mode(
         (int(windowSize.x), int(windowSize.y)),
-        DOUBLEBUF | OPENGL | RESIZABLE
+        DOUBLEBUF | OPENGL | RESIZABLE,
+        vsync=1 if loopSettings.mode == "vsync" else 0
     )
     pygame.display.set_caption("OpenGL with Pygame")
+    init_scene()
+
+    # Mouse settings
+    pygame.event.set_grab(True)
+    pygame.mouse.set_visible(False)
+    camera.first_mouse_move = True
+
+
+def init_scene(model_path="models/piano.obj"):
+    """GL state, shaders and scene objects in the current context (window or offscreen)."""
+    global sp, camera, aspect_ratio, piano, depth_shader, ground, shadow_map, light, asset_loader, frame_uniforms, \
+        shadow_programs, scene, piano_node, ground_node, render_queue, chunk_streamer, chunks_node
 
     # OpenGL setup
     glClearColor(0.1, 0.1, 0.1, 1.0)
@@ -46,35 +77,115 @@ def init_pygame_opengl():
     glDisable(GL_CULL_FACE)
 
     # Load shader program, shadow map and model
-    shadow_map = ShadowMap()
+    shadow_map = ShadowMap(shadowSettings.resolution, shadowSettings.cascades if shadowSettings.cascaded else 1)
     light = Light()
-    sp = ShaderProgram("shaders/vertex_shader.glsl", None, "shaders/fragment_shader.glsl")
+    # one program per shadow quality tier, switched at runtime with keys 1-4
+    shadow_programs = {tier.name: ShaderProgram("shaders/vertex_shader.glsl", None, "shaders/fragment_shader.glsl",
+                                                defines=tier.defines)
+                       for tier in SHADOW_TIERS}
+    sp = shadow_programs[shadowSettings.quality]
     depth_shader = ShaderProgram("shaders/depth_vertex.glsl", None, "shaders/depth_fragment.glsl")
+    # camera/light matrices shared by both programs, uploaded once per frame
+    frame_uniforms = UniformBuffer(FRAME_LAYOUT, FRAME_BINDING)
+    for program in shadow_programs.values():
+        program.bind_uniform_block(FRAME_BLOCK, FRAME_BINDING)
+    depth_shader.bind_uniform_block(FRAME_BLOCK, FRAME_BINDING)
     piano = Model()
     ground = Ground("textures/wood-floor-texture.png")
-    if not piano.load_model("models/piano.obj"):
-        print("Failed to load model", file=sys.stderr)
-        sys.exit(1)
-    # Camera after knowing window size
-    width, height = pygame.display.get_surface().get_size()
-    aspect_ratio = width / height
+    # draws of all passes, sorted by state; each pass is a (GPU-timed) profiler scope
+    render_queue = RenderQueue(scope=lambda name: profiler.scope(name, gpu=True))
+    # world and normal matrices are recomputed only when a local transform changes
+    scene = TransformTree()
+    piano_node = scene.add()
+    ground_node = scene.add(glm.translate(glm.mat4(1.0), glm.vec3(0.0, -1.5, 0.0)))
+    # chunks are cut in world space; their node stays at the identity
+    chunks_node = scene.add()
+    # parsed and decoded in the background, uploaded a few ms per frame
+    asset_loader = AssetLoader()
+    asset_loader.load_model(piano, model_path,
+                            on_loaded=lambda model: print(texture_manager.report()))
+    if streamingSettings.scene_path:
+        chunk_streamer = ChunkStreamer(int(streamingSettings.gpu_budget_mb * 2**20), streamingSettings.load_radius,
+                                       streamingSettings.evict_radius, streamingSettings.look_ahead_s,
+                                       uploader=GLChunkUploader(render_queue),
+                                       max_in_flight=streamingSettings.max_in_flight)
+        chunk_streamer.open_obj(streamingSettings.scene_path, streamingSettings.cell_size)
+    aspect_ratio = windowSize.x / windowSize.y
     camera = Camera(windowSize)
+    track_profiler_counters()
 
-    # Mouse settings
-    pygame.event.set_grab(True)
-    pygame.mouse.set_visible(False)
-    camera.first_mouse_move = True
+
+def track_profiler_counters():
+    programs = list(shadow_programs.values()) + [depth_shader]
+    models = (piano, ground)
+
+    def uploaded_bytes():
+        # geometry, per-instance transforms, frame UBO and textures
+        return (sum(m.uploaded_bytes + (m.instances.uploaded_bytes if m.instances else 0) for m in models)
+                + frame_uniforms.uploaded_bytes + texture_manager.uploaded_bytes
+                + (chunk_streamer.uploaded_bytes if chunk_streamer else 0))
+
+    profiler.track("draw calls", lambda: draw_counter.total)
+    profiler.track("state changes", lambda: draw_counter.binds + ShaderProgram.binds)
+    profiler.track("uniform uploads", lambda: sum(p.uploads for p in programs) + frame_uniforms.uploads)
+    profiler.track("bytes uploaded", uploaded_bytes)
+    profiler.track("redundant binds skipped", lambda: render_queue.redundant)
+    if chunk_streamer:
+        profiler.track("chunk loads", lambda: chunk_streamer.loads)
+        profiler.track("chunk evictions", lambda: chunk_streamer.evictions)
+        profiler.track("chunk stall frames", lambda: chunk_streamer.stall_frames)
+
+
+def export_profile():
+    profiler.export_csv("profile.csv")
+    profiler.export_chrome_trace("profile_trace.json")
+    print(profiler.summary())
 
 
 def process_input(dt):
     camera_displacement = camera.process_keyboard_input(dt)
     camera.check_for_collision(piano, camera_displacement)
-    camera.check_if_out_of_bounds(ground.size)
+    camera.check_if_out_of_bounds(world_size())
     light.process_keyboard_input(dt)
 
 
-def handle_mouse_motion(dt):
-    camera.process_mouse_movement(dt)
+def world_size():
+    """Half-extent the camera may roam: the ground, or the streamed scene where it reaches farther."""
+    if chunk_streamer is None or chunk_streamer.source is None:
+        return ground.size
+    source = chunk_streamer.source
+    extent = np.abs(np.concatenate((source.box_min, source.box_max))[:, [0, 2]]).max()
+    return max(ground.size, float(extent) + camera.boundary_margin)
+
+
+def handle_mouse_motion():
+    # once per frame: get_rel sums every movement since the last call
+    camera.process_mouse_movement(*pygame.mouse.get_rel())
+
+
+def simulation_state():
+    """What the fixed steps move and rendering interpolates: camera position and light angles."""
+    return glm.vec3(camera.pos), light.yaw, light.pitch
+
+
+def apply_state(state):
+    camera.pos = glm.vec3(state[0])
+    light.yaw, light.pitch = state[1], state[2]
+    light.update_from_angles()
+
+
+def interpolate_state(previous, current, alpha):
+    return (glm.mix(previous[0], current[0], alpha),
+            previous[1] + (current[1] - previous[1]) * alpha,
+            previous[2] + (current[2] - previous[2]) * alpha)
+
+
+def select_shadow_quality(key):
+    global sp
+    tier = SHADOW_TIERS[key - K_1]
+    shadowSettings.quality = tier.name
+    sp = shadow_programs[tier.name]
+    print(f"Shadow quality: {tier.name}")
 
 
 def resize_viewport(event):
@@ -86,53 +197,125 @@ def resize_viewport(event):
     glViewport(0, 0, width, height)
 
 
-def draw_scene():
-    # build matrices
-    M = glm.mat4(1.0)
-    ground_M = glm.mat4(1.0)
-    ground_M = glm.translate(ground_M, glm.vec3(0.0, -1.5, 0.0))
-
-    light_space_matrix = light.calculate_light_space_matrix()
-    
-    # render
-    shadow_map.render(ground, depth_shader, sp, light_space_matrix, model_matrix=ground_M)
-    shadow_map.render(piano, depth_shader, sp, light_space_matrix, model_matrix=M)
-
+def begin_main_pass(framebuffer, program):
     glViewport(0, 0, windowSize.x, windowSize.y)
-    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+    draw_counter.bind()
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    sp.use()
-    # camera
-    camera.set_up_in_scene(sp, aspect_ratio)
     # light
-    light.set_up_in_scene(sp, camera.pos, light_space_matrix)
-    shadow_map.set_up_in_scene(sp)
-    piano.draw(sp, M)
-    ground.draw(sp, ground_M)
-    pygame.display.flip()
+    light.set_up_in_scene(program)
+    shadow_map.set_up_in_scene(program)
+    program.set_int("textureMap0", 0)
+
+
+def draw_scene(framebuffer=0):
+    scene.update()
+    piano_nodes, ground_nodes = [piano_node], [ground_node]
+    M, piano_normals = scene.world(piano_nodes), scene.normal(piano_nodes)
+    ground_M, ground_normals = scene.world(ground_nodes), scene.normal(ground_nodes)
+    chunks = chunk_streamer.models() if chunk_streamer else []
+    chunks_M, chunks_normals = scene.world([chunks_node]), scene.normal([chunks_node])
+
+    with profiler.scope("frame data"):
+        light_space_matrices, cascade_splits = light.calculate_light_space_matrices(camera, aspect_ratio)
+        camera.set_up_in_scene(frame_uniforms, aspect_ratio)
+        light.set_up_in_frame(frame_uniforms, light_space_matrices, cascade_splits)
+        frame_uniforms.upload()
+
+    with profiler.scope("submit"):
+        render_queue.begin_frame(camera.pos, camera.far)
+        # cascades follow the camera, so their matrices are part of the dirty key
+        casters = [(ground, ground_M, ground_normals), (piano, M, piano_normals)]
+        casters += [(chunk, chunks_M, chunks_normals) for chunk in chunks]
+        shadow_map.submit(render_queue, casters, depth_shader, (light.shadow_key(), light_space_matrices.tobytes()),
+                          light_space_matrices, shadow_culling)
+        program = sp
+        render_queue.begin_pass(PASS_MAIN, lambda: begin_main_pass(framebuffer, program), program, "main pass")
+        piano.submit(render_queue, PASS_MAIN, program, M, camera.view_projection, main_culling, camera,
+                     piano_normals)
+        ground.submit(render_queue, PASS_MAIN, program, ground_M, camera.view_projection, main_culling,
+                      normals=ground_normals)
+        for chunk in chunks:
+            chunk.submit(render_queue, PASS_MAIN, program, chunks_M, camera.view_projection, main_culling,
+                         normals=chunks_normals)
+    render_queue.execute()
+    draw_counter.end_frame()
+    main_culling.end_frame()
+    shadow_culling.end_frame()
 
 
 def main():
     init_pygame_opengl()
-    clock = pygame.time.Clock()
+    timestep = FixedTimestep(1.0 / loopSettings.simulation_hz, loopSettings.max_steps)
+    pacer = FramePacer(loopSettings.target_ms, loopSettings.spin_ms) if loopSettings.mode == "target" else None
+    pacing = PacingStats()
+    previous_state = simulation_state()
 
+    last_report = pygame.time.get_ticks()
     running = True
     while running:
-        dt = clock.tick(60) / 1000.0  # seconds
-
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                running = False
-            elif event.type == VIDEORESIZE:
-                resize_viewport(event)
-            elif event.type == KEYDOWN and event.key == K_ESCAPE:
-                running = False
-            elif event.type == MOUSEMOTION:
-                handle_mouse_motion(dt)
-
-        process_input(dt)
+        profiler.begin_frame()
+        with profiler.scope("wait"):
+            if pacer:
+                pacer.wait()
+        dt = pacing.tick()  # seconds
+
+        with profiler.scope("input"):
+            mouse_moved = False
+            for event in pygame.event.get():
+                if event.type == QUIT:
+                    running = False
+                elif event.type == VIDEORESIZE:
+                    resize_viewport(event)
+                elif event.type == KEYDOWN and event.key == K_ESCAPE:
+                    running = False
+                elif event.type == KEYDOWN and K_1 <= event.key < K_1 + len(SHADOW_TIERS):
+                    select_shadow_quality(event.key)
+                elif event.type == KEYDOWN and event.key == K_F3:
+                    profiler.toggle()
+                elif event.type == KEYDOWN and event.key == K_F4:
+                    export_profile()
+                elif event.type == MOUSEMOTION:
+                    mouse_moved = True
+            if mouse_moved:
+                handle_mouse_motion()
+
+        with profiler.scope("uploads"):
+            asset_loader.process_uploads()
+            if chunk_streamer:
+                # velocity of the last simulation step: loads run ahead of the movement
+                chunk_streamer.update(camera.pos, camera.velocity)
+        if asset_loader.errors:
+            print("Failed to load model", file=sys.stderr)
+            sys.exit(1)
+
+        with profiler.scope("update"):
+            for _ in range(timestep.advance(dt)):
+                previous_state = simulation_state()
+                process_input(timestep.step)
+        # render between the last two simulation states, then put the simulation back
+        current_state = simulation_state()
+        apply_state(interpolate_state(previous_state, current_state, timestep.alpha))
         draw_scene()
+        apply_state(current_state)
+        with profiler.scope("swap"):
+            pygame.display.flip()
+        profiler.end_frame()
+
+        if pygame.time.get_ticks() - last_report >= 1000:
+            last_report = pygame.time.get_ticks()
+            pygame.display.set_caption(f"OpenGL with Pygame | {draw_counter.last_frame} draw calls/frame"
+                                       f" | {shadow_map.report()}"
+                                       f" | meshes {main_culling} (shadow {shadow_culling})"
+                                       f" | piano LOD {piano.lod}"
+                                       f" | {render_queue.report()}"
+                                       + (f" | {chunk_streamer.report()}" if chunk_streamer else "") +
+                                       f" | {loopSettings.mode}: {pacing.report()}"
+                                       + (f" | {profiler.report()}" if profiler.enabled else ""))
 
+    asset_loader.shutdown()
+    if chunk_streamer:
+        chunk_streamer.shutdown()
     pygame.quit()
     sys.exit(0)
 
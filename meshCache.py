@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from meshOptimizer import MeshStats
+from objLoader import Material, Mesh, Vector3
+
+# Bump whenever the file layout or the loader output changes
+CACHE_VERSION = 4
+MAGIC = b'OBJCACHE'
+ALIGN = 64
+# Work the offline CLI (meshSimplifier.py) bakes into a cache: a model that does not ask for it
+# still takes the cache, and uses what is there
+OFFLINE_OPTIONS = ('optimize_meshes', 'lod_ratios')
+
+
+@dataclass
+class CachedModel:
+    meshes: List[Mesh]
+    materials: List[Material]
+    box_min: np.ndarray
+    box_max: np.ndarray
+
+
+def cache_path(source: str) -> str:
+    return source + '.meshcache'
+
+
+def _file_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _dependency(path: str) -> dict:
+    if not os.path.exists(path):
+        # an mtllib that is not there (yet): creating it makes the cache stale
+        return {'path': os.path.abspath(path), 'missing': True}
+    st = os.stat(path)
+    return {'path': os.path.abspath(path), 'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+            'hash': _file_hash(path)}
+
+
+def _dependency_valid(dep: dict) -> bool:
+    if dep.get('missing'):
+        return not os.path.exists(dep['path'])
+    try:
+        st = os.stat(dep['path'])
+    except OSError:
+        return False
+    if st.st_mtime_ns == dep['mtime_ns'] and st.st_size == dep['size']:
+        return True
+    # touched or copied: only the content decides
+    return st.st_size == dep['size'] and _file_hash(dep['path']) == dep['hash']
+
+
+def _options_match(stored: dict, wanted: dict) -> bool:
+    if stored.keys() != wanted.keys():
+        return False
+    return all(stored[k] == v or (k in OFFLINE_OPTIONS and not v) for k, v in wanted.items())
+
+
+def _material_from_dict(d: Optional[dict]) -> Optional[Material]:
+    if d is None:
+        return None
+    return Material(**{k: Vector3(**v) if isinstance(v, dict) else v for k, v in d.items()})
+
+
+def save(source: str, meshes: List[Mesh], materials: List[Material], mtl_paths: List[str],
+         box_min, box_max, options: dict) -> bool:
+    """Write the flattened meshes of `source` to its cache file (atomically)."""
+    arrays = [mesh.as_arrays() for mesh in meshes]
+    records = []
+    lod_arrays = []
+    v_base = i_base = l_base = 0
+    for mesh, (positions, _, _, indices) in zip(meshes, arrays):
+        lods = []
+        for level in mesh.lods or []:
+            lods.append([l_base, l_base + len(level)])
+            lod_arrays.append(np.asarray(level, dtype=np.uint32))
+            l_base += len(level)
+        records.append({
+            'name': mesh.name,
+            'material': asdict(mesh.materials) if mesh.materials else None,
+            'vertices': [v_base, v_base + len(positions)],
+            'indices': [i_base, i_base + len(indices)],
+            'stats': asdict(mesh.stats) if mesh.stats else None,
+            'lods': lods,
+            'lod_errors': mesh.lod_errors,
+        })
+        v_base += len(positions)
+        i_base += len(indices)
+
+    def stack(k, width, dtype):
+        parts = [np.asarray(a[k], dtype=dtype).reshape(-1, width) for a in arrays]
+        return np.concatenate(parts) if parts else np.zeros((0, width), dtype)
+
+    blobs = {
+        'positions': stack(0, 3, np.float32),
+        'normals': stack(1, 3, np.float32),
+        'texcoords': stack(2, 2, np.float32),
+        'indices': stack(3, 1, np.uint32).ravel(),
+        'lod_indices': np.concatenate(lod_arrays) if lod_arrays else np.zeros(0, np.uint32),
+    }
+    try:
+        deps = [_dependency(source)] + [_dependency(p) for p in mtl_paths]
+    except OSError as e:
+        print(f"Warning: cannot fingerprint {source} for the mesh cache: {e}")
+        return False
+
+    offset = 0
+    layout = {}
+    for name, arr in blobs.items():
+        layout[name] = {'offset': offset, 'dtype': arr.dtype.str, 'shape': list(arr.shape)}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    header = json.dumps({
+        'version': CACHE_VERSION,
+        'options': options,
+        'dependencies': deps,
+        'materials': [asdict(m) for m in materials],
+        'meshes': records,
+        'box_min': [float(x) for x in box_min],
+        'box_max': [float(x) for x in box_max],
+        'arrays': layout,
+    }).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    target = cache_path(source)
+    tmp = None
+    try:
+        # a private temporary file: concurrent writers of the same cache never share one
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(target) + '.', suffix='.tmp',
+                                   dir=os.path.dirname(os.path.abspath(target)))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for name, arr in blobs.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(np.ascontiguousarray(arr).tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp, target)
+    except OSError as e:
+        print(f"Warning: cannot write mesh cache {target}: {e}")
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+    print(f"Wrote mesh cache: {target}")
+    return True
+
+
+def load(source: str, options: dict) -> Optional[CachedModel]:
+    """Memory-map the cache of `source`; None when missing, stale or written by another version."""
+    target = cache_path(source)
+    try:
+        with open(target, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_len).decode('utf-8'))
+    except (OSError, ValueError, IndexError):
+        return None
+    if header.get('version') != CACHE_VERSION or not _options_match(header.get('options') or {}, options):
+        return None
+    if not all(_dependency_valid(dep) for dep in header['dependencies']):
+        print(f"Mesh cache is stale: {target}")
+        return None
+
+    data_start = -(-(len(MAGIC) + 8 + header_len) // ALIGN) * ALIGN
+    blobs = {}
+    for name, info in header['arrays'].items():
+        dtype, shape = np.dtype(info['dtype']), tuple(info['shape'])
+        if int(np.prod(shape)) == 0:
+            blobs[name] = np.zeros(shape, dtype)
+        else:
+            blobs[name] = np.memmap(target, dtype=dtype, mode='r',
+                                    offset=data_start + info['offset'], shape=shape)
+
+    materials = [_material_from_dict(m) for m in header['materials']]
+    meshes = []
+    for rec in header['meshes']:
+        v0, v1 = rec['vertices']
+        i0, i1 = rec['indices']
+        mat = rec['material']
+        meshes.append(Mesh(
+            name=rec['name'], vertices=[], indices=blobs['indices'][i0:i1],
+            materials=next((m for m in materials if mat and m.name == mat['name']), None)
+            or _material_from_dict(mat),
+            positions=blobs['positions'][v0:v1], normals=blobs['normals'][v0:v1],
+            texcoords=blobs['texcoords'][v0:v1],
+            stats=MeshStats(**rec['stats']) if rec['stats'] else None,
+            lods=[blobs['lod_indices'][l0:l1] for l0, l1 in rec['lods']] or None,
+            lod_errors=rec['lod_errors']))
+    print(f"Loaded mesh cache: {target}")
+    return CachedModel(meshes=meshes, materials=materials,
+                       box_min=np.array(header['box_min'], dtype=np.float32),
+                       box_max=np.array(header['box_max'], dtype=np.float32))
@@ -0,0 +1,136 @@
+import numpy as np
+from dataclasses import dataclass
+
+
+@dataclass
+class MeshStats:
+    vertices_in: int = 0
+    vertices_out: int = 0
+    acmr_input: float = 0.0
+    acmr_welded: float = 0.0
+    acmr_optimized: float = 0.0
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.vertices_in / self.vertices_out if self.vertices_out else 1.0
+
+    def __str__(self):
+        return (f"vertices {self.vertices_in} -> {self.vertices_out} (x{self.dedup_ratio:.2f})"
+                f" | ACMR {self.acmr_input:.3f} -> {self.acmr_welded:.3f} (welded) -> {self.acmr_optimized:.3f} (reordered)")
+
+
+def weld_vertices(*attributes):
+    """Merge identical (position, normal, texcoord, ...) rows.
+
+    Takes per-corner float32 arrays of shape (N, k) and returns (unique attribute arrays, remap) where
+    remap[i] is the new index of input row i. Unique rows keep the order of their first use.
+    """
+    rows = np.ascontiguousarray(np.hstack([np.asarray(a, dtype=np.float32) for a in attributes]))
+    if len(rows) == 0:
+        return tuple(np.asarray(a, dtype=np.float32) for a in attributes), np.zeros(0, np.uint32)
+    keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # np.unique orders by key; renumber by first occurrence instead
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    remap = rank[inverse.ravel()].astype(np.uint32)
+    picked = first[order]
+    return tuple(np.asarray(a, dtype=np.float32)[picked] for a in attributes), remap
+
+
+def acmr(indices, cache_size=16):
+    """Average cache miss ratio (misses per triangle) of a FIFO post-transform cache."""
+    if len(indices) == 0:
+        return 0.0
+    stamp = {}
+    misses = 0
+    for v in np.asarray(indices).tolist():
+        t = stamp.get(v)
+        if t is None or misses - t >= cache_size:
+            misses += 1
+            stamp[v] = misses
+    return misses / (len(indices) // 3)
+
+
+def tipsify(indices, vertex_count, cache_size=16):
+    """Reorder triangles for the post-transform vertex cache (Sander et al., "Tipsy", 2007)."""
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    if len(tris) == 0:
+        return np.asarray(indices, dtype=np.uint32)
+    # vertex -> triangle adjacency in CSR form
+    flat = tris.ravel()
+    adj_order = np.argsort(flat, kind='stable')
+    adj_tri = (adj_order // 3).tolist()
+    adj_start = np.concatenate(([0], np.cumsum(np.bincount(flat, minlength=vertex_count)))).tolist()
+    tri_list = tris.tolist()
+
+    live = np.bincount(flat, minlength=vertex_count).tolist()
+    cache_time = [0] * vertex_count
+    emitted = [False] * len(tri_list)
+    dead_end = []
+    out = []
+    stamp = cache_size + 1
+    cursor = 0
+    fan = 0
+    while fan >= 0:
+        candidates = []
+        for t in adj_tri[adj_start[fan]:adj_start[fan + 1]]:
+            if emitted[t]:
+                continue
+            out.append(t)
+            emitted[t] = True
+            for v in tri_list[t]:
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if stamp - cache_time[v] > cache_size:
+                    cache_time[v] = stamp
+                    stamp += 1
+
+        # next fanning vertex: the candidate that stays longest in the cache
+        fan, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = stamp - cache_time[v] if stamp - cache_time[v] + 2 * live[v] <= cache_size else 0
+                if priority > best:
+                    best, fan = priority, v
+        if fan == -1:
+            while dead_end:
+                d = dead_end.pop()
+                if live[d] > 0:
+                    fan = d
+                    break
+        if fan == -1:
+            while cursor < vertex_count and live[cursor] == 0:
+                cursor += 1
+            fan = cursor if cursor < vertex_count else -1
+    return tris[out].ravel().astype(np.uint32)
+
+
+def reorder_vertices_by_use(indices, vertex_count):
+    """Permutation that numbers vertices in order of first reference (better vertex fetch locality)."""
+    unique, first = np.unique(indices, return_index=True)
+    used = unique[np.argsort(first, kind='stable')]
+    remap = np.full(vertex_count, -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return used, remap
+
+
+def optimize_mesh(positions, normals, texcoords, indices, cache_size=16):
+    """Weld identical vertices, then reorder triangles and vertices for the GPU caches.
+
+    Returns (positions, normals, texcoords, indices, MeshStats); the triangle set is unchanged.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    acmr_input = acmr(indices, cache_size)
+    (positions, normals, texcoords), remap = weld_vertices(
+        positions[indices], normals[indices], texcoords[indices])
+    stats = MeshStats(vertices_in=len(indices), vertices_out=len(positions), acmr_input=acmr_input,
+                      acmr_welded=acmr(remap, cache_size))
+
+    reordered = tipsify(remap, len(positions), cache_size)
+    used, vremap = reorder_vertices_by_use(reordered, len(positions))
+    indices = vremap[reordered].astype(np.uint32)
+    stats.acmr_optimized = acmr(indices, cache_size)
+    return positions[used], normals[used], texcoords[used], indices, stats
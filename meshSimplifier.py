@@ -0,0 +1,257 @@
+import argparse
+import heapq
+from operator import add
+from typing import List, Tuple
+
+import numpy as np
+
+# Weight of the constraint planes along UV seams and mesh borders, relative to the unit-weight
+# face planes: moving a vertex off such an edge costs that many times more
+CONSTRAINT_WEIGHT = 1000.0
+
+
+def _plane_quadrics(normals, d, weight=1.0):
+    """(n, 10) upper triangles [a b c d e f g h i j] of the quadrics w * p p^T for planes (n, d)."""
+    x, y, z = normals[:, 0], normals[:, 1], normals[:, 2]
+    return weight * np.stack((x * x, x * y, x * z, x * d, y * y, y * z, y * d, z * z, z * d, d * d), axis=1)
+
+
+def _quadric_error(q, p):
+    """v^T Q v for v = (p, 1); q (n, 10), p (n, 3)."""
+    x, y, z = p[:, 0], p[:, 1], p[:, 2]
+    return (q[:, 0] * x * x + 2 * q[:, 1] * x * y + 2 * q[:, 2] * x * z + 2 * q[:, 3] * x
+            + q[:, 4] * y * y + 2 * q[:, 5] * y * z + 2 * q[:, 6] * y
+            + q[:, 7] * z * z + 2 * q[:, 8] * z + q[:, 9])
+
+
+def _error(q, p):
+    x, y, z = p
+    a, b, c, d, e, f, g, h, i, j = q
+    return (a * x * x + 2 * b * x * y + 2 * c * x * z + 2 * d * x + e * y * y + 2 * f * y * z + 2 * g * y
+            + h * z * z + 2 * i * z + j)
+
+
+def _unit(v):
+    length = np.linalg.norm(v, axis=1, keepdims=True)
+    return np.divide(v, length, out=np.zeros_like(v), where=length > 0), length.ravel()
+
+
+def simplify_lods(positions, normals, texcoords, indices, ratios=(0.5, 0.25, 0.125)
+                  ) -> Tuple[List[np.ndarray], List[float]]:
+    """Quadric-error edge collapse (Garland & Heckbert) down to each triangle ratio of `ratios`.
+
+    Collapses are half-edge collapses onto an existing vertex, so every level is an index buffer
+    over the unchanged vertex arrays. Vertices sharing a position are treated as one. Edges where
+    their attributes differ (UV seams, hard normals) get constraint planes and only collapse along
+    themselves; the points where seams meet or end never move. Vertices on open edges (the mesh
+    border, i.e. where the next material starts) never move either, so neighbouring meshes keep
+    matching edges without cracks.
+    Collapses that flip a triangle or break the link condition are skipped.
+
+    Returns (index arrays, errors): one uint32 array per ratio, and per level the square root of the
+    largest collapse cost so far. Face planes weigh 1, so no kept vertex is farther than that from
+    the plane of any original face it absorbed. A level that cannot reach its ratio keeps the
+    coarsest mesh the constraints allow.
+    """
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    if not len(indices) or not len(ratios):
+        return [indices.astype(np.uint32).ravel() for _ in ratios], [0.0 for _ in ratios]
+    # identical vertices (unwelded input) act as one; seams are where the attributes differ
+    rows = np.hstack((positions, normals, texcoords)).astype(np.float32)
+    _, first, same = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+    indices = first[same.ravel()][indices]
+    positions = np.asarray(positions, dtype=np.float64)
+    _, pid = np.unique(positions, axis=0, return_inverse=True)
+    pid = pid.ravel()
+    pos = np.zeros((pid.max() + 1, 3))
+    pos[pid] = positions
+    ptris = pid[indices]
+    count = len(pos)
+
+    # face planes, unit weight so the collapse cost reads as a squared distance
+    v0, v1, v2 = pos[ptris[:, 0]], pos[ptris[:, 1]], pos[ptris[:, 2]]
+    face_n, face_area = _unit(np.cross(v1 - v0, v2 - v0))
+    degenerate = (face_area == 0) | (ptris[:, 0] == ptris[:, 1]) | (ptris[:, 1] == ptris[:, 2]) \
+        | (ptris[:, 2] == ptris[:, 0])
+    q = np.zeros((count, 10))
+    face_q = _plane_quadrics(face_n, -(face_n * v0).sum(axis=1))
+    for k in range(3):
+        np.add.at(q, ptris[:, k], face_q)
+
+    # position edges with the triangle that owns each side; an edge is constrained when it is open
+    # or when its triangles use different vertices (attributes) on it
+    side_a, side_b = ptris[:, [0, 1, 2]].ravel(), ptris[:, [1, 2, 0]].ravel()
+    attr_a, attr_b = indices[:, [0, 1, 2]].ravel(), indices[:, [1, 2, 0]].ravel()
+    lo, hi = np.minimum(side_a, side_b), np.maximum(side_a, side_b)
+    edge_key = lo * count + hi
+    attr_key = np.where(side_a < side_b, attr_a * (len(positions) + 1) + attr_b, attr_b * (len(positions) + 1) + attr_a)
+    keep = ~np.repeat(degenerate, 3)
+    edges, edge_of, edge_uses = np.unique(edge_key[keep], return_inverse=True, return_counts=True)
+    edge_of = edge_of.ravel()
+    attr_pairs = np.unique(np.stack((edge_of, attr_key[keep]), axis=1), axis=0)
+    constrained = (edge_uses == 1) | (np.bincount(attr_pairs[:, 0], minlength=len(edges)) > 1)
+
+    # constraint planes through each constrained side, perpendicular to its face
+    sides = np.flatnonzero(keep)[constrained[edge_of]]
+    a, b = pos[side_a[sides]], pos[side_b[sides]]
+    plane_n, _ = _unit(np.cross(b - a, face_n[sides // 3]))
+    edge_q = _plane_quadrics(plane_n, -(plane_n * a).sum(axis=1), CONSTRAINT_WEIGHT)
+    np.add.at(q, side_a[sides], edge_q)
+    np.add.at(q, side_b[sides], edge_q)
+
+    # vertices on seams slide only along them; seam junctions and ends, and borders, stay put
+    edge_lo, edge_hi = edges // count, edges % count
+    constrained_degree = np.bincount(np.concatenate((edge_lo[constrained], edge_hi[constrained])),
+                                     minlength=count)
+    border = np.zeros(count, dtype=bool)
+    border[edge_lo[edge_uses == 1]] = border[edge_hi[edge_uses == 1]] = True
+    locked = border | ((constrained_degree > 0) & (constrained_degree != 2))
+
+    # Python-side state for the collapse loop
+    pos_l = pos.tolist()
+    q_l = q.tolist()
+    tri_p = ptris.tolist()
+    tri_a = indices.tolist()
+    alive = (~degenerate).tolist()
+    live = int((~degenerate).sum())
+    vertex_tris = [set() for _ in range(count)]
+    for t in np.flatnonzero(~degenerate).tolist():
+        for p in tri_p[t]:
+            vertex_tris[p].add(t)
+    constrained_edges = set(zip(edge_lo[constrained].tolist(), edge_hi[constrained].tolist()))
+    locked_l = locked.tolist()
+    on_constraint = (constrained_degree > 0).tolist()
+    version = [0] * count
+
+    def allowed(u, v):
+        if locked_l[u]:
+            return False
+        return not on_constraint[u] or (min(u, v), max(u, v)) in constrained_edges
+
+    def push(a, b):
+        """Queue the cheaper allowed direction of edge (a, b)."""
+        qs = list(map(add, q_l[a], q_l[b]))
+        best = None
+        if allowed(a, b):
+            best = (_error(qs, pos_l[b]), a, b)
+        if allowed(b, a):
+            cost = _error(qs, pos_l[a])
+            if best is None or cost < best[0]:
+                best = (cost, b, a)
+        if best is not None:
+            heapq.heappush(heap, best + (version[a], version[b]) if best[1] == a else best + (version[b], version[a]))
+
+    # initial heap: one entry per edge, both directions costed in one batch
+    q_sum = q[edge_lo] + q[edge_hi]
+    from_lo = np.where(~locked[edge_lo] & (~(constrained_degree[edge_lo] > 0) | constrained),
+                       _quadric_error(q_sum, pos[edge_hi]), np.inf)
+    from_hi = np.where(~locked[edge_hi] & (~(constrained_degree[edge_hi] > 0) | constrained),
+                       _quadric_error(q_sum, pos[edge_lo]), np.inf)
+    lo_first = from_lo <= from_hi
+    cost = np.where(lo_first, from_lo, from_hi)
+    ok = np.isfinite(cost)
+    u_arr, v_arr = np.where(lo_first, edge_lo, edge_hi)[ok], np.where(lo_first, edge_hi, edge_lo)[ok]
+    zeros = [0] * int(ok.sum())
+    heap = list(zip(cost[ok].tolist(), u_arr.tolist(), v_arr.tolist(), zeros, zeros))
+    heapq.heapify(heap)
+
+    def normal(a, b, c):
+        ab = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+        ac = (c[0] - a[0], c[1] - a[1], c[2] - a[2])
+        return (ab[1] * ac[2] - ab[2] * ac[1], ab[2] * ac[0] - ab[0] * ac[2], ab[0] * ac[1] - ab[1] * ac[0])
+
+    def try_collapse(u, v):
+        tris_u = vertex_tris[u]
+        shared = [t for t in tris_u if v in tri_p[t]]
+        if not shared:
+            return False
+        # link condition: u and v may only share the neighbours opposite their common edge
+        opposite = {p for t in shared for p in tri_p[t]} - {u, v}
+        around_u = {p for t in tris_u for p in tri_p[t]}
+        around_v = {p for t in vertex_tris[v] for p in tri_p[t]}
+        if (around_u & around_v) - {u, v} != opposite:
+            return False
+        # each vertex (wedge) of u must map to exactly one vertex of v across the collapsed edge
+        remap = {}
+        for t in shared:
+            pu, pv = tri_p[t].index(u), tri_p[t].index(v)
+            au, av = tri_a[t][pu], tri_a[t][pv]
+            if remap.setdefault(au, av) != av:
+                return False
+        moved = [t for t in tris_u if t not in shared]
+        for t in moved:
+            if tri_a[t][tri_p[t].index(u)] not in remap:
+                return False
+        # no triangle may flip or collapse to zero area
+        for t in moved:
+            corners = [pos_l[p] for p in tri_p[t]]
+            before = normal(*corners)
+            corners[tri_p[t].index(u)] = pos_l[v]
+            after = normal(*corners)
+            dot = before[0] * after[0] + before[1] * after[1] + before[2] * after[2]
+            if dot <= 1e-3 * (before[0] ** 2 + before[1] ** 2 + before[2] ** 2):
+                return False
+
+        for t in shared:
+            alive[t] = False
+            for p in tri_p[t]:
+                vertex_tris[p].discard(t)
+        for t in moved:
+            i = tri_p[t].index(u)
+            tri_p[t][i] = v
+            tri_a[t][i] = remap[tri_a[t][i]]
+            vertex_tris[v].add(t)
+        vertex_tris[u] = set()
+        for p in around_u - {u, v}:
+            key = (min(u, p), max(u, p))
+            if key in constrained_edges:
+                constrained_edges.discard(key)
+                constrained_edges.add((min(v, p), max(v, p)))
+        constrained_edges.discard((min(u, v), max(u, v)))
+        q_l[v] = list(map(add, q_l[u], q_l[v]))
+        return len(shared)
+
+    targets = sorted(((max(1, int(len(indices) * r)), i) for i, r in enumerate(ratios)), reverse=True)
+    levels = [None] * len(ratios)
+    errors = [0.0] * len(ratios)
+    error = 0.0
+
+    def snapshot():
+        return np.array([tri_a[t] for t in range(len(tri_a)) if alive[t]], dtype=np.uint32).ravel()
+
+    for target, level in targets:
+        while live > target and heap:
+            cost, u, v, ver_u, ver_v = heapq.heappop(heap)
+            if ver_u != version[u] or ver_v != version[v] or not vertex_tris[u]:
+                continue
+            removed = try_collapse(u, v)
+            if not removed:
+                continue
+            live -= removed
+            error = max(error, cost)
+            version[u] += 1
+            version[v] += 1
+            for p in {p for t in vertex_tris[v] for p in tri_p[t]} - {v}:
+                push(v, p)
+        levels[level] = snapshot()
+        errors[level] = float(np.sqrt(max(error, 0.0)))
+    return levels, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize meshes and generate levels of detail offline into the mesh cache of OBJ files")
+    parser.add_argument('inputs', nargs='+')
+    parser.add_argument('--ratios', type=float, nargs='+', default=None,
+                        help="triangle ratio of each level (default: constants.lodSettings)")
+    args = parser.parse_args()
+
+    from constants import lodSettings
+    from model import Model  # the other cache options must match what the renderer asks for
+    for path in args.inputs:
+        model = Model(optimize_meshes=True, lod_ratios=lodSettings.ratios if args.ratios is None else args.ratios)
+        if model.prepare(path) is None:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,114 +1,435 @@
+import ctypes
 import os
+import time
 import numpy as np
-from PIL import Image
 from OpenGL.GL import *
 from objLoader import Loader  # assumes the previous loader module
+from meshOptimizer import MeshStats
+import meshCache
+from textureManager import texture_manager
 from shaderProgram import ShaderProgram
+from culling import MeshBounds, extract_planes
+from constants import lodSettings
+from bvh import BVH
+from instancing import InstanceBuffer, as_transforms
 import glm
 
+# Interleaved vertex layouts; 'packed' stores the normal as GL_INT_2_10_10_10_REV and half-float UVs
+VERTEX_FORMATS = {
+    'float': np.dtype([('position', np.float32, 3), ('normal', np.float32, 3), ('texcoord', np.float32, 2)]),
+    'packed': np.dtype([('position', np.float32, 3), ('normal', np.uint32), ('texcoord', np.float16, 2)]),
+}
+# Bytes per vertex of the former layout: vec4 position + vec4 normal + vec2 uv in three buffers
+SEPARATE_VERTEX_BYTES = 40
+
+def pack_normals(normals):
+    """Normalize and pack (N,3) normals into signed 10:10:10:2 words (w = 0)."""
+    n = np.asarray(normals, dtype=np.float32)
+    length = np.linalg.norm(n, axis=1, keepdims=True)
+    n = np.divide(n, length, out=np.zeros_like(n), where=length > 0)
+    q = np.round(np.clip(n, -1.0, 1.0) * 511.0).astype(np.int32) & 0x3FF
+    return (q[:, 0] | (q[:, 1] << 10) | (q[:, 2] << 20)).astype(np.uint32)
+
+def build_vertex_array(positions, normals, texcoords, vertex_format='float'):
+    """Interleave (N,3) positions, (N,3) normals and (N,2) texcoords into one structured array."""
+    data = np.empty(len(positions), dtype=VERTEX_FORMATS[vertex_format])
+    data['position'] = positions
+    data['normal'] = pack_normals(normals) if vertex_format == 'packed' else normals
+    data['texcoord'] = texcoords
+    return data
+
+def _attribute_format(dtype):
+    """(components, GL type, normalized) for one field of a vertex layout."""
+    base, shape = dtype.base, dtype.shape
+    if base == np.uint32:
+        return 4, GL_INT_2_10_10_10_REV, GL_TRUE
+    gl_type = GL_HALF_FLOAT if base == np.float16 else GL_FLOAT
+    return shape[0], gl_type, GL_FALSE
+
 # Data structure to hold GPU buffers for a mesh
 class MeshEntry:
-    def __init__(self):
-        self.VAO = glGenVertexArrays(1)
-        self.VBO = glGenBuffers(3)
-        self.EBO = glGenBuffers(1)
+    def __init__(self, shared=None):
+        # meshes of a batched model share the VAO/VBO/EBO of one merged entry
+        if shared is None:
+            self.VAO = glGenVertexArrays(1)
+            self.VBO = glGenBuffers(1)
+            self.EBO = glGenBuffers(1)
+        else:
+            self.VAO, self.VBO, self.EBO = shared.VAO, shared.VBO, shared.EBO
         self.texture_id = 0
         self.index_count = 0
+        self.vertex_count = 0
+        self.stride = 0
+        # where the mesh lives inside the (possibly shared) buffers
+        self.first_index = 0
+        self.base_vertex = 0
+        # (first_index, index_count) of each level of detail; level 0 is the full mesh
+        self.lod_ranges = []
+
+    def lod_range(self, level):
+        if not self.lod_ranges:
+            return self.first_index, self.index_count
+        return self.lod_ranges[min(level, len(self.lod_ranges) - 1)]
+
+    def draw(self, instances=1, level=0):
+        first_index, index_count = self.lod_range(level)
+        glDrawElementsInstancedBaseVertex(GL_TRIANGLES, index_count, GL_UNSIGNED_INT,
+                                          ctypes.c_void_p(first_index * 4), instances, self.base_vertex)
+        draw_counter.add()
+
+def lod_index_layout(index_arrays, lod_index_arrays, first_index=0):
+    """Index buffer parts and per-mesh LOD ranges: every mesh's full indices, then each coarser level.
+
+    Meshes with fewer levels reuse their coarsest range for the missing ones.
+    """
+    levels = 1 + max((len(lods) for lods in lod_index_arrays), default=0)
+    parts, ranges = [], [[] for _ in index_arrays]
+    for level in range(levels):
+        for mesh, (indices, lods) in enumerate(zip(index_arrays, lod_index_arrays)):
+            if level and level > len(lods):
+                ranges[mesh].append(ranges[mesh][-1])
+                continue
+            part = indices if level == 0 else lods[level - 1]
+            ranges[mesh].append((first_index, part.size))
+            parts.append(part)
+            first_index += part.size
+    return parts, ranges
+
+class DrawCounter:
+    """Counts draw calls and VAO/texture/framebuffer binds; main reports the per-frame number."""
+    def __init__(self):
+        self.calls = 0
+        self.last_frame = 0
+        # running totals, sampled per frame by the profiler
+        self.total = 0
+        self.binds = 0
+
+    def add(self, n=1):
+        self.calls += n
+        self.total += n
+
+    def bind(self, n=1):
+        self.binds += n
+
+    def end_frame(self):
+        self.last_frame, self.calls = self.calls, 0
+        return self.last_frame
+
+draw_counter = DrawCounter()
+
+class DrawBatch:
+    """Meshes drawn with one glMultiDrawElementsBaseVertex call (same VAO, texture and level of detail)."""
+    def __init__(self, texture_id, meshes, mesh_ids, level=0):
+        self.texture_id = texture_id
+        self.count = len(meshes)
+        self.mesh_ids = np.asarray(mesh_ids, dtype=np.int64)  # positions in Model.meshes
+        ranges = [m.lod_range(level) for m in meshes]
+        self.counts = np.array([count for _, count in ranges], dtype=np.int32)
+        self.byte_offsets = np.array([first * 4 for first, _ in ranges], dtype=np.int64)
+        self.offsets = (ctypes.c_void_p * self.count)(*self.byte_offsets.tolist())
+        self.base_vertices = np.array([m.base_vertex for m in meshes], dtype=np.int32)
+
+    def draw(self, visible=None, instances=1):
+        """`visible` is the per-mesh mask of the whole model; culled meshes are left out of the call."""
+        keep = None if visible is None else visible[self.mesh_ids]
+        if instances > 1:
+            # GL 3.3 has no instanced multi-draw: one instanced call per mesh
+            ids = range(self.count) if keep is None else np.flatnonzero(keep)
+            for i in ids:
+                glDrawElementsInstancedBaseVertex(GL_TRIANGLES, int(self.counts[i]), GL_UNSIGNED_INT,
+                                                  ctypes.c_void_p(int(self.byte_offsets[i])), instances,
+                                                  int(self.base_vertices[i]))
+            draw_counter.add(len(ids))
+            return
+        if keep is None or keep.all():
+            glMultiDrawElementsBaseVertex(GL_TRIANGLES, self.counts, GL_UNSIGNED_INT,
+                                          self.offsets, self.count, self.base_vertices)
+        else:
+            count = int(np.count_nonzero(keep))
+            if not count:
+                return
+            offsets = (ctypes.c_void_p * count)(*self.byte_offsets[keep].tolist())
+            glMultiDrawElementsBaseVertex(GL_TRIANGLES, self.counts[keep], GL_UNSIGNED_INT,
+                                          offsets, count, self.base_vertices[keep])
+        draw_counter.add()
+
+class ModelPayload:
+    """CPU-side result of Model.prepare, ready for Model.upload on the GL thread."""
+    def __init__(self, path):
+        self.path = path
+        self.texture_paths = []
+        self.vertex_datas = []
+        self.index_arrays = []
+        self.lod_index_arrays = []  # per mesh, coarser index arrays over the same vertices
+        self.bounds = None
+
+    @property
+    def nbytes(self):
+        """Vertex and index bytes the upload puts on the GPU (textures are counted by the texture manager)."""
+        return (sum(v.nbytes for v in self.vertex_datas) + sum(i.nbytes for i in self.index_arrays)
+                + sum(level.nbytes for lods in self.lod_index_arrays for level in lods))
 
 # Main model class
 class Model:
-    def __init__(self):
-        self.loader = Loader()
+    def __init__(self, use_numpy_loader=True, optimize_meshes=False, use_cache=True, vertex_format='float',
+                 batched=True, lod_ratios=(), parse_workers=1, verbose=True, textures=texture_manager):
+        self.loader = Loader(optimize_meshes=optimize_meshes, lod_ratios=lod_ratios)
+        self.use_numpy_loader = use_numpy_loader
+        # processes parsing the OBJ text on a cache miss (numpy loader only)
+        self.parse_workers = parse_workers
+        # per-upload logging; off for streamed chunks
+        self.verbose = verbose
+        # reference-counted texture cache the meshes take their textures from
+        self.textures = textures
+        self.use_cache = use_cache
+        self.vertex_format = vertex_format
+        self.batched = batched
         self.meshes = [] 
+        # set up by init_batched: one merged entry, per-texture batches and one depth-only batch
+        self.batch_entry = None
+        self.draw_batches = []
+        self.depth_batch = None
+        # (draw_batches, depth_batch) per level of detail; draw_batches/depth_batch above are level 0
+        self.lod_batches = []
+        # level picked by the last draw with a camera; the depth pass reuses it
+        self.lod = 0
         self.box_min = np.array([0.0, 0.0, 0.0], dtype=np.float32)
         self.box_max = np.array([0.0, 0.0, 0.0], dtype=np.float32)
+        # triangle BVH for collision and ray queries, in model space; built by prepare / build_bvh
+        self.bvh = None
+        # per-mesh volumes for frustum culling, parallel to self.meshes
+        self.bounds = MeshBounds.from_positions([])
+        # per-instance model/normal matrices, shared by every VAO of the model
+        self.instances = None
+        # bumped on every buffer upload; part of the shadow map's dirty key
+        self.geometry_version = 0
+        self.uploaded_bytes = 0
         self.loc_v = 0
         self.loc_n = 1
         self.loc_t = 2
 
-    def read_texture(self, filename):
-        # Load image via Pillow
-        img = Image.open(filename).convert("RGBA")
-        img_data = np.array(img, dtype=np.uint8)
-
-        tex = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, tex)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, img.width, img.height,
-                     0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
-        glGenerateMipmap(GL_TEXTURE_2D)
-        # Linear filtering
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glBindTexture(GL_TEXTURE_2D, 0)
-        return tex
-
-    def init_mesh(self, mesh_entry, vertices, normals, texcoords, indices):
+    def read_texture(self, filename, preloaded=None):
+        # Decoded and uploaded once per process, shared between models
+        if preloaded is not None and filename in preloaded:
+            # uploaded by the asset pipeline already, 0 when that failed
+            texture = preloaded[filename]
+            return self.textures.retain(texture) if texture else 0
+        return self.textures.acquire(filename)
+
+    def release_textures(self):
+        for mesh in self.meshes:
+            if mesh.texture_id:
+                self.textures.release(mesh.texture_id)
+
+    def delete(self):
+        """Free the model's GL buffers and texture references; it draws nothing afterwards."""
+        self.release_textures()
+        entries = {(m.VAO, m.VBO, m.EBO) for m in self.meshes}
+        if entries:
+            vaos, vbos, ebos = zip(*entries)
+            glDeleteVertexArrays(len(vaos), list(vaos))
+            glDeleteBuffers(len(vbos) + len(ebos), list(vbos + ebos))
+        if self.instances is not None:
+            self.instances.delete()
+            self.instances = None
+        self.meshes = []
+        self.batch_entry = None
+        self.draw_batches, self.depth_batch, self.lod_batches = [], None, []
+        self.bounds = MeshBounds.from_positions([])
+        self.geometry_version += 1
+
+    def init_mesh(self, mesh_entry, vertex_data, indices, bounds=None, lods=()):
+        parts, (ranges,) = lod_index_layout([indices], [lods])
+        self._upload(mesh_entry, vertex_data, np.concatenate(parts))
+        mesh_entry.index_count = indices.size
+        mesh_entry.lod_ranges = ranges
+        self.meshes.append(mesh_entry)
+        if bounds is None:
+            bounds = MeshBounds.from_positions([vertex_data['position']])
+        self.bounds = self.bounds.append(bounds)
+
+    def init_batched(self, texture_ids, vertex_datas, index_arrays, bounds=None, lod_index_arrays=None):
+        """Merge all meshes into one VAO; each mesh keeps its base vertex and first index per level."""
+        if bounds is None:
+            bounds = MeshBounds.from_positions([vd['position'] for vd in vertex_datas])
+        self.bounds = self.bounds.append(bounds)
+        if lod_index_arrays is None:
+            lod_index_arrays = [[] for _ in index_arrays]
+        parts, ranges = lod_index_layout(index_arrays, lod_index_arrays)
+        self.batch_entry = MeshEntry()
+        self._upload(self.batch_entry, np.concatenate(vertex_datas), np.concatenate(parts))
+        base_vertex = 0
+        for texture_id, vertex_data, mesh_ranges in zip(texture_ids, vertex_datas, ranges):
+            m = MeshEntry(shared=self.batch_entry)
+            m.texture_id = texture_id
+            m.first_index, m.index_count = mesh_ranges[0]
+            m.lod_ranges = mesh_ranges
+            m.vertex_count = len(vertex_data)
+            m.stride = vertex_data.dtype.itemsize
+            m.base_vertex = base_vertex
+            base_vertex += len(vertex_data)
+            self.meshes.append(m)
+        self.build_draw_batches()
+
+    @property
+    def lod_levels(self):
+        return max((len(m.lod_ranges) for m in self.meshes), default=1) or 1
+
+    def build_draw_batches(self):
+        by_texture = {}
+        for i, m in enumerate(self.meshes):
+            by_texture.setdefault(m.texture_id, []).append(i)
+        self.lod_batches = [([DrawBatch(tex, [self.meshes[i] for i in ids], ids, level)
+                              for tex, ids in sorted(by_texture.items())],
+                             DrawBatch(0, self.meshes, range(len(self.meshes)), level))
+                            for level in range(self.lod_levels)]
+        self.draw_batches, self.depth_batch = self.lod_batches[0]
+        if self.verbose:
+            print(f"Batched {len(self.meshes)} meshes into {len(self.draw_batches)} texture draws"
+                  f" x {len(self.lod_batches)} levels of detail")
+
+    def _upload(self, mesh_entry, vertex_data, indices):
         glBindVertexArray(mesh_entry.VAO)
 
-        # Positions
-        glBindBuffer(GL_ARRAY_BUFFER, mesh_entry.VBO[0])
-        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-        glEnableVertexAttribArray(self.loc_v)
-        glVertexAttribPointer(self.loc_v, 4, GL_FLOAT, GL_FALSE, 0, None)
-       
-
-        # Normals
-        glBindBuffer(GL_ARRAY_BUFFER, mesh_entry.VBO[1])
-        glBufferData(GL_ARRAY_BUFFER, normals.nbytes, normals, GL_STATIC_DRAW)
-        glEnableVertexAttribArray(self.loc_n)
-        glVertexAttribPointer(self.loc_n, 4, GL_FLOAT, GL_FALSE, 0, None)
-
-        # TexCoords
-        glBindBuffer(GL_ARRAY_BUFFER, mesh_entry.VBO[2])
-        glBufferData(GL_ARRAY_BUFFER, texcoords.nbytes, texcoords, GL_STATIC_DRAW)
-        glEnableVertexAttribArray(self.loc_t)
-        glVertexAttribPointer(self.loc_t, 2, GL_FLOAT, GL_FALSE, 0, None)
+        # One interleaved buffer, attributes addressed by stride/offset
+        layout = vertex_data.dtype
+        glBindBuffer(GL_ARRAY_BUFFER, mesh_entry.VBO)
+        glBufferData(GL_ARRAY_BUFFER, vertex_data.nbytes, vertex_data, GL_STATIC_DRAW)
+        for loc, name in ((self.loc_v, 'position'), (self.loc_n, 'normal'), (self.loc_t, 'texcoord')):
+            field_dtype, offset = layout.fields[name]
+            size, gl_type, normalized = _attribute_format(field_dtype)
+            glEnableVertexAttribArray(loc)
+            glVertexAttribPointer(loc, size, gl_type, normalized, layout.itemsize, ctypes.c_void_p(offset))
 
         # Indices
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, mesh_entry.EBO)
         glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
 
         glBindVertexArray(0)
+        self.uploaded_bytes += vertex_data.nbytes + indices.nbytes
+        if self.instances is None:
+            self.instances = InstanceBuffer()
+        self.instances.attach(mesh_entry.VAO)
         mesh_entry.index_count = indices.size
-        self.meshes.append(mesh_entry)
+        mesh_entry.vertex_count = len(vertex_data)
+        mesh_entry.stride = layout.itemsize
+        self.geometry_version += 1
+
+    def cache_options(self):
+        return {'numpy_loader': self.use_numpy_loader, 'optimize_meshes': self.loader.optimize_meshes,
+                'lod_ratios': list(self.loader.lod_ratios)}
 
     def load_model(self, path):
-        if not self.loader.load(path):
-            print(f"Error loading model {path}")
+        payload = self.prepare(path)
+        if payload is None:
             return False
+        self.upload(payload)
+        return True
 
-        # Flatten and upload each mesh
+    def prepare(self, path):
+        """CPU half of load_model (no GL calls, safe on a worker thread)."""
+        cached = meshCache.load(path, self.cache_options()) if self.use_cache else None
+        if cached:
+            # warm start: meshes are views into the memory-mapped cache file
+            self.loader.meshes = cached.meshes
+            self.loader.materials = cached.materials
+        else:
+            if self.use_numpy_loader:
+                ok = self.loader.load_numpy(path, self.parse_workers)
+            else:
+                ok = self.loader.load(path)
+            if not ok:
+                print(f"Error loading model {path}")
+                return None
+
+        payload = ModelPayload(path)
+        positions_per_mesh = []
+        triangles_per_mesh = []
         for mesh in self.loader.meshes:
-            m = MeshEntry()
             # Texture
             if mesh.materials and mesh.materials.map_Kd:
-                tex_path = mesh.materials.map_Kd
-                m.texture_id = self.read_texture(tex_path)
+                payload.texture_paths.append(mesh.materials.map_Kd)
             else:
-                m.texture_id = 0
+                payload.texture_paths.append(None)
 
-            # Build numpy arrays interleaved
-            positions = []
-            normals = []
-            uvs = []
-            for v in mesh.vertices:
-                positions.extend([v.position.x, v.position.y, v.position.z, 1.0])
-                normals.extend([v.normal.x, v.normal.y, v.normal.z, 0.0])
-                uvs.extend([v.texcoord.x, v.texcoord.y])
+            positions, normals, uvs, inds = mesh.as_arrays()
+            positions_per_mesh.append(positions)
+            triangles_per_mesh.append(positions[np.asarray(inds).reshape(-1, 3)])
+            payload.vertex_datas.append(build_vertex_array(positions, normals, uvs, self.vertex_format))
+            payload.index_arrays.append(np.ascontiguousarray(inds, dtype=np.uint32))
+            payload.lod_index_arrays.append([np.ascontiguousarray(level, dtype=np.uint32)
+                                             for level in mesh.lods or []])
+        payload.bounds = MeshBounds.from_positions(positions_per_mesh)
 
-            verts = np.array(positions, dtype=np.float32)
-            norms = np.array(normals, dtype=np.float32)
-            texc = np.array(uvs, dtype=np.float32)
-            inds  = np.array(mesh.indices, dtype=np.uint32)
+        if cached:
+            self.box_min, self.box_max = cached.box_min, cached.box_max
+        else:
+            self.create_collider()
+            if self.use_cache:
+                meshCache.save(path, self.loader.meshes, self.loader.materials, self.loader.mtl_paths,
+                               self.box_min, self.box_max, self.cache_options())
+        self.build_bvh(np.concatenate(triangles_per_mesh) if triangles_per_mesh else np.zeros((0, 3, 3)))
+        self.log_mesh_stats()
+        self.log_lod_stats()
+        return payload
 
-            self.init_mesh(m, verts, norms, texc, inds)
+    def upload(self, payload, preloaded=None):
+        """GL half of load_model: textures and vertex/index buffers.
 
-        self.create_collider()
-        return True
+        `preloaded` maps texture paths to ids the caller already uploaded (0 for a failed one).
+        """
+        texture_ids = [self.read_texture(p, preloaded) if p else 0 for p in payload.texture_paths]
+        start = len(self.meshes)
+        try:
+            if self.batched and payload.vertex_datas:
+                self.init_batched(texture_ids, payload.vertex_datas, payload.index_arrays, payload.bounds,
+                                  payload.lod_index_arrays)
+            else:
+                for i, (texture_id, vertex_data, indices) in enumerate(zip(texture_ids, payload.vertex_datas,
+                                                                           payload.index_arrays)):
+                    m = MeshEntry()
+                    m.texture_id = texture_id
+                    self.init_mesh(m, vertex_data, indices, payload.bounds[i:i + 1],
+                                   payload.lod_index_arrays[i])
+        except Exception:
+            # references of the meshes that never made it
+            for texture in texture_ids[len(self.meshes) - start:]:
+                if texture:
+                    self.textures.release(texture)
+            raise
+        if self.verbose:
+            self.log_vertex_bytes()
+
+    def log_vertex_bytes(self):
+        count = sum(mesh.vertex_count for mesh in self.meshes)
+        stride = VERTEX_FORMATS[self.vertex_format].itemsize
+        print(f"Vertex data: {count} vertices x {stride} B = {count * stride / 2**20:.2f} MB"
+              f" (separate vec4 buffers: {count * SEPARATE_VERTEX_BYTES / 2**20:.2f} MB)")
+
+    def log_mesh_stats(self):
+        stats = [mesh.stats for mesh in self.loader.meshes if mesh.stats]
+        if not stats:
+            return
+        total = MeshStats(vertices_in=sum(st.vertices_in for st in stats),
+                          vertices_out=sum(st.vertices_out for st in stats))
+        # ACMR weighted by triangle count
+        total.acmr_input = sum(st.acmr_input * st.vertices_in for st in stats) / total.vertices_in
+        total.acmr_welded = sum(st.acmr_welded * st.vertices_in for st in stats) / total.vertices_in
+        total.acmr_optimized = sum(st.acmr_optimized * st.vertices_in for st in stats) / total.vertices_in
+        print(f"Mesh optimization: {total}")
+
+    def log_lod_stats(self):
+        meshes = [mesh for mesh in self.loader.meshes if mesh.lods]
+        if not meshes:
+            return
+        triangles = [sum(len(mesh.indices) for mesh in meshes) // 3]
+        triangles += [sum(len(mesh.lods[i]) for mesh in meshes) // 3 for i in range(len(meshes[0].lods))]
+        error = [max(mesh.lod_errors[i] for mesh in meshes) for i in range(len(meshes[0].lods))]
+        print("Levels of detail: " + " / ".join(str(t) for t in triangles) + " triangles"
+              + ", max error " + " / ".join(f"{e:.4f}" for e in error))
 
     def create_collider(self):
-        all_positions = [v.position for mesh in self.loader.meshes for v in mesh.vertices]
-        coords = np.array([[p.x, p.y, p.z] for p in all_positions], dtype=np.float32)
+        coords = np.concatenate([mesh.as_arrays()[0] for mesh in self.loader.meshes])
         self.box_min = coords.min(axis=0)
         self.box_max = coords.max(axis=0)
 
@@ -118,14 +439,121 @@ class Model:
                 self.box_min[1]-padding <= y <= self.box_max[1]+padding and
                 self.box_min[2]-padding <= z <= self.box_max[2]+padding)
 
-    def draw(self, shader: ShaderProgram, model_matrix):
+    def build_bvh(self, triangles):
+        start = time.perf_counter()
+        self.bvh = BVH.build(triangles)
+        if self.verbose:
+            print(f"BVH: {len(self.bvh)} triangles, {len(self.bvh.node_child)} nodes "
+                  f"in {time.perf_counter() - start:.2f}s")
 
-        shader.set_mat4("model", model_matrix)
+    # Triangle-level queries in model space; without a BVH nothing is hit
+    def sphere_overlaps(self, center, radius):
+        return self.bvh is not None and self.bvh.sphere_overlaps(center, radius)
 
+    def sweep_sphere(self, center, radius, displacement, plane_normal=None):
+        """Where a sphere ends up after moving by `displacement` and sliding along the mesh."""
+        if self.bvh is None:
+            return np.asarray(center, dtype=np.float64) + np.asarray(displacement, dtype=np.float64)
+        return self.bvh.sweep_sphere(center, radius, displacement, plane_normal)
+
+    def raycast(self, origin, direction, max_distance=np.inf):
+        return self.bvh.raycast(origin, direction, max_distance) if self.bvh is not None else None
+
+    def visible_meshes(self, clip_matrix, model_matrix, counter=None):
+        """Per-mesh visibility mask against the frustum of `clip_matrix` (view-projection or light space)."""
+        if clip_matrix is None or not len(self.bounds):
+            return None
+        planes = extract_planes(np.asarray(clip_matrix, dtype=np.float64) @ np.asarray(model_matrix, dtype=np.float64))
+        visible = self.bounds.visible(planes)
+        if counter is not None:
+            counter.add(visible)
+        return visible
+
+    def select_lod(self, camera, transforms):
+        """Level of detail for the projected size of the model's bounding sphere (nearest instance)."""
+        transforms = as_transforms(transforms)
+        if self.lod_levels == 1 or not len(transforms):
+            return 0
+        center = np.append((self.box_min + self.box_max) * 0.5, 1.0)
+        radius = 0.5 * float(np.linalg.norm(self.box_max - self.box_min))
+        world = transforms @ center
+        scale = np.linalg.norm(transforms[:, :3, :3], axis=1).max(axis=1)
+        distance = np.linalg.norm(world[:, :3] - np.asarray(camera.pos, dtype=np.float32), axis=1)
+        nearest = np.argmin(distance - radius * scale)
+        fraction = camera.screen_fraction(world[nearest, :3], radius * scale[nearest])
+        level = sum(fraction < threshold for threshold in lodSettings.screen_fractions)
+        return min(level, self.lod_levels - 1)
+
+    def _prepare_instances(self, transforms, clip_matrix, counter, normals=None):
+        """(instance count, per-mesh mask) for a draw; meshes are culled only for single-instance draws."""
+        transforms = as_transforms(transforms)
+        visible = self.visible_meshes(clip_matrix, transforms[0], counter) if len(transforms) == 1 else None
+        if not len(transforms) or (visible is not None and not visible.any()) or self.instances is None:
+            return 0, visible
+        return self.instances.update(transforms, normals), visible
+
+    def draw(self, shader: ShaderProgram, transforms, view_projection=None, counter=None, camera=None, normals=None):
+        """Draw at one model matrix, or once per matrix of an (N, 4, 4) array with instanced calls.
+
+        With a camera the level of detail follows the model's size on screen. `normals` are the
+        matching normal matrices when the caller already has them (sceneGraph.TransformTree).
+        """
+        if camera is not None:
+            self.lod = self.select_lod(camera, transforms)
+        instances, visible = self._prepare_instances(transforms, view_projection, counter, normals)
+        if not instances:
+            return
         shader.set_int("textureMap0", 0)
-        for mesh in self.meshes:
-            glActiveTexture(GL_TEXTURE0)
-            glBindTexture(GL_TEXTURE_2D, mesh.texture_id)
-            glBindVertexArray(mesh.VAO)
-            glDrawElements(GL_TRIANGLES, mesh.index_count, GL_UNSIGNED_INT, None)
+        glActiveTexture(GL_TEXTURE0)
+        self._draw_now(self._draw_items(visible, instances, depth_only=False))
+
+    def draw_depth(self, transforms, clip_matrix=None, counter=None, normals=None):
+        """Geometry only, for depth passes (no texture binds), at the level of the last camera draw."""
+        instances, visible = self._prepare_instances(transforms, clip_matrix, counter, normals)
+        if instances:
+            self._draw_now(self._draw_items(visible, instances, depth_only=True))
+
+    def submit(self, queue, pass_id, program, transforms, clip_matrix=None, counter=None, camera=None,
+               normals=None, depth_only=False):
+        """Queue the draws of draw / draw_depth on a renderQueue.RenderQueue instead of issuing them.
+
+        Instance data is uploaded now, so a model is submitted with one set of transforms per frame.
+        """
+        if camera is not None:
+            self.lod = self.select_lod(camera, transforms)
+        instances, visible = self._prepare_instances(transforms, clip_matrix, counter, normals)
+        if not instances:
+            return
+        center = np.append((self.box_min + self.box_max) * 0.5, 1.0)
+        depth = queue.depth_bits((as_transforms(transforms) @ center)[:, :3])
+        for texture_id, vao, draw, args in self._draw_items(visible, instances, depth_only):
+            queue.add(pass_id, program, texture_id, vao, depth, draw, *args)
+
+    def _draw_items(self, visible, instances, depth_only):
+        """(texture id or None, VAO, draw, args) per GL draw at the current level of detail."""
+        if self.lod_batches:
+            draw_batches, depth_batch = self.lod_batches[min(self.lod, len(self.lod_batches) - 1)]
+            if depth_only:
+                yield None, self.batch_entry.VAO, depth_batch.draw, (visible, instances)
+            else:
+                for batch in draw_batches:
+                    yield batch.texture_id, self.batch_entry.VAO, batch.draw, (visible, instances)
+            return
+        for i, mesh in enumerate(self.meshes):
+            if visible is None or visible[i]:
+                yield None if depth_only else mesh.texture_id, mesh.VAO, mesh.draw, (instances, self.lod)
+
+    @staticmethod
+    def _draw_now(items):
+        bound = None
+        for texture_id, vao, draw, args in items:
+            if vao != bound:
+                glBindVertexArray(vao)
+                bound = vao
+                draw_counter.bind()
+            if texture_id is not None:
+                glBindTexture(GL_TEXTURE_2D, texture_id)
+                draw_counter.bind()
+            draw(*args)
         glBindVertexArray(0)
+        draw_counter.bind()
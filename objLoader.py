@@ -1,8 +1,15 @@
 import math
+import multiprocessing
 import os
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
 import numpy as np
-from dataclasses import dataclass, field
-from typing import List, Optional
+from dataclasses import dataclass, field, fields
+from typing import Callable, List, Optional
+from meshOptimizer import MeshStats, optimize_mesh
+from meshSimplifier import simplify_lods
 
 # --- Data Classes for OBJ Loader ---
 @dataclass
@@ -85,6 +92,45 @@ class Mesh:
     vertices: List[Vertex]
     indices: List[int]
     materials: Optional[Material] = None
+    # Flat attribute arrays, filled by Loader.load_numpy instead of `vertices`
+    positions: Optional[np.ndarray] = None
+    normals: Optional[np.ndarray] = None
+    texcoords: Optional[np.ndarray] = None
+    # Set when the mesh went through meshOptimizer.optimize_mesh
+    stats: Optional[MeshStats] = None
+    # Coarser levels of detail: index arrays over the same vertices, and their simplification error
+    lods: Optional[List[np.ndarray]] = None
+    lod_errors: Optional[List[float]] = None
+
+    def as_arrays(self):
+        """Return (positions (N,3), normals (N,3), texcoords (N,2), indices) as numpy arrays."""
+        if self.positions is not None:
+            return (self.positions, self.normals, self.texcoords,
+                    np.asarray(self.indices, dtype=np.uint32))
+        positions = np.array([(v.position.x, v.position.y, v.position.z) for v in self.vertices],
+                             dtype=np.float32).reshape(-1, 3)
+        normals = np.array([(v.normal.x, v.normal.y, v.normal.z) for v in self.vertices],
+                           dtype=np.float32).reshape(-1, 3)
+        texcoords = np.array([(v.texcoord.x, v.texcoord.y) for v in self.vertices],
+                             dtype=np.float32).reshape(-1, 2)
+        return positions, normals, texcoords, np.array(self.indices, dtype=np.uint32)
+
+@dataclass
+class LoadProgress:
+    name: str
+    vertices: int
+    texcoords: int
+    normals: int
+    triangles: int
+    material: Optional[str] = None
+
+    def __str__(self):
+        return (f"- {self.name}	| vertices > {self.vertices}	| texcoords > {self.texcoords}"
+                f"	| normals > {self.normals}	| triangles > {self.triangles}"
+                + (f"	| material: {self.material}" if self.material else ""))
+
+def print_progress(progress: LoadProgress):
+    print(progress)
 
 # --- Utility Functions ---
 def first_token(line: str) -> str:
@@ -103,13 +149,357 @@ def get_elem(lst: List, idx_str: str):
         return lst[len(lst) + idx]
     return lst[idx - 1]
 
+# --- Vectorized parsing helpers (used by Loader.load_numpy) ---
+_BLANKS = (ord(' '), ord('\t'), ord('\r'))
+_WS = _BLANKS + (ord('\n'),)
+
+@dataclass
+class ObjRecords:
+    """Raw parse of an OBJ byte block: attribute pools, face corners (unresolved indices) and control lines."""
+    positions: np.ndarray
+    tcoords: np.ndarray
+    normals: np.ndarray
+    v_lines: np.ndarray
+    vt_lines: np.ndarray
+    vn_lines: np.ndarray
+    f_lines: np.ndarray
+    corners: np.ndarray
+    raw_v: np.ndarray
+    raw_vt: np.ndarray
+    raw_vn: np.ndarray
+    events: List[tuple]
+
+def _line_table(buf: np.ndarray):
+    """Return (first, end) byte offsets for every line; `first` skips leading blanks, `end` is the newline."""
+    ends = np.flatnonzero(buf == ord('\n'))
+    first = np.zeros_like(ends)
+    first[1:] = ends[:-1] + 1
+    while True:
+        blank = np.isin(buf[first], _BLANKS)
+        if not blank.any():
+            return first, ends
+        first[blank] += 1
+
+def _select_lines(buf: np.ndarray, first: np.ndarray, token: bytes) -> np.ndarray:
+    """Indices of lines whose first token is exactly `token`."""
+    last = len(buf) - 1
+    mask = np.ones(len(first), dtype=bool)
+    for i, ch in enumerate(token):
+        mask &= buf[np.minimum(first + i, last)] == ch
+    mask &= np.isin(buf[np.minimum(first + len(token), last)], _WS)
+    return np.flatnonzero(mask)
+
+def _gather_lines(raw: bytes, first: np.ndarray, ends: np.ndarray, lines: np.ndarray, token: bytes) -> bytes:
+    """Concatenate the selected lines (runs of adjacent lines are sliced at once) with `token` blanked out."""
+    if len(lines) == 0:
+        return b''
+    cut = np.flatnonzero(np.diff(lines) != 1) + 1
+    run_first = first[lines[np.concatenate(([0], cut))]]
+    run_end = ends[lines[np.concatenate((cut - 1, [len(lines) - 1]))]]
+    blob = b''.join(raw[a:b + 1] for a, b in zip(run_first.tolist(), run_end.tolist()))
+    return blob.replace(token, b' ' * len(token))
+
+class ObjParseError(ValueError):
+    """A record whose numbers cannot be parsed."""
+
+def _fromstring(blob: bytes, dtype) -> Optional[np.ndarray]:
+    """np.fromstring(sep=' '), or None at a malformed token (NumPy only warns and stops there, newer ones raise)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return np.fromstring(blob, dtype=dtype, sep=' ')
+        except (DeprecationWarning, ValueError):
+            return None
+
+def _parse_floats(raw, first, ends, lines, token: bytes, width: int) -> np.ndarray:
+    """Parse the `width` leading floats of every selected line into an (N, width) float64 array."""
+    values = _fromstring(_gather_lines(raw, first, ends, lines, token), np.float64)
+    if values is not None and values.size == len(lines) * width:
+        return values.reshape(-1, width)
+    # some lines carry extra components (w, vertex colours) or a bad token - parse line by line
+    rows = []
+    for a, b in zip(first[lines].tolist(), ends[lines].tolist()):
+        try:
+            row = [float(x) for x in raw[a + len(token):b].split()[:width]]
+        except ValueError:
+            row = []
+        if len(row) != width:
+            raise ObjParseError(f"Malformed '{token.decode()}' record: {raw[a:b].decode('utf-8', 'replace')!r}")
+        rows.append(row)
+    return np.array(rows, dtype=np.float64).reshape(-1, width)
+
+def _face_layout(blob: bytes):
+    """Corners and '/' separators per line of a face blob."""
+    fb = np.frombuffer(blob, dtype=np.uint8)
+    newlines = np.flatnonzero(fb == ord('\n'))
+    space = np.isin(fb, _WS)
+    starts = np.flatnonzero(~space & np.concatenate(([True], space[:-1])))
+    slashes = np.flatnonzero(fb == ord('/'))
+    corners = np.diff(np.searchsorted(starts, newlines), prepend=0)
+    return corners, np.diff(np.searchsorted(slashes, newlines), prepend=0)
+
+def _resolve(idx: np.ndarray, count_before: np.ndarray) -> np.ndarray:
+    """OBJ 1-based / negative (relative) indices to 0-based."""
+    return np.where(idx > 0, idx - 1, count_before + idx)
+
+def parse_obj_block(raw: bytes) -> Optional[ObjRecords]:
+    """Tokenize a block of whole OBJ lines with array operations.
+
+    None if the face records are malformed (corner layouts); ObjParseError for a number that does
+    not parse.
+    """
+    if raw and not raw.endswith(b'\n'):
+        raw += b'\n'
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    first, ends = _line_table(buf)
+
+    v_lines = _select_lines(buf, first, b'v')
+    vt_lines = _select_lines(buf, first, b'vt')
+    vn_lines = _select_lines(buf, first, b'vn')
+
+    # faces: corners per line and components per corner (v, v/vt, v//vn, v/vt/vn)
+    f_lines = _select_lines(buf, first, b'f')
+    blob = _gather_lines(raw, first, ends, f_lines, b'f')
+    corners, slashes = _face_layout(blob)
+    if np.any(corners < 3):
+        # points/lines are not drawable - drop them
+        f_lines = f_lines[corners >= 3]
+        blob = _gather_lines(raw, first, ends, f_lines, b'f')
+        corners, slashes = _face_layout(blob)
+    if np.any(slashes % corners):
+        return None
+    comps = slashes // corners + 1
+    values = _fromstring(blob.replace(b'//', b'/0/').replace(b'/', b' '), np.int64)
+    if values is None:
+        raise ObjParseError("Malformed face index")
+    if values.size != int(np.sum(corners * comps)):
+        return None
+    corner_comps = np.repeat(comps, corners)
+    offset = np.cumsum(corner_comps) - corner_comps
+    last = max(values.size - 1, 0)
+
+    events = []
+    for token in (b'o', b'g', b'usemtl', b'mtllib'):
+        for n in _select_lines(buf, first, token).tolist():
+            events.append((n, token.decode(), raw[first[n]:ends[n]].decode('utf-8', errors='replace')))
+    events.sort()
+
+    return ObjRecords(
+        positions=_parse_floats(raw, first, ends, v_lines, b'v', 3),
+        tcoords=_parse_floats(raw, first, ends, vt_lines, b'vt', 2),
+        normals=_parse_floats(raw, first, ends, vn_lines, b'vn', 3),
+        v_lines=v_lines, vt_lines=vt_lines, vn_lines=vn_lines,
+        f_lines=f_lines, corners=corners,
+        raw_v=values[offset],
+        raw_vt=np.where(corner_comps >= 2, values[np.minimum(offset + 1, last)], 0),
+        raw_vn=np.where(corner_comps >= 3, values[np.minimum(offset + 2, last)], 0),
+        events=events)
+
+# --- Multi-process parsing (Loader.load_numpy with workers > 1) ---
+# ObjRecords arrays a worker hands back through shared memory; events are small and pickled
+_SHARED_FIELDS = tuple(f.name for f in fields(ObjRecords) if f.name != 'events')
+_LINE_FIELDS = ('v_lines', 'vt_lines', 'vn_lines', 'f_lines')
+MIN_PARALLEL_RANGE = 1 << 20
+
+def _line_ranges(path: str, count: int):
+    """Split a file into up to `count` byte ranges that end on a newline."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as file:
+        for k in range(1, count):
+            target = max(k * size // count, bounds[-1])
+            file.seek(target)
+            while True:
+                data = file.read(1 << 16)
+                cut = data.find(b'\n')
+                if cut >= 0 or not data:
+                    target = target + cut + 1 if cut >= 0 else size
+                    break
+                target += len(data)
+            bounds.append(target)
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def _create_block(size: int) -> shared_memory.SharedMemory:
+    """A shared memory block owned by the parent: this process's resource tracker must not unlink it."""
+    try:
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        block = shared_memory.SharedMemory(create=True, size=size)
+        resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+def _unlink_block(name: str):
+    try:
+        block = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+def _parse_range(path: str, start: int, end: int):
+    """Pool worker: parse_obj_block of bytes [start, end) into one shared memory block.
+
+    Returns None for malformed faces, else (block name, [(field, dtype, shape, offset)], events,
+    line count). The caller unlinks the block.
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        raw = file.read(end - start)
+    rec = parse_obj_block(raw)
+    if rec is None:
+        return None
+    arrays = [np.ascontiguousarray(getattr(rec, name)) for name in _SHARED_FIELDS]
+    layout, size = [], 0
+    for name, array in zip(_SHARED_FIELDS, arrays):
+        size += -size % 8
+        layout.append((name, array.dtype.str, array.shape, size))
+        size += array.nbytes
+    block = _create_block(max(size, 1))
+    for (_, _, shape, offset), array in zip(layout, arrays):
+        np.ndarray(shape, array.dtype, buffer=block.buf, offset=offset)[...] = array
+    block.close()
+    lines = raw.count(b'\n') + (not raw.endswith(b'\n'))
+    return block.name, layout, rec.events, lines
+
+def parse_obj_parallel(path: str, workers: Optional[int] = None) -> Optional[ObjRecords]:
+    """parse_obj_block of a whole file, its line-aligned byte ranges parsed in a process pool.
+
+    Workers return their arrays through shared memory; line numbers are shifted by the lines of
+    the ranges before, so the merged records equal parse_obj_block(file bytes) and face indices
+    resolve the same way. Processes are spawned, not forked: the caller may be a loader thread.
+    """
+    workers = workers or os.cpu_count() or 1
+    count = max(1, min(workers * 4, os.path.getsize(path) // MIN_PARALLEL_RANGE))
+    ranges = _line_ranges(path, count)
+    if not ranges:
+        return parse_obj_block(b'')
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(_parse_range, path, start, end) for start, end in ranges]
+    # every worker has finished: collect all block names, even past a failure, so none is leaked
+    results, error = [], None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(None)
+            error = error or e
+    names = [result[0] for result in results if result is not None]
+
+    blocks, parts, events, line_offset = [], {name: [] for name in _SHARED_FIELDS}, [], 0
+    try:
+        if error is not None:
+            raise error
+        for result in results:
+            if result is None:
+                continue
+            name, layout, block_events, lines = result
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            for field_name, dtype, shape, offset in layout:
+                view = np.ndarray(shape, dtype, buffer=block.buf, offset=offset)
+                parts[field_name].append(view + line_offset if field_name in _LINE_FIELDS else view)
+            del view  # views must be gone before the block is closed
+            events.extend((n + line_offset, token, line) for n, token, line in block_events)
+            line_offset += lines
+        merged = None
+        if None not in results:
+            merged = ObjRecords(events=events, **{name: np.concatenate(arrays) for name, arrays in parts.items()})
+    finally:
+        parts.clear()
+        for block in blocks:
+            block.close()
+            block.unlink()
+        for name in names[len(blocks):]:
+            _unlink_block(name)
+    return merged
+
+def build_triangles(rec: ObjRecords, pools=None, bases=(0, 0, 0)):
+    """Resolve face indices, apply auto-normals and fan-triangulate.
+
+    `pools` are the (positions, texcoords, normals) the indices point into, by default the block's
+    own; a streamed block passes the whole file's pools so far, `bases` being their sizes before it.
+    Returns float32 per-corner (positions, normals, texcoords), the corner id of every triangle vertex
+    and the running triangle count per face line.
+    """
+    face_of = np.repeat(np.arange(len(rec.f_lines)), rec.corners)
+    corner_start = np.cumsum(rec.corners) - rec.corners
+    if pools is None:
+        pools = (rec.positions, rec.tcoords, rec.normals)
+
+    # negative indices are relative to the pools as they were at the face line; 0 means missing
+    def lookup(pool, base, pool_lines, raw_idx, width):
+        before = base + np.searchsorted(pool_lines, rec.f_lines)[face_of]
+        have = raw_idx != 0
+        out = np.zeros((len(raw_idx), width), dtype=np.float64)
+        out[have] = pool[_resolve(raw_idx[have], before[have])]
+        return out
+
+    pos = lookup(pools[0], bases[0], rec.v_lines, rec.raw_v, 3)
+    uv = lookup(pools[1], bases[1], rec.vt_lines, rec.raw_vt, 2)
+    nrm = lookup(pools[2], bases[2], rec.vn_lines, rec.raw_vn, 3)
+
+    # auto-normal: a face with any zero normal gets the (unnormalized) face normal on all corners
+    if len(rec.f_lines):
+        zero = np.all(nrm == 0.0, axis=1)
+        flagged = np.add.reduceat(zero.astype(np.int64), corner_start) > 0
+        p0, p1, p2 = pos[corner_start], pos[corner_start + 1], pos[corner_start + 2]
+        face_n = np.cross(p0 - p1, p2 - p1)
+        nrm = np.where(flagged[face_of][:, None], face_n[face_of], nrm)
+
+    # fan triangulation (0, i, i+1)
+    tris = rec.corners - 2
+    tri_face = np.repeat(np.arange(len(rec.f_lines)), tris)
+    tri_start = np.cumsum(tris) - tris
+    j = np.arange(len(tri_face)) - tri_start[tri_face]
+    a = corner_start[tri_face]
+    tri_corners = np.stack((a, a + j + 1, a + j + 2), axis=1).ravel()
+    tris_before = np.concatenate(([0], np.cumsum(tris))).astype(np.int64)
+    return (pos.astype(np.float32), nrm.astype(np.float32), uv.astype(np.float32),
+            tri_corners, tris_before)
+
+# --- Out-of-core storage for Loader.iter_meshes ---
+STREAM_MEMORY_BUDGET = 512 * 2**20
+
+class SpillPool:
+    """Append-only (N, width) rows in an unlinked temp file, read back through memory maps."""
+    def __init__(self, width: int, dtype=np.float64, directory: Optional[str] = None):
+        self.width = width
+        self.dtype = np.dtype(dtype)
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.count = 0
+
+    def append(self, rows: np.ndarray):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype).reshape(-1, self.width)
+        self.file.write(rows.data)
+        self.count += len(rows)
+
+    def view(self) -> np.ndarray:
+        """Every row so far; drop the map when done so its pages leave the resident set."""
+        if not self.count:
+            return np.zeros((0, self.width), dtype=self.dtype)
+        self.file.flush()
+        return np.memmap(self.file, dtype=self.dtype, mode='r', shape=(self.count, self.width))
+
+    @property
+    def nbytes(self) -> int:
+        return self.count * self.width * self.dtype.itemsize
+
+    def close(self):
+        self.file.close()
+
 # --- OBJ Loader with Console Logging ---
 class Loader:
-    def __init__(self):
+    def __init__(self, optimize_meshes: bool = False,
+                 progress: Callable[[LoadProgress], None] = print_progress, lod_ratios=()):
+        # weld duplicate vertices and reorder for the vertex cache (load_numpy and iter_meshes)
+        self.optimize_meshes = optimize_meshes
+        # triangle ratio of each generated level of detail (load_numpy and iter_meshes)
+        self.lod_ratios = tuple(lod_ratios)
+        self.progress = progress
         self.meshes: List[Mesh] = []
         self.materials: List[Material] = []
-        self.vertices_all: List[Vertex] = []
-        self.indices_all: List[int] = []
+        self.mtl_paths: List[str] = []
 
     def load(self, path: str) -> bool:
         if not path.lower().endswith('.obj'):
@@ -134,9 +524,8 @@ class Loader:
         counter = 0
 
         def log_progress():
-            print(f"- {current_name}	| vertices > {len(positions)}	| texcoords > {len(tcoords)}"
-                  f"	| normals > {len(normals)}	| triangles > {len(verts)//3}"
-                  + (f"	| material: {mat_names[-1]}" if mat_names else ""))
+            self.progress(LoadProgress(current_name, len(positions), len(tcoords), len(normals),
+                                       len(verts)//3, mat_names[-1] if mat_names else None))
 
         for line in file:
             counter += 1
@@ -188,8 +577,6 @@ class Loader:
                     base = len(verts)
                     verts.extend(tri)
                     inds.extend([base, base+1, base+2])
-                    self.vertices_all.extend(tri)
-                    self.indices_all.extend([base, base+1, base+2])
             elif token == 'usemtl':
                 mat = tail(line)
                 mat_names.append(mat)
@@ -210,6 +597,195 @@ class Loader:
         print("Finished loading OBJ")
         return True
 
+    def load_numpy(self, path: str, workers: int = 1) -> bool:
+        """Vectorized variant of `load`: same meshes and materials, attributes kept in flat float32 arrays.
+
+        With workers > 1 the text is parsed by that many processes (parse_obj_parallel); the result
+        is identical.
+        """
+        if not path.lower().endswith('.obj'):
+            print(f"Error: Not an .obj file: {path}")
+            return False
+        try:
+            with open(path, 'rb') as file:
+                raw = file.read() if workers <= 1 else None
+        except IOError:
+            print(f"Error: Cannot open file: {path}")
+            return False
+
+        print(f"Loading OBJ (numpy{f', {workers} processes' if workers > 1 else ''}): {path}")
+        try:
+            rec = parse_obj_block(raw) if raw is not None else parse_obj_parallel(path, workers)
+        except ObjParseError as e:
+            print(f"Error: {e}: {path}")
+            return False
+        if rec is None:
+            print(f"Error: Malformed face records: {path}")
+            return False
+        *attributes, tris_before = build_triangles(rec)
+        self.progress(LoadProgress(os.path.basename(path), len(rec.positions), len(rec.tcoords),
+                                   len(rec.normals), int(tris_before[-1])))
+        self._replay_events(path, rec.events, rec.f_lines, tris_before, attributes)
+        print("Finished loading OBJ")
+        return True
+
+    def load_streaming(self, path: str, on_mesh: Optional[Callable[[Mesh], None]] = None,
+                       memory_budget: int = STREAM_MEMORY_BUDGET, spill_dir: Optional[str] = None) -> bool:
+        """iter_meshes with a callback; without one the meshes go to self.meshes like load_numpy."""
+        meshes = self.iter_meshes(path, memory_budget, spill_dir)
+        while True:
+            try:
+                mesh = next(meshes)
+            except StopIteration as done:
+                return done.value
+            (on_mesh or self.meshes.append)(mesh)
+
+    def iter_meshes(self, path: str, memory_budget: int = STREAM_MEMORY_BUDGET, spill_dir: Optional[str] = None):
+        """Out-of-core variant of load_numpy: yields each mesh as its o/g/usemtl section closes.
+
+        The file is parsed in blocks of memory_budget / 24 bytes (a block expands ~20 times
+        while it is tokenized). The v/vt/vn pools of the whole file and the triangles of the open
+        section are spilled to unlinked temp files in `spill_dir`; a finished mesh larger than
+        memory_budget / 8 keeps memory-mapped arrays instead of being read into memory. Meshes are
+        not added to self.meshes. Returns (as StopIteration.value) False if the file is unusable.
+        """
+        if not path.lower().endswith('.obj'):
+            print(f"Error: Not an .obj file: {path}")
+            return False
+        try:
+            file = open(path, 'rb')
+        except IOError:
+            print(f"Error: Cannot open file: {path}")
+            return False
+
+        print(f"Loading OBJ (streaming, {memory_budget / 2**20:.0f} MB budget): {path}")
+        block_bytes = max(memory_budget // 24, 1 << 20)
+        pools = [SpillPool(3, directory=spill_dir), SpillPool(2, directory=spill_dir),
+                 SpillPool(3, directory=spill_dir)]
+        section = None
+        current_name = ''
+        mat_names: List[str] = []
+        listening = False
+        triangles = 0
+
+        def new_section():
+            return [SpillPool(3, np.float32, spill_dir), SpillPool(3, np.float32, spill_dir),
+                    SpillPool(2, np.float32, spill_dir)]
+
+        def finish_section():
+            keep_mapped = sum(p.nbytes for p in section) > memory_budget // 8
+            arrays = [p.view() if keep_mapped else np.array(p.view()) for p in section]
+            for p in section:
+                p.close()
+            mat = mat_names[-1] if mat_names else None
+            return self._make_mesh(current_name, *arrays, mat)
+
+        try:
+            section = new_section()
+            carry = b''
+            while True:
+                data = file.read(block_bytes)
+                block = carry + data
+                if data:
+                    cut = block.rfind(b'\n') + 1
+                    if not cut:
+                        carry = block  # a line longer than the block
+                        continue
+                    block, carry = block[:cut], block[cut:]
+                if not block:
+                    break
+                carry = carry if data else b''
+                try:
+                    rec = parse_obj_block(block)
+                except ObjParseError as e:
+                    print(f"Error: {e}: {path}")
+                    return False
+                if rec is None:
+                    print(f"Error: Malformed face records: {path}")
+                    return False
+                bases = tuple(p.count for p in pools)
+                for pool, rows in zip(pools, (rec.positions, rec.tcoords, rec.normals)):
+                    pool.append(rows)
+                views = [p.view() for p in pools]
+                positions, normals, texcoords, tri_corners, tris_before = build_triangles(rec, views, bases)
+                del views
+
+                def flush(end):
+                    corners = tri_corners[flush.start * 3:end * 3]
+                    for pool, values in zip(section, (positions, normals, texcoords)):
+                        pool.append(values[corners])
+                    flush.start = end
+                flush.start = 0
+
+                for line_no, token, line in rec.events:
+                    flush(int(tris_before[np.searchsorted(rec.f_lines, line_no)]))
+                    if token in ('o', 'g'):
+                        if not listening:
+                            listening = True
+                        elif section[0].count:
+                            yield finish_section()
+                            section = new_section()
+                        current_name = tail(line) or 'unnamed'
+                        print(f"Object/Group: {current_name}")
+                    elif token == 'usemtl':
+                        mat = tail(line)
+                        mat_names.append(mat)
+                        print(f"Use material: {mat}")
+                        if section[0].count:
+                            yield finish_section()
+                            section = new_section()
+                    else:
+                        mtl_path = os.path.join(os.path.dirname(path), tail(line))
+                        print(f"Loading materials from: {mtl_path}")
+                        self._load_mtl(mtl_path)
+                flush(int(tris_before[-1]))
+                triangles += int(tris_before[-1])
+                self.progress(LoadProgress(os.path.basename(path), pools[0].count, pools[1].count,
+                                           pools[2].count, triangles))
+            if section[0].count:
+                yield finish_section()
+        finally:
+            file.close()
+            for p in pools + (section or []):
+                p.close()
+        print("Finished loading OBJ")
+        return True
+
+    def _replay_events(self, path, events, f_lines, tris_before, attributes):
+        """Run the o/g/usemtl/mtllib state machine of `load` over the control lines only."""
+        current_name = ''
+        mat_names: List[str] = []
+        listening = False
+        start = 0
+        for line_no, token, line in events:
+            done = int(tris_before[np.searchsorted(f_lines, line_no)])
+            if token in ('o', 'g'):
+                if not listening:
+                    listening = True
+                else:
+                    if done > start:
+                        mat = mat_names[-1] if mat_names else None
+                        self._finalize_arrays(current_name, attributes, start, done, mat)
+                    start = done
+                current_name = tail(line) or 'unnamed'
+                print(f"Object/Group: {current_name}")
+            elif token == 'usemtl':
+                mat = tail(line)
+                mat_names.append(mat)
+                print(f"Use material: {mat}")
+                if done > start:
+                    self._finalize_arrays(current_name, attributes, start, done, mat)
+                    start = done
+            else:
+                mtl_path = os.path.join(os.path.dirname(path), tail(line))
+                print(f"Loading materials from: {mtl_path}")
+                self._load_mtl(mtl_path)
+
+        total = int(tris_before[-1])
+        if total > start:
+            mat = mat_names[-1] if mat_names else None
+            self._finalize_arrays(current_name, attributes, start, total, mat)
+
     def _finalize_mesh(self, name: str, verts: List[Vertex], inds: List[int], mat_name: Optional[str]):
         mesh_mat = None
         if mat_name:
@@ -217,9 +793,29 @@ class Loader:
         mesh = Mesh(name=name, vertices=list(verts), indices=list(inds), materials=mesh_mat)
         self.meshes.append(mesh)
 
+    def _finalize_arrays(self, name: str, attributes, start: int, end: int, mat_name: Optional[str]):
+        positions, normals, texcoords, tri_corners = attributes
+        corners = tri_corners[start * 3:end * 3]
+        self.meshes.append(self._make_mesh(name, positions[corners], normals[corners], texcoords[corners],
+                                           mat_name))
+
+    def _make_mesh(self, name: str, positions, normals, texcoords, mat_name: Optional[str]) -> Mesh:
+        mesh_mat = None
+        if mat_name:
+            mesh_mat = next((m for m in self.materials if m.name == mat_name), None)
+        mesh = Mesh(name=name, vertices=[], indices=np.arange(len(positions), dtype=np.uint32),
+                    materials=mesh_mat, positions=positions, normals=normals, texcoords=texcoords)
+        if self.optimize_meshes:
+            (mesh.positions, mesh.normals, mesh.texcoords,
+             mesh.indices, mesh.stats) = optimize_mesh(*mesh.as_arrays())
+        if self.lod_ratios:
+            mesh.lods, mesh.lod_errors = simplify_lods(*mesh.as_arrays(), self.lod_ratios)
+        return mesh
+
     def _load_mtl(self, path: str) -> bool:
         if not path.lower().endswith('.mtl'):
             return False
+        self.mtl_paths.append(path)
         try:
             file = open(path, 'r')
         except IOError:
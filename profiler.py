@@ -0,0 +1,261 @@
+import contextlib
+import ctypes
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+from OpenGL.GL import *
+# the wrapped glGetQueryObjectui64v has no array type for GLuint64 outputs
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as _get_query_ui64
+
+_NULL_SCOPE = contextlib.nullcontext()
+
+
+class _Scope:
+    __slots__ = ('profiler', 'name', 'gpu', 'path', 'start', 'query')
+
+    def __init__(self, profiler, name, gpu):
+        self.profiler = profiler
+        self.name = name
+        self.gpu = gpu
+        self.query = None
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._exit(self)
+
+
+class Profiler:
+    """Per-frame CPU/GPU timings of nested named scopes, plus per-frame counters.
+
+    CPU time comes from perf_counter_ns. Scopes opened with gpu=True are also timed with a
+    GL_TIME_ELAPSED query; GL allows one such query at a time, so a GPU scope nested in another
+    is timed on the CPU only. Queries are double-buffered: frame N reads the queries of frame N-2,
+    and a result that is not available yet is checked again later instead of waiting for it.
+    Statistics are rolling percentiles over the last `window` frames. While disabled, scope()
+    returns a shared no-op context and nothing is recorded.
+    """
+
+    def __init__(self, enabled=False, window=300):
+        self.enabled = enabled
+        self.requested = enabled  # toggles take effect at the next begin_frame
+        self.window = window
+        self.frame = 0
+        self.frames = deque(maxlen=window)  # {'frame', 'start', 'cpu': {path: ms}, 'gpu': {...}, 'counters': {...}}
+        self.events = deque(maxlen=window * 64)  # (frame, path, depth, start_ns, duration_ns) for the trace
+        self.sources = {}  # counter name -> callable returning a running total
+        self._last_totals = {}
+        self._counts = {}
+        self._stack = []
+        self._record = None
+        self._origin = time.perf_counter_ns()
+        # GL_TIME_ELAPSED queries: two sets of (frame, path, query) written on alternate frames
+        self._pending = ([], [])
+        self._free_queries = []
+        self._gpu_busy = False
+        self._result = ctypes.c_uint64()
+        self.gpu_late = 0
+
+    # --- recording
+    def scope(self, name, gpu=False):
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name, gpu)
+
+    def track(self, name, source):
+        """Record the per-frame change of `source()`, a running total (draw calls, bytes uploaded, ...)."""
+        self.sources[name] = source
+        self._last_totals[name] = source()
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self._counts[name] = self._counts.get(name, 0) + n
+
+    def _enter(self, scope):
+        scope.path = '/'.join([s.name for s in self._stack] + [scope.name])
+        self._stack.append(scope)
+        if scope.gpu and not self._gpu_busy:
+            scope.query = self._free_queries.pop() if self._free_queries else int(np.ravel(glGenQueries(1))[0])
+            glBeginQuery(GL_TIME_ELAPSED, scope.query)
+            self._gpu_busy = True
+        scope.start = time.perf_counter_ns()
+
+    def _exit(self, scope):
+        end = time.perf_counter_ns()
+        if scope.query is not None:
+            glEndQuery(GL_TIME_ELAPSED)
+            self._gpu_busy = False
+            self._pending[self.frame % 2].append((self.frame, scope.path, scope.query))
+        self._stack.pop()
+        duration = end - scope.start
+        if self._record is not None:
+            cpu = self._record['cpu']
+            cpu[scope.path] = cpu.get(scope.path, 0.0) + duration / 1e6
+        self.events.append((self.frame, scope.path, len(self._stack), scope.start - self._origin, duration))
+
+    def begin_frame(self):
+        if self.requested != self.enabled:
+            self._apply_toggle()
+        if not self.enabled:
+            return
+        self.frame += 1
+        self._collect_gpu(self._pending[self.frame % 2])
+        self._record = {'frame': self.frame, 'start': time.perf_counter_ns(), 'cpu': {}, 'gpu': {}, 'counters': {}}
+
+    def end_frame(self):
+        if not self.enabled or self._record is None:
+            return
+        record = self._record
+        record['cpu']['frame'] = (time.perf_counter_ns() - record['start']) / 1e6
+        counters = dict(self._counts)
+        for name, source in self.sources.items():
+            total = source()
+            counters[name] = total - self._last_totals[name]
+            self._last_totals[name] = total
+        record['counters'] = counters
+        self._counts.clear()
+        self.frames.append(record)
+        self._record = None
+
+    def _collect_gpu(self, pending):
+        """Read finished queries of an earlier frame; unfinished ones are kept for a later frame."""
+        waiting = []
+        by_frame = {record['frame']: record for record in self.frames}
+        for frame, path, query in pending:
+            if not glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                waiting.append((frame, path, query))
+                self.gpu_late += 1
+                continue
+            _get_query_ui64(query, GL_QUERY_RESULT, ctypes.byref(self._result))
+            elapsed = self._result.value
+            record = by_frame.get(frame)
+            if record is not None:
+                record['gpu'][path] = record['gpu'].get(path, 0.0) + elapsed / 1e6
+            self._free_queries.append(query)
+        pending[:] = waiting
+
+    def finish(self):
+        """Wait for the GPU and collect every outstanding query (end of a scripted run)."""
+        glFinish()
+        for pending in self._pending:
+            self._collect_gpu(pending)
+
+    def toggle(self):
+        self.requested = not self.requested
+        return self.requested
+
+    def _apply_toggle(self):
+        self.enabled = self.requested
+        self._record = None
+        if self.enabled:
+            # counters restart from here, not from when they were last sampled
+            for name, source in self.sources.items():
+                self._last_totals[name] = source()
+        print(f"Profiler {'on' if self.enabled else 'off'}")
+
+    # --- statistics and export
+    def _series(self, kind, name):
+        return np.array([r[kind][name] for r in self.frames if name in r[kind]], dtype=np.float64)
+
+    def paths(self):
+        """Scope paths in first-seen order, 'frame' first."""
+        seen = {'frame': None}
+        for record in self.frames:
+            for path in record['cpu']:
+                seen.setdefault(path, None)
+        return list(seen)
+
+    def counter_names(self):
+        seen = {}
+        for record in self.frames:
+            for name in record['counters']:
+                seen.setdefault(name, None)
+        return list(seen)
+
+    def percentiles(self, kind, name, q=(50, 95, 99)):
+        values = self._series(kind, name)
+        return np.percentile(values, q) if len(values) else None
+
+    def stats(self, q=(50, 95, 99)) -> dict:
+        """{'cpu': {path: {'p50': ms, ...}}, 'gpu': {...}, 'counters': {...}} for JSON reports."""
+        result = {}
+        for kind, names in (('cpu', self.paths()), ('gpu', self.paths()), ('counters', self.counter_names())):
+            result[kind] = {}
+            for name in names:
+                values = self.percentiles(kind, name, q)
+                if values is not None:
+                    result[kind][name] = {f"p{p}": float(v) for p, v in zip(q, values)}
+        return result
+
+    def summary(self) -> str:
+        lines = [f"{'scope':<32} {'cpu p50':>8} {'p95':>8} {'p99':>8} {'gpu p50':>8} {'p95':>8} {'p99':>8}"]
+        for path in self.paths():
+            cpu = self.percentiles('cpu', path)
+            gpu = self.percentiles('gpu', path)
+            if cpu is None:
+                continue
+            gpu_text = " ".join(f"{v:8.3f}" for v in gpu) if gpu is not None else f"{'-':>8} {'-':>8} {'-':>8}"
+            lines.append(f"{path:<32} " + " ".join(f"{v:8.3f}" for v in cpu) + " " + gpu_text)
+        for name in self.counter_names():
+            p50, p95, p99 = self.percentiles('counters', name)
+            lines.append(f"{name:<32} {p50:8.0f} {p95:8.0f} {p99:8.0f}")
+        return "\n".join(lines)
+
+    def report(self) -> str:
+        """One line for the window caption: frame and top-level scope medians, in ms."""
+        if not self.frames:
+            return "profiler: no frames"
+        parts = []
+        for path in self.paths():
+            if '/' in path:
+                continue
+            cpu = self.percentiles('cpu', path, (50, 95))
+            gpu = self.percentiles('gpu', path, (50,))
+            parts.append(f"{path} {cpu[0]:.2f}/{cpu[1]:.2f}" + (f" gpu {gpu[0]:.2f}" if gpu is not None else ""))
+        return " | ".join(parts)
+
+    def export_csv(self, path):
+        """One row per recorded frame: CPU and GPU ms of every scope, then the counters."""
+        paths, counters = self.paths(), self.counter_names()
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame'] + [f"{p} cpu ms" for p in paths] + [f"{p} gpu ms" for p in paths] + counters)
+            for record in self.frames:
+                writer.writerow([record['frame']]
+                                + [record['cpu'].get(p, '') for p in paths]
+                                + [record['gpu'].get(p, '') for p in paths]
+                                + [record['counters'].get(c, '') for c in counters])
+        print(f"Wrote {path} ({len(self.frames)} frames)")
+
+    def export_chrome_trace(self, path):
+        """Trace Event Format JSON for chrome://tracing or Perfetto.
+
+        CPU scopes are complete events on one track. GPU durations go on a second track, starting
+        where their CPU scope started (TIME_ELAPSED gives durations, not GPU timestamps).
+        """
+        gpu = {record['frame']: record['gpu'] for record in self.frames}
+        trace = []
+        for frame, scope_path, depth, start, duration in self.events:
+            name = scope_path.rsplit('/', 1)[-1]
+            trace.append({'name': name, 'cat': 'cpu', 'ph': 'X', 'pid': 1, 'tid': 1,
+                          'ts': start / 1e3, 'dur': duration / 1e3, 'args': {'frame': frame, 'path': scope_path}})
+            gpu_ms = gpu.get(frame, {}).get(scope_path)
+            if gpu_ms is not None:
+                trace.append({'name': name, 'cat': 'gpu', 'ph': 'X', 'pid': 1, 'tid': 2,
+                              'ts': start / 1e3, 'dur': gpu_ms * 1e3, 'args': {'frame': frame}})
+        for record in self.frames:
+            trace.append({'name': 'counters', 'ph': 'C', 'pid': 1, 'ts': (record['start'] - self._origin) / 1e3,
+                          'args': record['counters']})
+        trace.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 1, 'args': {'name': 'CPU'}})
+        trace.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 2, 'args': {'name': 'GPU'}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        print(f"Wrote {path} ({len(trace)} events)")
+
+
+profiler = Profiler()
@@ -0,0 +1,215 @@
+"""Sorted draw submission: items keyed by pass/program/texture/VAO/depth, executed with minimal state changes."""
+import contextlib
+
+import numpy as np
+from OpenGL.GL import *
+
+from model import draw_counter
+
+# pass ids: shadow cascade layers first, then the camera view
+PASS_SHADOW = 0
+PASS_MAIN = 8
+
+# 64-bit key, most significant first: pass 4 | program 8 | texture 16 | VAO 16 | depth 20
+_PASS_SHIFT, _PROGRAM_SHIFT, _TEXTURE_SHIFT, _VAO_SHIFT = 60, 52, 36, 20
+_DEPTH_MAX = (1 << 20) - 1
+
+# compiled command ops
+SETUP, PROGRAM, VAO, TEXTURE, DRAW = range(5)
+
+
+class GLBackend:
+    """The GL calls the executor makes; a recording mock can stand in for it."""
+
+    def use_program(self, program):
+        program.use()
+
+    def bind_vertex_array(self, vao):
+        glBindVertexArray(vao)
+        draw_counter.bind()
+
+    def bind_texture(self, texture_id):
+        glBindTexture(GL_TEXTURE_2D, texture_id)
+        draw_counter.bind()
+
+
+class RenderPass:
+    __slots__ = ('pass_id', 'setup', 'program', 'name')
+
+    def __init__(self, pass_id, setup, program, name):
+        self.pass_id = pass_id
+        self.setup = setup
+        self.program = program
+        self.name = name
+
+
+class RenderQueue:
+    """One frame of draw items, sorted by key with NumPy and executed with redundant binds left out.
+
+    Each pass has a setup callable (framebuffer, clears, per-pass uniforms) run with the pass's
+    program bound; it runs even when no item was submitted to the pass. Setups must leave the
+    VAO and the texture on unit 0 alone, the executor tracks those. Items are
+    (pass, program, texture, VAO, depth, draw, args); texture None means no texture bind (depth
+    passes). Texture unit 0 is assumed active during items.
+
+    The sorted, state-diffed command list is kept; a frame submitting the same items with the same
+    keys replays it without sorting or diffing again. State is not assumed to carry over between
+    frames, so every frame starts with a full set of binds.
+    """
+
+    def __init__(self, backend=None, scope=None):
+        self.backend = backend or GLBackend()
+        # pass name -> context manager wrapped around the pass (profiler scopes)
+        self.scope = scope or (lambda name: contextlib.nullcontext())
+        self._ids = ({}, {}, {})  # program / texture / VAO -> small index for the key, stable across frames
+        self._free = ([], [], [])  # indices of forgotten objects, handed out again first
+        self.eye = np.zeros(3)
+        self.far = 1.0
+        self.passes = {}
+        self.keys = []
+        self.items = []  # (program, texture_id, vao, draw, args)
+        self.commands = []
+        self._signature = None
+        self._redundant = 0
+        # running totals
+        self.compiled = 0
+        self.replayed = 0
+        self.state_changes = 0
+        self.redundant = 0
+        self.last_frame = {}
+
+    # --- submission
+    def begin_frame(self, eye=(0.0, 0.0, 0.0), far=1.0):
+        """Camera position and far distance for the depth bits of the keys."""
+        self.eye = np.asarray(eye, dtype=np.float64)
+        self.far = far
+        self.passes = {}
+        self.keys = []
+        self.items = []
+
+    def begin_pass(self, pass_id, setup=None, program=None, name=None):
+        self.passes[pass_id] = RenderPass(pass_id, setup, program, name or f"pass {pass_id}")
+
+    def _index(self, kind, obj, bits):
+        if obj is None:
+            return 0
+        ids = self._ids[kind]
+        index = ids.get(obj)
+        if index is None:
+            free = self._free[kind]
+            index = ids[obj] = free.pop() if free else len(ids) + 1  # 0 is "none"
+        return index & ((1 << bits) - 1)
+
+    def forget(self, programs=(), textures=(), vaos=()):
+        """Drop deleted GL objects from the key indices (streamed chunks come and go)."""
+        for kind, objs in enumerate((programs, textures, vaos)):
+            for obj in objs:
+                index = self._ids[kind].pop(obj, None)
+                if index is not None:
+                    self._free[kind].append(index)
+        # GL recycles names: never replay commands compiled for the deleted object
+        self._signature = None
+
+    def depth_bits(self, points) -> int:
+        """Quantized distance from the eye to the nearest of `points` ((N, 3) or (3,))."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        distance = np.linalg.norm(points - self.eye, axis=1).min() if len(points) else 0.0
+        return int(np.clip(distance / self.far, 0.0, 1.0) * _DEPTH_MAX)
+
+    def add(self, pass_id, program, texture_id, vao, depth, draw, *args):
+        """Queue `draw(*args)`; `depth` comes from depth_bits (front to back within equal state)."""
+        key = ((pass_id & 0xF) << _PASS_SHIFT | self._index(0, program, 8) << _PROGRAM_SHIFT
+               | self._index(1, texture_id, 16) << _TEXTURE_SHIFT | self._index(2, vao, 16) << _VAO_SHIFT
+               | (depth & _DEPTH_MAX))
+        self.keys.append(key)
+        self.items.append((program, texture_id, vao, draw, args))
+
+    # --- execution
+    def signature(self):
+        def token(value):
+            return value.tobytes() if isinstance(value, np.ndarray) else value
+        return (tuple(self.keys), tuple((p, self.passes[p].program) for p in sorted(self.passes)),
+                tuple((item[3], tuple(token(a) for a in item[4])) for item in self.items))
+
+    def compile(self):
+        """Commands for this frame's items in key order, each bind only where the state changes."""
+        keys = np.array(self.keys, dtype=np.uint64)
+        order = np.argsort(keys, kind='stable')
+        item_passes = (keys[order] >> np.uint64(_PASS_SHIFT)).astype(np.int64)
+        commands = []
+        redundant = 0
+        program = vao = texture = None
+        position = 0
+        for pass_id in sorted(set(self.passes) | set(item_passes.tolist())):
+            render_pass = self.passes.get(pass_id)
+            if render_pass is not None:
+                commands.append((SETUP, pass_id))
+                if render_pass.program is not None:
+                    program = render_pass.program
+            while position < len(order) and item_passes[position] == pass_id:
+                i = int(order[position])
+                position += 1
+                item_program, item_texture, item_vao, _, _ = self.items[i]
+                for op, wanted, current in ((PROGRAM, item_program, program), (VAO, item_vao, vao),
+                                            (TEXTURE, item_texture, texture)):
+                    if wanted is None:
+                        continue
+                    if wanted == current:
+                        redundant += 1
+                    else:
+                        commands.append((op, wanted))
+                program = item_program if item_program is not None else program
+                vao = item_vao if item_vao is not None else vao
+                texture = item_texture if item_texture is not None else texture
+                commands.append((DRAW, i))
+        if vao is not None:
+            commands.append((VAO, 0))
+        return commands, redundant
+
+    def execute(self):
+        """Run this frame's passes and items, replaying last frame's commands when nothing changed."""
+        signature = self.signature()
+        replay = signature == self._signature
+        if replay:
+            self.replayed += 1
+        else:
+            self.commands, self._redundant = self.compile()
+            self._signature = signature
+            self.compiled += 1
+        backend = self.backend
+        changes = 0
+        with contextlib.ExitStack() as stack:
+            for op, arg in self.commands:
+                if op == DRAW:
+                    draw, args = self.items[arg][3:]
+                    draw(*args)
+                elif op == SETUP:
+                    stack.close()
+                    render_pass = self.passes[arg]
+                    stack.enter_context(self.scope(render_pass.name))
+                    if render_pass.program is not None:
+                        backend.use_program(render_pass.program)
+                        changes += 1
+                    if render_pass.setup is not None:
+                        render_pass.setup()
+                elif op == PROGRAM:
+                    backend.use_program(arg)
+                    changes += 1
+                elif op == VAO:
+                    backend.bind_vertex_array(arg)
+                    changes += 1
+                else:
+                    backend.bind_texture(arg)
+                    changes += 1
+        self.state_changes += changes
+        self.redundant += self._redundant
+        self.last_frame = {'items': len(self.items), 'passes': len(self.passes), 'state changes': changes,
+                           'redundant': self._redundant, 'replayed': replay}
+        return changes
+
+    def report(self):
+        f = self.last_frame
+        if not f:
+            return "render queue: no frames"
+        return (f"queue {f['items']} items, {f['state changes']} binds ({f['redundant']} redundant skipped)"
+                f" | {self.replayed} replayed / {self.compiled} compiled")
@@ -0,0 +1,90 @@
+"""Parent/child transform hierarchy with dirty flags, evaluated in NumPy batches (matrices indexed [row, column])."""
+import numpy as np
+
+from instancing import normal_matrices
+
+
+class TransformTree:
+    """Local transforms of scene nodes; world and normal matrices are recomputed only for changed subtrees.
+
+    Nodes are integer handles. A parent is always added before its children, so evaluating depth
+    by depth visits every parent first and each depth is one batched matrix product. Normal
+    matrices (inverse transpose of the world 3x3) come from instancing.normal_matrices, the same
+    values the instance buffer uploads.
+    """
+
+    def __init__(self, capacity=16):
+        self.count = 0
+        self._local = np.zeros((capacity, 4, 4), dtype=np.float32)
+        self._world = np.zeros((capacity, 4, 4), dtype=np.float32)
+        self._normal = np.zeros((capacity, 3, 3), dtype=np.float32)
+        self._parent = np.full(capacity, -1, dtype=np.int64)
+        self._depth = np.zeros(capacity, dtype=np.int64)
+        self._dirty = np.zeros(capacity, dtype=bool)
+        # bumped whenever a node's world matrix is recomputed
+        self._version = np.zeros(capacity, dtype=np.int64)
+        self.evaluated = 0  # world matrices computed so far, for stats
+
+    def _grow(self):
+        capacity = 2 * len(self._local)
+        for name in ('_local', '_world', '_normal', '_parent', '_depth', '_dirty', '_version'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, local=None, parent=-1) -> int:
+        if parent >= self.count:
+            raise ValueError(f"parent {parent} does not exist")
+        if self.count == len(self._local):
+            self._grow()
+        node = self.count
+        self.count += 1
+        self._local[node] = np.eye(4) if local is None else np.asarray(local, dtype=np.float32)
+        self._parent[node] = parent
+        self._depth[node] = 0 if parent < 0 else self._depth[parent] + 1
+        self._dirty[node] = True
+        return node
+
+    def set_local(self, nodes, matrices):
+        """One node and a (4, 4) matrix / glm.mat4, or an array of nodes and (k, 4, 4) matrices."""
+        self._local[nodes] = np.asarray(matrices, dtype=np.float32)
+        self._dirty[nodes] = True
+
+    def local(self, node) -> np.ndarray:
+        return self._local[node]
+
+    def update(self) -> int:
+        """Recompute world and normal matrices of dirty nodes and their descendants; returns how many."""
+        n = self.count
+        dirty, parent, depth = self._dirty[:n], self._parent[:n], self._depth[:n]
+        if not dirty.any():
+            return 0
+        max_depth = int(depth.max())
+        for d in range(1, max_depth + 1):
+            at = np.flatnonzero(depth == d)
+            dirty[at] |= dirty[parent[at]]
+        for d in range(max_depth + 1):
+            idx = np.flatnonzero(dirty & (depth == d))
+            if not len(idx):
+                continue
+            if d == 0:
+                self._world[idx] = self._local[idx]
+            else:
+                self._world[idx] = self._world[parent[idx]] @ self._local[idx]
+        changed = np.flatnonzero(dirty)
+        self._normal[changed] = normal_matrices(self._world[changed])
+        self._version[changed] += 1
+        dirty[:] = False
+        self.evaluated += len(changed)
+        return len(changed)
+
+    def world(self, nodes) -> np.ndarray:
+        """World matrices of `nodes` as of the last update: (4, 4) for one node, (k, 4, 4) for an array."""
+        return self._world[nodes]
+
+    def normal(self, nodes) -> np.ndarray:
+        return self._normal[nodes]
+
+    def version(self, node) -> int:
+        return int(self._version[node])
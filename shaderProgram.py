@@ -2,9 +2,14 @@ import sys
 import glfw
 from OpenGL.GL import *
 import glm
+import numpy as np
 
 class ShaderProgram:
-    def __init__(self, vertex_shader_file, geometry_shader_file=None, fragment_shader_file=None):
+    binds = 0  # glUseProgram calls across all programs
+
+    def __init__(self, vertex_shader_file, geometry_shader_file=None, fragment_shader_file=None, defines=None):
+        # {name: value} emitted as #define lines after #version, for compile-time variants
+        self.defines = dict(defines or {})
         # Compile shaders
         self.vertex_shader = self._load_shader(GL_VERTEX_SHADER, vertex_shader_file)
         if geometry_shader_file:
@@ -32,6 +37,25 @@ class ShaderProgram:
             glDetachShader(self.program, self.geometry_shader)
         glDetachShader(self.program, self.fragment_shader)
 
+        # Uniform bookkeeping: locations queried once, last uploaded value per location
+        self.locations = {}
+        self.values = {}
+        self._warned = set()
+        self.uploads = 0
+        self.skipped = 0
+        self._query_uniforms()
+
+    def _query_uniforms(self):
+        count = glGetProgramiv(self.program, GL_ACTIVE_UNIFORMS)
+        for i in range(count):
+            name, _, _ = glGetActiveUniform(self.program, i)
+            name = name.decode('utf-8') if isinstance(name, bytes) else name
+            loc = glGetUniformLocation(self.program, name)
+            self.locations[name] = loc
+            # arrays are reported as "name[0]"; allow addressing them by the bare name too
+            if name.endswith('[0]'):
+                self.locations[name[:-3]] = loc
+
     def _read_file(self, file_path):
         try:
             with open(file_path, 'r') as f:
@@ -40,9 +64,18 @@ class ShaderProgram:
             print(f"Failed to read shader file '{file_path}': {e}", file=sys.stderr)
             sys.exit(1)
 
+    def _inject_defines(self, source):
+        if not self.defines:
+            return source
+        lines = "".join(f"#define {name} {value}\n" for name, value in self.defines.items())
+        if source.startswith("#version"):
+            version, _, rest = source.partition("\n")
+            return f"{version}\n{lines}{rest}"
+        return lines + source
+
     def _load_shader(self, shader_type, file_path):
         # Read source
-        source = self._read_file(file_path)
+        source = self._inject_defines(self._read_file(file_path))
         shader = glCreateShader(shader_type)
         glShaderSource(shader, source)
         glCompileShader(shader)
@@ -56,38 +89,67 @@ class ShaderProgram:
 
     def use(self):
         glUseProgram(self.program)
+        ShaderProgram.binds += 1
 
     def u(self, name):
-        return glGetUniformLocation(self.program, name)
+        loc = self.locations.get(name)
+        if loc is None:
+            # e.g. individual array elements; looked up once and remembered
+            loc = glGetUniformLocation(self.program, name)
+            self.locations[name] = loc
+        return loc
 
     def a(self, name):
         return glGetAttribLocation(self.program, name)
-    
-    def set_int(self, name: str, value: int):
+
+    def has_uniform(self, name):
+        return self.u(name) != -1
+
+    def bind_uniform_block(self, block_name: str, binding: int):
+        index = glGetUniformBlockIndex(self.program, block_name)
+        if index == GL_INVALID_INDEX:
+            print(f"Warning: uniform block '{block_name}' not found")
+            return
+        glUniformBlockBinding(self.program, index, binding)
+
+    def _set(self, name, key, upload):
+        """Call `upload(loc)` unless the uniform is missing or already holds `key`."""
         loc = self.u(name)
         if loc == -1:
-            print(f"Warning: uniform '{name}' not found")
-        glUniform1i(loc, value)
+            if name not in self._warned:
+                self._warned.add(name)
+                print(f"Warning: uniform '{name}' not found")
+            return
+        if self.values.get(loc) == key:
+            self.skipped += 1
+            return
+        upload(loc)
+        self.values[loc] = key
+        self.uploads += 1
+
+    def set_int(self, name: str, value: int):
+        value = int(value)
+        self._set(name, value, lambda loc: glUniform1i(loc, value))
 
     def set_float(self, name: str, value: float):
-        loc = self.u(name)
-        if loc == -1:
-            print(f"Warning: uniform '{name}' not found")
-        glUniform1f(loc, value)
+        value = float(value)
+        self._set(name, value, lambda loc: glUniform1f(loc, value))
 
     def set_mat4(self, name: str, mat):
-        """Upload a 4×4 matrix (numpy array dtype=float32, shape=(4,4))."""
-        loc = self.u(name)
-        if loc == -1:
-            print(f"Warning: uniform '{name}' not found")
-        glUniformMatrix4fv(loc, 1, GL_FALSE, glm.value_ptr(mat))
+        """Upload a 4×4 matrix (glm.mat4, or numpy array shape=(4,4) indexed [row, column])."""
+        # GL wants column-major data; np.asarray(glm.mat4) is [row, column] like numpy input
+        data = np.ascontiguousarray(np.asarray(mat, dtype=np.float32).T)
+        self._set(name, data.tobytes(), lambda loc: glUniformMatrix4fv(loc, 1, GL_FALSE, data))
 
     def set_vec3(self, name: str, vec):
         """Upload a vec3 (sequence or numpy array of length 3)."""
-        loc = self.u(name)
-        if loc == -1:
-            print(f"Warning: uniform '{name}' not found")
-        glUniform3f(loc, vec[0], vec[1], vec[2])
+        value = (float(vec[0]), float(vec[1]), float(vec[2]))
+        self._set(name, value, lambda loc: glUniform3f(loc, *value))
+
+    def set_vec2_array(self, name: str, values):
+        """Upload a vec2[] uniform from an (N, 2) array."""
+        data = np.ascontiguousarray(values, dtype=np.float32)
+        self._set(name, data.tobytes(), lambda loc: glUniform2fv(loc, len(data), data))
 
     def delete(self):
         # Delete shaders
@@ -1,9 +1,19 @@
 #version 330
 layout(location = 0) in vec4 aPos;
+layout(location = 3) in mat4 model;  // per instance
 
-uniform mat4 model;
-uniform mat4 lightSpaceMatrix;
+uniform int cascade;
+
+layout(std140) uniform FrameData {
+    mat4 view;
+    mat4 projection;
+    mat4 lightSpaceMatrices[4];
+    vec4 cascadeSplits;  // view-space depth where each cascade ends
+    vec3 lightPos;
+    vec3 viewPos;
+    int cascadeCount;
+};
 
 void main() {
-    gl_Position = lightSpaceMatrix * model * aPos;
+    gl_Position = lightSpaceMatrices[cascade] * model * aPos;
 }
\ No newline at end of file
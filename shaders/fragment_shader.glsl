@@ -1,33 +1,54 @@
 #version 330 core
 
-in vec4 posLightSpace;
 in vec3 normal;
 in vec2 texCoords;
 in vec3 fragPos;
+in float viewDepth;
 
 out vec4 FragColor;
 
 uniform sampler2D textureMap0;
-uniform sampler2DShadow shadowMap;
-
-uniform vec3 lightPos;
-uniform vec3 viewPos;
+uniform sampler2DArrayShadow shadowMap;  // one layer per cascade
+
+layout(std140) uniform FrameData {
+    mat4 view;
+    mat4 projection;
+    mat4 lightSpaceMatrices[4];
+    vec4 cascadeSplits;  // view-space depth where each cascade ends
+    vec3 lightPos;
+    vec3 viewPos;
+    int cascadeCount;
+};
+
+// Quality tier, injected by ShaderProgram(defines=...): 0 hard, 1 PCF 3x3, 2 PCSS
+#ifndef SHADOW_MODE
+#define SHADOW_MODE 2
+#endif
+#ifndef BLOCKER_SAMPLES
+#define BLOCKER_SAMPLES 16
+#endif
+#ifndef PCF_SAMPLES
+#define PCF_SAMPLES 32
+#endif
+
+uniform sampler2DArray shadowDepth;  // same texture as shadowMap, raw depth for the blocker search
 uniform float lightRadius;
-uniform int blockerSamples;
-uniform int pcfSamples;
+uniform vec2 poissonDisk[32];        // unit disk, any prefix is well spread
 
 const float PI = 3.14159265358979323846;
+const float bias = 0.005;
 
-float ShadowCalculation(vec4 posLS) {
-    /*vec3 proj = posLS.xyz/posLS.w;  
+float ShadowHard(vec4 posLS, int layer) {
+    vec3 proj = posLS.xyz / posLS.w;
     proj = proj * 0.5 + 0.5;
     if(proj.z > 1.0) return 0.0;
     // hardware PCF compare: returns 1.0 if lit, 0.0 if in shadow
-    float visibility = texture(shadowMap, vec3(proj.xy, proj.z - 0.005));
+    float visibility = texture(shadowMap, vec4(proj.xy, float(layer), proj.z - bias));
     // now convert to a classic “shadow factor” (1.0=in shadow, 0.0=lit):
-    float shadow = 1.0 - visibility;
-    return shadow; */
+    return 1.0 - visibility;
+}
 
+float ShadowCalculation(vec4 posLS, int layer) {
     //przekształcenie do [0,1]
     vec3 proj = posLS.xyz / posLS.w;
     proj = proj * 0.5 + 0.5;
@@ -35,10 +56,8 @@ float ShadowCalculation(vec4 posLS) {
         return 0.0;
 
     //obliczamy wielkość jednego texela w mapie głębokości
-    vec2 texelSize = 1.0 / vec2(textureSize(shadowMap, 0));
+    vec2 texelSize = 1.0 / vec2(textureSize(shadowMap, 0).xy);
 
-    //parametry
-    float bias = 0.005;
     float sum = 0.0;
 
     //pętla PCF 3×3
@@ -46,7 +65,7 @@ float ShadowCalculation(vec4 posLS) {
         for(int y = -1; y <= 1; ++y) {
             vec2 offset = vec2(float(x), float(y)) * texelSize;
             // texture(sampler2DShadow, vec3(coord.xy, ref_depth)) → 1.0 = lit, 0.0 = in shadow
-            sum += texture(shadowMap, vec3(proj.xy + offset, proj.z - bias));
+            sum += texture(shadowMap, vec4(proj.xy + offset, float(layer), proj.z - bias));
         }
     }
     //uśredniamy widoczność i przeliczamy na klasyczny shadow factor
@@ -54,53 +73,68 @@ float ShadowCalculation(vec4 posLS) {
     return 1.0 - visibility;
 }
 
+// Rotates the Poisson disk per pixel (interleaved gradient noise): one sin/cos per fragment, not per tap
+mat2 DiskRotation() {
+    float angle = 2.0 * PI * fract(52.9829189 * fract(dot(gl_FragCoord.xy, vec2(0.06711056, 0.00583715))));
+    float c = cos(angle);
+    float s = sin(angle);
+    return mat2(c, s, -s, c);
+}
 
 // PCSS: Percentage-Closer Soft Shadows
-float ShadowPCSS(vec4 posLS) {
+float ShadowPCSS(vec4 posLS, int layer) {
     // przekształcenie do [0,1]
     vec3 proj = posLS.xyz / posLS.w;
     proj = proj * 0.5 + 0.5;
     if (proj.z > 1.0) return 0.0;
 
-    vec2 texelSize = 1.0 / vec2(textureSize(shadowMap, 0));
-    float bias = 0.005;
+    vec2 texelSize = 1.0 / vec2(textureSize(shadowMap, 0).xy);
+    mat2 rotation = DiskRotation();
 
     // Blocker Search
-    float searchRadius = lightRadius * (texelSize.x); 
+    float searchRadius = lightRadius * texelSize.x;
     float blockerSum = 0.0;
     int   blockerCount = 0;
-    for (int i = 0; i < blockerSamples; ++i) {
-        float angle = 2.0 * PI * float(i) / float(blockerSamples);
-        vec2  offset = vec2(cos(angle), sin(angle)) * searchRadius;
-        float sampleDepth = texture(shadowMap, vec3(proj.xy + offset, proj.z - bias));
-        // hardware PCF: 1.0 = lit, 0.0 = shadow → blokery to te, gdzie sampleDepth < 1.0
-        if (sampleDepth < 1.0) {
-            blockerSum += proj.z;
+    for (int i = 0; i < BLOCKER_SAMPLES; ++i) {
+        vec2  offset = rotation * poissonDisk[i] * searchRadius;
+        float sampleDepth = texture(shadowDepth, vec3(proj.xy + offset, float(layer))).r;
+        if (sampleDepth < proj.z - bias) {
+            blockerSum += sampleDepth;
             blockerCount++;
         }
     }
-    // brak blokera → pełne oświetlenie
+    // brak blokera → pełne oświetlenie; same blokery → pełny cień (bez pętli PCF)
     if (blockerCount == 0) {
         return 0.0;
     }
+    if (blockerCount == BLOCKER_SAMPLES) {
+        return 1.0;
+    }
     float avgBlockerDepth = blockerSum / float(blockerCount);
 
     // Obliczenie rozmiaru penumbry (w texelach)
     float zDiff = proj.z - avgBlockerDepth;
     float penumbra = (zDiff / avgBlockerDepth) * lightRadius;
-    float filterRadius = penumbra * texelSize.x;
+    float filterRadius = clamp(penumbra * texelSize.x, texelSize.x, searchRadius);
 
     // PCF z dynamicznym promieniem
     float sum = 0.0;
-    for (int i = 0; i < pcfSamples; ++i) {
-        float angle = 2.0 * PI * float(i) / float(pcfSamples);
-        vec2  offset = vec2(cos(angle), sin(angle)) * filterRadius;
-        sum += texture(shadowMap, vec3(proj.xy + offset, proj.z - bias));
+    for (int i = 0; i < PCF_SAMPLES; ++i) {
+        vec2  offset = rotation * poissonDisk[i] * filterRadius;
+        sum += texture(shadowMap, vec4(proj.xy + offset, float(layer), proj.z - bias));
     }
-    float visibility = sum / float(pcfSamples);
+    float visibility = sum / float(PCF_SAMPLES);
     return 1.0 - visibility;
 }
 
+int SelectCascade() {
+    for (int i = 0; i < cascadeCount - 1; ++i) {
+        if (viewDepth < cascadeSplits[i])
+            return i;
+    }
+    return cascadeCount - 1;
+}
+
 void main() {
     vec3 color = texture(textureMap0, texCoords).rgb;
     vec3 n = normalize(normal);
@@ -108,8 +142,15 @@ void main() {
     vec3 l = normalize(lightPos - fragPos);
     float diff = max(dot(n, l), 0.0);
 
-    //float shadow = ShadowCalculation(posLightSpace);
-    float shadow = ShadowPCSS(posLightSpace);
+    int cascade = SelectCascade();
+    vec4 posLightSpace = lightSpaceMatrices[cascade] * vec4(fragPos, 1.0);
+#if SHADOW_MODE == 0
+    float shadow = ShadowHard(posLightSpace, cascade);
+#elif SHADOW_MODE == 1
+    float shadow = ShadowCalculation(posLightSpace, cascade);
+#else
+    float shadow = ShadowPCSS(posLightSpace, cascade);
+#endif
 
     vec3 ambient   = 0.15 * color;
 
@@ -2,21 +2,30 @@
 layout(location = 0) in vec4 aPos;
 layout(location = 1) in vec4 aNormal;
 layout(location = 2) in vec2 aTexCoords;
+// per instance: model matrix and its inverse transpose, computed on the CPU
+layout(location = 3) in mat4 model;
+layout(location = 7) in mat3 normalMatrix;
 
-out vec4 posLightSpace;
 out vec3 normal;
 out vec2 texCoords;
 out vec3 fragPos;
+out float viewDepth;
 
-uniform mat4 model;
-uniform mat4 view;
-uniform mat4 projection;
-uniform mat4 lightSpaceMatrix;
+layout(std140) uniform FrameData {
+    mat4 view;
+    mat4 projection;
+    mat4 lightSpaceMatrices[4];
+    vec4 cascadeSplits;  // view-space depth where each cascade ends
+    vec3 lightPos;
+    vec3 viewPos;
+    int cascadeCount;
+};
 
 void main() {
     fragPos = vec3(model * aPos);
-    normal = mat3(transpose(inverse(model))) * aNormal.xyz;
+    normal = normalMatrix * aNormal.xyz;
     texCoords = aTexCoords;
-    posLightSpace = lightSpaceMatrix * model * aPos;
-    gl_Position = projection * view * model * aPos;
+    vec4 eyePos = view * model * aPos;
+    viewDepth = -eyePos.z;
+    gl_Position = projection * eyePos;
 }
\ No newline at end of file
@@ -1,54 +1,146 @@
+from dataclasses import dataclass
 from OpenGL.GL import *
+import numpy as np
 from shaderProgram import ShaderProgram
-from model import Model
+from model import Model, draw_counter
+from renderQueue import PASS_SHADOW
+
+
+@dataclass
+class ShadowTier:
+    name: str
+    defines: dict  # fragment_shader.glsl variant
+
+
+SHADOW_TIERS = [
+    ShadowTier("hard", {"SHADOW_MODE": 0}),
+    ShadowTier("pcf3x3", {"SHADOW_MODE": 1}),
+    ShadowTier("pcss-low", {"SHADOW_MODE": 2, "BLOCKER_SAMPLES": 8, "PCF_SAMPLES": 16}),
+    ShadowTier("pcss-high", {"SHADOW_MODE": 2, "BLOCKER_SAMPLES": 16, "PCF_SAMPLES": 32}),
+]
+
+
+def poisson_disk(count=32, candidates=64, seed=7):
+    """Points in the unit disk by best-candidate sampling, so every prefix is also well spread."""
+    rng = np.random.default_rng(seed)
+
+    def random_points(n):
+        r = np.sqrt(rng.random(n))
+        a = rng.random(n) * 2.0 * np.pi
+        return np.stack((r * np.cos(a), r * np.sin(a)), axis=1)
+
+    points = random_points(1)
+    while len(points) < count:
+        cand = random_points(candidates)
+        dist = np.linalg.norm(cand[:, None, :] - points[None, :, :], axis=2).min(axis=1)
+        points = np.vstack((points, cand[np.argmax(dist)]))
+    return points.astype(np.float32)
+
+
+POISSON_DISK = poisson_disk()
 
 class ShadowMap:
-    def __init__(self, size=2048):
+    """Depth texture array with one layer per shadow cascade."""
+
+    def __init__(self, size=2048, cascades=1):
         self.size = size
+        self.cascades = cascades
         self.depthFBO = glGenFramebuffers(1)
         self.depthTex = glGenTextures(1)
+        # reads the same texture without depth compare (PCSS blocker search)
+        self.depthSampler = glGenSamplers(1)
+        self.key = None
+        self.rendered = 0
+        self.reused = 0
         self._init_buffers()
 
     def _init_buffers(self):
-        glBindTexture(GL_TEXTURE_2D, self.depthTex)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT,
-                     self.size, self.size, 0,
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.depthTex)
+        glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, GL_DEPTH_COMPONENT,
+                     self.size, self.size, self.cascades, 0,
                      GL_DEPTH_COMPONENT, GL_FLOAT, None)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
         borderColor = (1.0, 1.0, 1.0, 1.0)
-        glTexParameterfv(GL_TEXTURE_2D, GL_TEXTURE_BORDER_COLOR, borderColor)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_COMPARE_MODE, GL_COMPARE_REF_TO_TEXTURE)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_COMPARE_FUNC, GL_LEQUAL)
+        glTexParameterfv(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_BORDER_COLOR, borderColor)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_COMPARE_MODE, GL_COMPARE_REF_TO_TEXTURE)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_COMPARE_FUNC, GL_LEQUAL)
+        glSamplerParameteri(self.depthSampler, GL_TEXTURE_COMPARE_MODE, GL_NONE)
+        glSamplerParameteri(self.depthSampler, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glSamplerParameteri(self.depthSampler, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glSamplerParameteri(self.depthSampler, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
+        glSamplerParameteri(self.depthSampler, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
+        glSamplerParameterfv(self.depthSampler, GL_TEXTURE_BORDER_COLOR, borderColor)
         glBindFramebuffer(GL_FRAMEBUFFER, self.depthFBO)
-        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT,
-                               GL_TEXTURE_2D, self.depthTex, 0)
+        glFramebufferTextureLayer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.depthTex, 0, 0)
         glDrawBuffer(GL_NONE)
         glReadBuffer(GL_NONE)
         assert glCheckFramebufferStatus(GL_FRAMEBUFFER) == GL_FRAMEBUFFER_COMPLETE
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
-    def render(self, model: Model, depth_shader: ShaderProgram, shader: ShaderProgram,
-               light_space_matrix, model_matrix):
-        glViewport(0, 0, self.size, self.size)
-        glBindFramebuffer(GL_FRAMEBUFFER, self.depthFBO)
+    @staticmethod
+    def dirty_key(light_key, casters):
+        return light_key, tuple((id(model), model.geometry_version, model.lod,
+                                 np.asarray(matrix, dtype=np.float32).tobytes())
+                                for model, matrix, *_ in casters)
+
+    def submit(self, queue, casters, depth_shader: ShaderProgram, light_key, light_space_matrices=None, counter=None):
+        """Queue every (model, transforms) caster into each cascade, one pass per layer of the depth
+        texture array; nothing is queued while the dirty key is unchanged.
+
+        `transforms` is one model matrix or an (N, 4, 4) array drawn instanced; a third element,
+        their normal matrices, is passed on to the instance buffer.
+
+        The depth shader reads the cascade matrices from the per-frame uniform buffer; the same
+        matrices passed here cull each caster's meshes per cascade.
+        """
+        key = self.dirty_key(light_key, casters)
+        if key == self.key:
+            self.reused += 1
+            return False
+        for layer in range(self.cascades):
+            queue.begin_pass(PASS_SHADOW + layer, lambda layer=layer: self.begin_layer(depth_shader, layer),
+                             depth_shader, "shadow pass")
+            clip = None if light_space_matrices is None else light_space_matrices[layer]
+            for model, transforms, *normals in casters:
+                model.submit(queue, PASS_SHADOW + layer, depth_shader, transforms, clip, counter,
+                             normals=normals[0] if normals else None, depth_only=True)
+        self.key = key
+        self.rendered += 1
+        return True
+
+    def begin_layer(self, depth_shader, layer):
+        """Pass setup: render into one cascade layer (the scene pass binds its own framebuffer after)."""
+        if layer == 0:
+            glViewport(0, 0, self.size, self.size)
+            glBindFramebuffer(GL_FRAMEBUFFER, self.depthFBO)
+            draw_counter.bind()
+        glFramebufferTextureLayer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.depthTex, 0, layer)
         glClear(GL_DEPTH_BUFFER_BIT)
+        depth_shader.set_int("cascade", layer)
+        draw_counter.bind()
 
-        depth_shader.use()
-        depth_shader.set_mat4("lightSpaceMatrix", light_space_matrix)
-        depth_shader.set_mat4("model", model_matrix)
-        for mesh in model.meshes:
-            glBindVertexArray(mesh.VAO)
-            glDrawElements(GL_TRIANGLES, mesh.index_count, GL_UNSIGNED_INT, None)
-        glBindVertexArray(0)
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    def invalidate(self):
+        self.key = None
+
+    def report(self):
+        return f"shadow passes {self.rendered} rendered / {self.reused} reused"
 
-    def bind_depth_texture(self, unit=1):
+    def bind_depth_texture(self, unit=1, raw_unit=2):
         glActiveTexture(GL_TEXTURE0 + unit)
-        glBindTexture(GL_TEXTURE_2D, self.depthTex)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.depthTex)
+        glActiveTexture(GL_TEXTURE0 + raw_unit)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.depthTex)
+        glBindSampler(raw_unit, self.depthSampler)
+        glActiveTexture(GL_TEXTURE0)
+        draw_counter.bind(3)
 
     def set_up_in_scene(self, shader):
         shader.set_int("shadowMap", 1)
-        self.bind_depth_texture(1)
\ No newline at end of file
+        # only the PCSS variants sample the raw depth and the disk
+        if shader.has_uniform("shadowDepth"):
+            shader.set_int("shadowDepth", 2)
+            shader.set_vec2_array("poissonDisk", POISSON_DISK)
+        self.bind_depth_texture(1, 2)
\ No newline at end of file
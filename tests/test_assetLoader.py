@@ -0,0 +1,172 @@
+import contextlib
+import io
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import instancing
+import model as model_module
+from assetLoader import AssetLoader
+from model import Model
+
+
+class FakeTextures:
+    """Stands in for TextureManager: hands out ids, fails on request."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+        self.refs = {}
+        self.ids = {}
+        self.acquired = []
+
+    def contains(self, path):
+        return path in self.ids
+
+    def acquire(self, path, image=None):
+        self.acquired.append((path, image is not None))
+        if path in self.fail:
+            raise RuntimeError(f"upload failed: {path}")
+        with self.lock:
+            texture = self.ids.setdefault(path, len(self.ids) + 1)
+            self.refs[texture] = self.refs.get(texture, 0) + 1
+        return texture
+
+    def retain(self, texture):
+        with self.lock:
+            self.refs[texture] += 1
+        return texture
+
+    def release(self, texture):
+        self.refs[texture] -= 1
+
+
+class FakeModel:
+    def __init__(self, texture_paths):
+        self.texture_paths = texture_paths
+        self.uploaded = None
+        self.preloaded = None
+
+    def prepare(self, path):
+        return SimpleNamespace(path=path, texture_paths=self.texture_paths)
+
+    def upload(self, payload, preloaded=None):
+        self.uploaded = payload
+        self.preloaded = preloaded
+
+
+def make_loader(textures, decoded=None):
+    def decoder(path):
+        if decoded is not None:
+            decoded.append(path)
+        return f"pixels of {path}"
+    return AssetLoader(max_workers=4, on_progress=None, textures=textures, decoder=decoder)
+
+
+def test_model_uploaded_after_its_textures():
+    textures = FakeTextures()
+    decoded = []
+    loader = make_loader(textures, decoded)
+    model = FakeModel(['a.png', 'b.png', 'a.png', None])
+    loaded = []
+    loader.load_model(model, 'scene.obj', on_loaded=loaded.append)
+    try:
+        assert loader.wait(timeout=5.0)
+    finally:
+        loader.shutdown()
+    assert sorted(decoded) == ['a.png', 'b.png']
+    assert model.uploaded.path == 'scene.obj'
+    assert loaded == [model]
+    assert loader.errors == []
+    assert loader.done == loader.total == 4  # prepare, two textures, upload
+    # the pipeline's own references are dropped after the model upload
+    assert set(textures.refs.values()) == {0}
+
+
+def test_failed_texture_upload_still_uploads_model():
+    textures = FakeTextures(fail={'broken.png'})
+    loader = make_loader(textures)
+    model = FakeModel(['broken.png', 'ok.png'])
+    loader.load_model(model, 'scene.obj')
+    try:
+        assert loader.wait(timeout=5.0)
+    finally:
+        loader.shutdown()
+    assert model.uploaded is not None
+    assert model.preloaded == {'broken.png': 0, 'ok.png': textures.ids['ok.png']}
+    assert len(loader.errors) == 1 and loader.errors[0].startswith('broken.png:')
+
+
+def test_failed_decode_still_uploads_model():
+    textures = FakeTextures()
+    loader = AssetLoader(max_workers=2, on_progress=None, textures=textures,
+                         decoder=lambda path: 1 / 0)
+    model = FakeModel(['x.png'])
+    loader.load_model(model, 'scene.obj')
+    try:
+        assert loader.wait(timeout=5.0)
+    finally:
+        loader.shutdown()
+    assert model.uploaded is not None
+    assert len(loader.errors) == 1 and loader.errors[0].startswith('x.png:')
+
+
+@pytest.fixture
+def fake_gl(monkeypatch):
+    """Every GL call of the model and its instance buffer is a no-op; names are handed out in order."""
+    names = iter(range(1, 1000))
+    for module in (model_module, instancing):
+        for name in dir(module):
+            if name.startswith('gl') and callable(getattr(module, name)):
+                monkeypatch.setattr(module, name, lambda *args: None)
+        monkeypatch.setattr(module, 'glGenBuffers', lambda n: next(names))
+    monkeypatch.setattr(model_module, 'glGenVertexArrays', lambda n: next(names))
+
+
+def textured_obj(tmp_path):
+    """Three meshes: two on ok.png, one on broken.png."""
+    (tmp_path / "scene.mtl").write_text("newmtl ok\nmap_Kd ok.png\nnewmtl broken\nmap_Kd broken.png\n")
+    lines = ["mtllib scene.mtl", "v 0 0 0", "v 1 0 0", "v 0 1 0", "vt 0 0", "vn 0 0 1"]
+    for name, material in (('a', 'ok'), ('b', 'broken'), ('c', 'ok')):
+        lines += [f"o {name}", f"usemtl {material}", "f 1/1/1 2/1/1 3/1/1"]
+    path = tmp_path / "scene.obj"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def load_real_model(tmp_path, textures):
+    model = Model(use_cache=False, verbose=False, textures=textures)
+    loader = AssetLoader(max_workers=2, on_progress=None, textures=textures,
+                         decoder=lambda path: f"pixels of {path}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.load_model(model, textured_obj(tmp_path))
+        try:
+            assert loader.wait(timeout=5.0)
+        finally:
+            loader.shutdown()
+    return model, loader
+
+
+def test_real_model_uses_the_pipeline_textures(tmp_path, fake_gl):
+    textures = FakeTextures(fail={'broken.png'})
+    model, loader = load_real_model(tmp_path, textures)
+    ok = textures.ids['ok.png']
+    assert [mesh.texture_id for mesh in model.meshes] == [ok, 0, ok]
+    # each texture went through the pipeline once; the failed one is not decoded again by the upload
+    assert sorted(textures.acquired) == [('broken.png', True), ('ok.png', True)]
+    # the meshes hold their references, the pipeline dropped its own
+    assert textures.refs == {ok: 2}
+    assert len(loader.errors) == 1 and loader.errors[0].startswith('broken.png:')
+    model.release_textures()
+    assert textures.refs == {ok: 0}
+
+
+def test_failed_model_upload_releases_the_pipeline_references(tmp_path, fake_gl, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("out of memory")
+    monkeypatch.setattr(model_module, 'glBufferData', fail)
+    textures = FakeTextures()
+    model, loader = load_real_model(tmp_path, textures)
+    assert len(loader.errors) == 1 and 'out of memory' in loader.errors[0]
+    assert set(textures.refs.values()) == {0}
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from bvh import BVH, closest_points_on_triangles
+
+
+def wavy_grid(side):
+    """Triangle corners (T, 3, 3) of a height field 20 units across."""
+    u, v = np.meshgrid(np.linspace(-10.0, 10.0, side), np.linspace(-10.0, 10.0, side))
+    points = np.stack((u.ravel(), np.sin(u.ravel()) * np.cos(v.ravel()), v.ravel()), axis=1)
+    quad = np.arange(side * side).reshape(side, side)[:-1, :-1].ravel()
+    tris = np.concatenate((np.stack((quad, quad + 1, quad + side + 1), axis=1),
+                           np.stack((quad, quad + side + 1, quad + side), axis=1)))
+    return points[tris].astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def grid():
+    triangles = wavy_grid(101)
+    return triangles, BVH.build(triangles)
+
+
+def queries(count, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack((rng.uniform(-10, 10, count), rng.uniform(-1.5, 1.5, count),
+                               rng.uniform(-10, 10, count)))
+    return centers, rng.uniform(0.05, 0.5, count), rng.normal(0.0, 0.5, (count, 3))
+
+
+def brute_force_contacts(triangles, center, radius):
+    t = triangles.astype(np.float64)
+    q = closest_points_on_triangles(center, t[:, 0], t[:, 1], t[:, 2])
+    return set(np.flatnonzero(np.linalg.norm(q - center, axis=1) <= radius))
+
+
+def test_closest_points_against_sampling():
+    rng = np.random.default_rng(3)
+    tris = rng.normal(size=(50, 3, 3))
+    tris[0, 2] = tris[0, 0] * 0.25 + tris[0, 1] * 0.75  # degenerate: collinear corners
+    tris[1, 1] = tris[1, 0]
+    uv = rng.uniform(size=(20000, 2))
+    uv = np.where(uv.sum(axis=1, keepdims=True) > 1, 1 - uv, uv)
+    for p in rng.normal(size=(10, 3)) * 2:
+        q = closest_points_on_triangles(p, tris[:, 0], tris[:, 1], tris[:, 2])
+        for t, point in zip(tris, q):
+            samples = t[0] + uv[:, :1] * (t[1] - t[0]) + uv[:, 1:] * (t[2] - t[0])
+            sampled = np.linalg.norm(samples - p, axis=1).min()
+            assert np.linalg.norm(point - p) <= sampled + 1e-9
+            assert np.linalg.norm(point - p) >= sampled - 0.05
+
+
+def test_leaves_partition_triangles(grid):
+    triangles, bvh = grid
+    assert sorted(bvh.order) == list(range(len(triangles)))
+    np.testing.assert_array_equal(bvh.triangles, triangles[bvh.order])
+    leaves = bvh.node_child < 0
+    assert bvh.node_count[leaves].sum() == len(triangles)
+
+
+def test_sphere_contacts_match_brute_force(grid):
+    triangles, bvh = grid
+    centers, radii, _ = queries(50)
+    hits = 0
+    for c, r in zip(centers, radii):
+        found = set(bvh.order[bvh.sphere_contacts(c, r)[0]])
+        assert found == brute_force_contacts(triangles, c, r)
+        hits += bool(found)
+    assert hits  # the queries do reach the surface
+
+
+def test_raycast_matches_brute_force(grid):
+    triangles, bvh = grid
+    centers, _, _ = queries(50, seed=1)
+    rng = np.random.default_rng(2)
+    t = triangles.astype(np.float64)
+    for origin, direction in zip(centers + [0.0, 3.0, 0.0], rng.normal(size=(50, 3))):
+        hit = bvh.raycast(origin, direction)
+        d = direction / np.linalg.norm(direction)
+        e1, e2 = t[:, 1] - t[:, 0], t[:, 2] - t[:, 0]
+        p = np.cross(d, e2)
+        det = (e1 * p).sum(axis=1)
+        s = origin - t[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u, v = (s * p).sum(axis=1) / det, (d * np.cross(s, e1)).sum(axis=1) / det
+            dist = (e2 * np.cross(s, e1)).sum(axis=1) / det
+        ok = (np.abs(det) > 1e-12) & (u >= 0) & (v >= 0) & (u + v <= 1) & (dist >= 0)
+        if not ok.any():
+            assert hit is None
+        else:
+            assert hit.distance == pytest.approx(dist[ok].min(), abs=1e-6)
+
+
+def reference_sweep(bvh, center, radius, displacement, iterations=4):
+    """sweep_sphere without the swept-box cull: a full tree query for every contact test."""
+    steps = max(1, int(np.ceil(np.linalg.norm(displacement) / (0.5 * radius))))
+    for _ in range(steps):
+        moved = bvh._depenetrate(center + displacement / steps, radius, None, iterations,
+                                 lambda c: bvh.sphere_contacts(c, radius))
+        if moved is None:
+            break
+        center = moved
+    return center
+
+
+def test_sweep_matches_reference(grid):
+    _, bvh = grid
+    centers, radii, moves = queries(100, seed=4)
+    for c, r, m in zip(centers, radii, moves):
+        end = bvh.sweep_sphere(c, r, m)
+        np.testing.assert_allclose(end, reference_sweep(bvh, c, r, m), atol=1e-9)
+        if not bvh.sphere_overlaps(c, r):
+            assert not bvh.sphere_overlaps(end, r)
+
+
+def test_sweep_through_free_space(grid):
+    _, bvh = grid
+    start, move = np.array([0.0, 5.0, 0.0]), np.array([3.0, 0.5, -2.0])
+    np.testing.assert_array_equal(bvh.sweep_sphere(start, 0.3, move), start + move)
+
+
+def test_sweep_slides_along_floor():
+    floor = np.array([[[-10, 0, -10], [10, 0, 10], [10, 0, -10]],
+                      [[-10, 0, -10], [-10, 0, 10], [10, 0, 10]]], dtype=np.float32)
+    bvh = BVH.build(floor)
+    end = bvh.sweep_sphere([0.0, 0.5, 0.0], 0.5, [2.0, -1.0, 1.0])
+    assert end[1] == pytest.approx(0.5, abs=1e-3)
+    np.testing.assert_allclose(end[[0, 2]], [2.0, 1.0], atol=1e-6)
+    # confined to the horizontal plane, a wall ahead blocks instead of lifting the sphere
+    wall = np.concatenate((floor, [[[1, -1, -10], [1, 5, -10], [1, 5, 10]],
+                                   [[1, -1, -10], [1, 5, 10], [1, -1, 10]]]))
+    end = BVH.build(wall).sweep_sphere([0.0, 0.6, 0.0], 0.5, [2.0, 0.0, 0.0], plane_normal=[0, 1, 0])
+    assert end[0] <= 0.5 + 1e-3
+    assert end[1] == pytest.approx(0.6)
+
+
+def test_empty_bvh():
+    bvh = BVH.build(np.zeros((0, 3, 3)))
+    assert len(bvh.sphere_contacts([0, 0, 0], 1.0)[0]) == 0
+    assert bvh.raycast([0, 0, 0], [0, 1, 0]) is None
+    np.testing.assert_array_equal(bvh.sweep_sphere([0, 0, 0], 0.5, [1, 2, 3]), [1, 2, 3])
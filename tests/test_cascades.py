@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from cascades import cascade_matrices, fit_cascade, light_view, look_at, practical_splits, slice_corners
+
+FOV = np.radians(45.0)
+ASPECT = 16.0 / 9.0
+LIGHT_DIR = (-0.4, -1.0, -0.3)
+RESOLUTION = 2048
+
+
+def camera_view(eye, target=(0.0, 0.0, -50.0)):
+    return look_at(eye, target, (0.0, 1.0, 0.0))
+
+
+def to_ndc(matrix, points):
+    clip = np.c_[points, np.ones(len(points))] @ matrix.T
+    return clip[:, :3] / clip[:, 3:]
+
+
+@pytest.mark.parametrize('blend', [0.0, 0.25, 0.75, 1.0])
+def test_splits_monotonic_with_fixed_endpoints(blend):
+    splits = practical_splits(0.1, 500.0, 4, blend)
+    assert len(splits) == 5
+    assert np.all(np.diff(splits) > 0)
+    assert splits[0] == pytest.approx(0.1)
+    assert splits[-1] == pytest.approx(500.0)
+
+
+def test_split_schemes():
+    np.testing.assert_allclose(practical_splits(1.0, 1000.0, 3, 0.0), [1.0, 334.0, 667.0, 1000.0])
+    np.testing.assert_allclose(practical_splits(1.0, 1000.0, 3, 1.0), [1.0, 10.0, 100.0, 1000.0])
+
+
+def test_slice_corners_at_split_depths():
+    view = camera_view((3.0, 2.0, 10.0))
+    corners = slice_corners(np.linalg.inv(view), FOV, ASPECT, 2.0, 30.0)
+    depth = -(np.c_[corners, np.ones(8)] @ view.T)[:, 2]
+    np.testing.assert_allclose(depth, [2.0] * 4 + [30.0] * 4)
+
+
+@pytest.mark.parametrize('eye', [(0.0, 0.0, 0.0), (37.2, 5.5, -12.9), (-250.0, 40.0, 300.0)])
+def test_frustum_slices_inside_their_cascades(eye):
+    view = camera_view(eye)
+    matrices, far_splits = cascade_matrices(view, FOV, ASPECT, 0.1, 200.0, LIGHT_DIR, 4, RESOLUTION)
+    assert matrices.shape == (4, 4, 4)
+    splits = np.r_[0.1, far_splits]
+    for i, matrix in enumerate(matrices):
+        corners = slice_corners(np.linalg.inv(view), FOV, ASPECT, splits[i], splits[i + 1])
+        assert np.all(np.abs(to_ndc(matrix, corners)) <= 1.0 + 1e-9)
+
+
+def test_origin_snapped_to_texels():
+    lv = light_view(LIGHT_DIR)
+    for eye in np.random.default_rng(0).uniform(-300.0, 300.0, (20, 3)):
+        corners = slice_corners(np.linalg.inv(camera_view(eye)), FOV, ASPECT, 0.1, 25.0)
+        ndc = to_ndc(fit_cascade(corners, lv, RESOLUTION, 50.0), np.zeros((1, 3)))[0]
+        texels = ndc[:2] * RESOLUTION / 2.0
+        np.testing.assert_allclose(texels, np.round(texels), atol=1e-6)
+
+
+def test_stable_under_sub_texel_translation():
+    lv = light_view(LIGHT_DIR)
+    view = camera_view((10.0, 3.0, 5.0))
+    base = fit_cascade(slice_corners(np.linalg.inv(view), FOV, ASPECT, 0.1, 25.0), lv, RESOLUTION, 50.0)
+    texel_ndc = 2.0 / RESOLUTION
+    moves = 0
+    for step in np.linspace(0.0, 0.01, 11):  # well under one texel of the cascade
+        moved = view.copy()
+        moved[:3, 3] -= moved[:3, :3] @ np.array([step, 0.0, 0.0])
+        matrix = fit_cascade(slice_corners(np.linalg.inv(moved), FOV, ASPECT, 0.1, 25.0), lv, RESOLUTION, 50.0)
+        # same box size; the xy offset only ever moves by whole texels
+        np.testing.assert_array_equal(matrix[:3, :3], base[:3, :3])
+        shift = (matrix[:2, 3] - base[:2, 3]) / texel_ndc
+        np.testing.assert_allclose(shift, np.round(shift), atol=1e-6)
+        assert np.abs(shift).max() <= 1.0 + 1e-6
+        moves += bool(np.abs(shift).max() > 0.5)
+    assert moves <= 1
@@ -0,0 +1,236 @@
+import contextlib
+import io
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from chunkStreaming import ChunkSource, ChunkStreamer, ResidencyPolicy
+
+
+def row_policy(count=10, budget=None, load_radius=5.0, evict_radius=15.0, look_ahead=1.0, nbytes=100):
+    """Chunks of 10 units in a row along +x (chunk i covers x in [10 i, 10 i + 10])."""
+    box_min = np.array([[10.0 * i, 0.0, 0.0] for i in range(count)])
+    box_max = box_min + [10.0, 1.0, 10.0]
+    return ResidencyPolicy(box_min, box_max, np.full(count, nbytes), budget or count * nbytes,
+                           load_radius, evict_radius, look_ahead)
+
+
+def run_policy(policy, positions, velocity=(0.0, 0.0, 0.0)):
+    """Apply each plan immediately; (resident mask, loads and evictions per frame)."""
+    resident = np.zeros(len(policy.nbytes), dtype=bool)
+    history = []
+    for position in positions:
+        loads, evict = policy.plan(position, velocity, resident, np.zeros_like(resident))
+        resident[evict] = False
+        resident[loads] = True
+        history.append((loads, evict))
+    return resident, history
+
+
+def test_evict_radius_not_below_load_radius():
+    with pytest.raises(ValueError):
+        row_policy(load_radius=10.0, evict_radius=5.0)
+
+
+def test_no_flapping_at_a_cell_border():
+    policy = row_policy()
+    # back and forth across the load radius of chunk 3 (x = 25) and the border of chunks 2/3 (x = 30)
+    positions = [(x, 0.0, 5.0) for x in [24.0, 26.0] * 20 + [29.0, 31.0] * 20]
+    resident, history = run_policy(policy, positions)
+    assert history[0] == ([2, 1], [])
+    assert history[1] == ([3], [])
+    assert all(loads == [] and evict == [] for loads, evict in history[2:40])
+    # nothing new within load_radius across the 2/3 border, and nothing is ever evicted
+    assert sum(len(loads) for loads, _ in history[40:]) == 0
+    assert sum(len(evict) for _, evict in history) == 0
+    assert np.flatnonzero(resident).tolist() == [1, 2, 3]
+
+
+def test_evicted_only_beyond_evict_radius():
+    policy = row_policy()
+    resident, history = run_policy(policy, [(x, 0.0, 5.0) for x in np.arange(15.0, 60.0, 1.0)])
+    evicted_at = {i: 15.0 + frame for frame, (_, evict) in enumerate(history) for i in evict}
+    for index, x in evicted_at.items():
+        assert x - (10.0 * index + 10.0) > 15.0  # beyond evict_radius past the chunk's far side
+        assert x - (10.0 * index + 10.0) <= 16.0  # ... and not a frame later
+
+
+def test_budget_displaces_farther_chunks_only():
+    policy = row_policy(budget=300)
+    resident = np.zeros(10, dtype=bool)
+    resident[[0, 1, 2]] = True  # budget full, camera now next to chunk 4
+    loads, evict = policy.plan((41.0, 0.0, 5.0), (0.0, 0.0, 0.0), resident, np.zeros(10, dtype=bool))
+    # chunk 4 (inside) and 3 (1 unit off) displace 0 and 1, both beyond the evict radius
+    assert loads == [4, 3]
+    assert sorted(evict) == [0, 1]
+
+    # a far look-ahead chunk never displaces a resident chunk nearer than itself
+    policy = row_policy(budget=200, look_ahead=2.0)
+    resident = np.zeros(10, dtype=bool)
+    resident[[0, 1]] = True
+    loads, evict = policy.plan((5.0, 0.0, 5.0), (30.0, 0.0, 0.0), resident, np.zeros(10, dtype=bool))
+    assert loads == [] and evict == []
+    assert policy.budget_limited > 0
+
+
+def test_in_flight_chunks_count_against_the_budget():
+    policy = row_policy(budget=200)
+    loading = np.zeros(10, dtype=bool)
+    loading[[0, 1]] = True
+    loads, evict = policy.plan((15.0, 0.0, 5.0), (0.0, 0.0, 0.0), np.zeros(10, dtype=bool), loading)
+    assert loads == [] and evict == []
+
+
+def test_look_ahead_widens_but_loads_nearest_first():
+    policy = row_policy(look_ahead=1.0)
+    still = policy.plan((12.0, 0.0, 5.0), (0.0, 0.0, 0.0), np.zeros(10, bool), np.zeros(10, bool))[0]
+    moving = policy.plan((12.0, 0.0, 5.0), (40.0, 0.0, 0.0), np.zeros(10, bool), np.zeros(10, bool))[0]
+    assert still == [1, 0]
+    # the look-ahead point (x = 52) adds chunks 4 and 5, loaded after the ones around the camera
+    assert moving == [1, 0, 4, 5]
+    assert policy.plan((12.0, 0.0, 5.0), (40.0, 0.0, 0.0), np.zeros(10, bool), np.zeros(10, bool), 2)[0] == [1, 0]
+
+
+# --- streamer with stubs: no GL, no threads, a fake clock
+
+class FlatMesh:
+    """A 100 x 100 unit floor of 4 x 4 quads per 10-unit cell, like a loader mesh."""
+    materials = None
+
+    def __init__(self):
+        u, v = np.meshgrid(np.linspace(0.0, 100.0, 41), np.linspace(0.0, 100.0, 41))
+        self.positions = np.stack((u.ravel(), np.zeros(u.size), v.ravel()), axis=1).astype(np.float32)
+        quad = np.arange(41 * 41).reshape(41, 41)[:-1, :-1].ravel()
+        self.indices = np.concatenate((np.stack((quad, quad + 41, quad + 1), axis=1),
+                                       np.stack((quad + 1, quad + 41, quad + 42), axis=1))).astype(np.uint32).ravel()
+
+    def as_arrays(self):
+        normals = np.tile(np.float32([0.0, 1.0, 0.0]), (len(self.positions), 1))
+        return self.positions, normals, self.positions[:, [0, 2]] / 100.0, self.indices
+
+
+class ManualExecutor:
+    """Jobs run when the test says so: a payload can take as many frames as needed."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.jobs.append((future, fn, args))
+        return future
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for future, fn, args in jobs:
+            future.set_result(fn(*args))
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class StubUploader:
+    def __init__(self):
+        self.uploaded = []
+        self.deleted = []
+
+    def upload(self, chunk, payload):
+        self.uploaded.append(chunk.key)
+        return chunk.key
+
+    def delete(self, handle):
+        self.deleted.append(handle)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def source():
+    return ChunkSource([FlatMesh()], 10.0)
+
+
+def make_streamer(source, **kwargs):
+    executor, uploader, clock = ManualExecutor(), StubUploader(), FakeClock()
+    streamer = ChunkStreamer(kwargs.pop('budget', 1 << 30), kwargs.pop('load_radius', 5.0),
+                             kwargs.pop('evict_radius', 15.0), uploader=uploader, executor=executor,
+                             clock=clock, **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        streamer.open(source)
+    return streamer, executor, uploader, clock
+
+
+def test_source_partition(source):
+    assert len(source) == 100
+    assert source.chunks[0].key == (0, 0)
+    triangles = sum(len(ids) for chunk in source.chunks for _, ids in chunk.parts)
+    assert triangles == 2 * 40 * 40
+    payload = source.payload(0)
+    assert len(payload.index_arrays[0]) == 32 * 3
+    assert payload.texture_paths == [None]
+
+
+def test_stall_accounting(source):
+    streamer, executor, uploader, clock = make_streamer(source, load_radius=4.0, max_in_flight=16)
+    position = (55.0, 0.0, 55.0)  # 5 units from every border of chunk (5, 5): only it is needed
+    streamer.update(position)
+    assert streamer.stalled == 1 and streamer.stall_frames == 1
+    assert len(streamer.loading) == 1
+
+    for frame in range(3):  # payloads take three more frames
+        clock.now += 0.016
+        streamer.update(position)
+    assert streamer.stall_frames == 4
+
+    executor.run()
+    clock.now += 0.016
+    streamer.update(position)
+    assert uploader.uploaded == [(5, 5)]
+    assert streamer.stalled == 0 and streamer.stall_frames == 4
+    assert list(streamer.stall_ms) == pytest.approx([64.0])
+    stats = streamer.stats()
+    assert stats['stall_ms_p99'] == pytest.approx(64.0)
+    assert (stats['loads'], stats['evictions'], stats['dropped']) == (1, 0, 0)
+
+    clock.now += 0.016
+    streamer.update(position)
+    assert streamer.stall_frames == 4
+
+
+def test_payload_for_a_chunk_left_behind_is_dropped(source):
+    streamer, executor, uploader, clock = make_streamer(source, max_in_flight=16)
+    streamer.update((55.0, 0.0, 55.0))
+    in_flight = set(streamer.loading)
+    streamer.update((5.0, 0.0, 5.0))  # jump far away before anything is built
+    executor.run()
+    streamer.update((5.0, 0.0, 5.0))
+    # the uploader sees chunk keys, the streamer chunk indices
+    assert in_flight and not {source.chunks[i].key for i in in_flight} & set(uploader.uploaded)
+    assert streamer.dropped == len(in_flight)
+    assert not in_flight & set(streamer.resident)
+    assert streamer.resident_bytes == sum(int(source.nbytes[i]) for i in streamer.resident)
+
+    # back again: the dropped chunks load normally
+    streamer.update((55.0, 0.0, 55.0))
+    executor.run()
+    streamer.update((55.0, 0.0, 55.0))
+    assert (5, 5) in uploader.uploaded
+
+
+def test_budget_and_eviction_through_the_streamer(source):
+    per_chunk = int(source.nbytes.max())
+    streamer, executor, uploader, clock = make_streamer(source, budget=4 * per_chunk, max_in_flight=16)
+    for x in np.arange(5.0, 95.0, 2.0):
+        streamer.update((x, 0.0, 5.0), (60.0, 0.0, 0.0))
+        executor.run()
+        assert streamer.resident_bytes + sum(int(source.nbytes[i]) for i in streamer.loading) <= 4 * per_chunk
+    assert streamer.evictions > 0
+    assert len(uploader.deleted) == streamer.evictions
+    assert set(uploader.deleted) <= set(uploader.uploaded)
+    assert streamer.peak_resident_bytes <= 4 * per_chunk
@@ -0,0 +1,96 @@
+import itertools
+
+import glm
+import numpy as np
+import pytest
+
+from culling import MeshBounds, boxes_visible, extract_planes, spheres_visible
+
+SQRT_HALF = np.sqrt(0.5)
+
+
+def test_perspective_planes():
+    planes = extract_planes(np.asarray(glm.perspective(glm.radians(90.0), 1.0, 0.5, 100.0)))
+    np.testing.assert_allclose(np.linalg.norm(planes[:, :3], axis=1), 1.0)
+    np.testing.assert_allclose(planes, [
+        [SQRT_HALF, 0, -SQRT_HALF, 0],    # left
+        [-SQRT_HALF, 0, -SQRT_HALF, 0],   # right
+        [0, SQRT_HALF, -SQRT_HALF, 0],    # bottom
+        [0, -SQRT_HALF, -SQRT_HALF, 0],   # top
+        [0, 0, -1, -0.5],                 # near
+        [0, 0, 1, 100.0],                 # far
+    ], rtol=1e-5, atol=1e-6)  # glm matrices are float32
+
+
+def test_ortho_planes():
+    planes = extract_planes(np.asarray(glm.ortho(-2.0, 2.0, -1.0, 1.0, 0.5, 10.0)))
+    np.testing.assert_allclose(planes, [
+        [1, 0, 0, 2], [-1, 0, 0, 2],
+        [0, 1, 0, 1], [0, -1, 0, 1],
+        [0, 0, -1, -0.5], [0, 0, 1, 10],
+    ], atol=1e-6)
+
+
+def test_planes_follow_the_view():
+    view = glm.translate(glm.mat4(1.0), glm.vec3(0, 0, -10))  # camera at z = +10
+    planes = extract_planes(np.asarray(glm.ortho(-1.0, 1.0, -1.0, 1.0, 1.0, 5.0) * view))
+    np.testing.assert_allclose(planes[4], [0, 0, -1, 9], atol=1e-6)   # near plane at z = 9
+    np.testing.assert_allclose(planes[5], [0, 0, 1, -5], atol=1e-6)   # far plane at z = 5
+
+
+@pytest.mark.parametrize('box, expected', [
+    (((-1, -1, -20), (1, 1, -10)), True),      # inside
+    (((-1, -1, 5), (1, 1, 8)), False),         # behind the camera
+    (((50, -1, -20), (60, 1, -10)), False),    # off to the right
+    (((-1, -1, -200), (1, 1, -150)), False),   # past the far plane
+    (((-1, -1, -5), (1, 1, 5)), True),         # straddling the near plane
+    (((8, -1, -12), (30, 1, -10)), True),      # straddling the right plane
+])
+def test_boxes(box, expected):
+    planes = extract_planes(np.asarray(glm.perspective(glm.radians(90.0), 1.0, 0.5, 100.0)))
+    box_min, box_max = (np.array([v], dtype=np.float64) for v in box)
+    assert boxes_visible(planes, box_min, box_max)[0] == expected
+
+
+def reference_visible(planes, box_min, box_max, center, radius):
+    """One mesh at a time: hidden when its sphere, or all 8 box corners, lie outside one plane."""
+    corners = np.array(list(itertools.product(*zip(box_min, box_max))))
+    for plane in planes:
+        if center @ plane[:3] + plane[3] < -radius:
+            return False
+        if np.all(corners @ plane[:3] + plane[3] < 0):
+            return False
+    return True
+
+
+def random_bounds(count, seed=0):
+    rng = np.random.default_rng(seed)
+    meshes = [rng.normal(size=(rng.integers(1, 40), 3)) * rng.uniform(0.1, 8.0) + rng.uniform(-80, 80, 3)
+              for _ in range(count)]
+    return MeshBounds.from_positions(meshes)
+
+
+def test_vectorized_matches_reference():
+    bounds = random_bounds(2000)
+    view = glm.lookAt(glm.vec3(5, 3, 20), glm.vec3(0, 0, 0), glm.vec3(0, 1, 0))
+    planes = extract_planes(np.asarray(glm.perspective(glm.radians(60.0), 1.5, 0.1, 90.0) * view))
+    expected = np.array([reference_visible(planes, *(a[i] for a in
+                                                     (bounds.box_min, bounds.box_max, bounds.center, bounds.radius)))
+                         for i in range(len(bounds))])
+    assert 0 < expected.sum() < len(expected)
+    np.testing.assert_array_equal(bounds.visible(planes), expected)
+    boxes = boxes_visible(planes, bounds.box_min, bounds.box_max)
+    spheres = spheres_visible(planes, bounds.center, bounds.radius)
+    np.testing.assert_array_equal(boxes & spheres, expected)
+
+
+def test_bounds_enclose_positions():
+    rng = np.random.default_rng(1)
+    meshes = [rng.normal(size=(30, 3)) for _ in range(5)] + [np.zeros((0, 3))]
+    bounds = MeshBounds.from_positions(meshes)
+    assert len(bounds) == 6
+    for i, p in enumerate(meshes[:5]):
+        assert np.all(np.linalg.norm(p - bounds.center[i], axis=1) <= bounds.radius[i] + 1e-12)
+        np.testing.assert_array_equal(bounds.box_min[i], p.min(axis=0))
+    joined = bounds[:2].append(bounds[4:])
+    np.testing.assert_array_equal(joined.radius, bounds.radius[[0, 1, 4, 5]])
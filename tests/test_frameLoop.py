@@ -0,0 +1,125 @@
+import pytest
+
+from frameLoop import FixedTimestep, FramePacer, PacingStats
+
+
+class FakeClock:
+    """Time moves only when slept, plus `tick` per reading (a busy-wait makes progress)."""
+
+    def __init__(self, tick=0.0):
+        self.now = 100.0
+        self.tick = tick
+        self.reads = 0
+        self.sleeps = []
+
+    def __call__(self):
+        self.reads += 1
+        self.now += self.tick
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_steps_and_alpha():
+    sim = FixedTimestep(step=0.25, max_steps=8)
+    assert sim.advance(0.1) == 0 and sim.alpha == pytest.approx(0.4)
+    assert sim.advance(0.2) == 1 and sim.alpha == pytest.approx(0.2)
+    assert sim.advance(0.5) == 2 and sim.alpha == pytest.approx(0.2)
+    assert sim.advance(0.2) == 1 and sim.alpha == pytest.approx(0.0)
+    assert sim.steps == 4 and sim.dropped == 0.0
+    # no time lost or invented across many uneven frames
+    total = 1.0
+    for dt in (0.01, 0.37, 0.05, 0.9, 0.123):
+        sim.advance(dt)
+        total += dt
+    assert sim.steps * 0.25 + sim.accumulator == pytest.approx(total)
+
+
+def test_hitch_drops_the_backlog():
+    sim = FixedTimestep(step=0.25, max_steps=4)
+    assert sim.advance(0.1) == 0
+    assert sim.advance(2.0) == 4  # 8.4 steps due, capped at 4
+    assert sim.dropped == pytest.approx(4 * 0.25)
+    assert sim.accumulator == 0.0 and sim.alpha == 0.0
+    assert sim.advance(0.25) == 1 and sim.steps == 5
+    sim.advance(10.0)
+    assert sim.dropped == pytest.approx(1.0 + 36 * 0.25)
+
+
+def test_pacer_sleeps_then_spins_to_the_deadline():
+    clock = FakeClock(tick=0.0001)
+    pacer = FramePacer(target_ms=10.0, spin_ms=2.0, clock=clock, sleep=clock.sleep)
+    pacer.wait()  # the first frame starts the schedule
+    start = pacer.deadline
+    assert clock.sleeps == []
+
+    clock.now += 0.003  # a 3 ms frame
+    pacer.wait()
+    # the sleep stops the spin time short of the deadline, the spin covers the rest
+    assert clock.sleeps == [pytest.approx(0.010 - 0.003 - 0.0001 - 0.002)]
+    assert start + 0.010 <= clock.now < start + 0.010 + 0.0002
+    assert pacer.late == 0
+
+
+def test_short_waits_only_spin():
+    clock = FakeClock(tick=0.0001)
+    pacer = FramePacer(target_ms=10.0, spin_ms=2.0, clock=clock, sleep=clock.sleep)
+    pacer.wait()
+    clock.now += 0.0085
+    reads = clock.reads
+    pacer.wait()
+    assert clock.sleeps == []
+    assert clock.reads - reads > 10  # busy-waited
+    assert clock.now >= pacer.deadline
+
+
+def test_slow_frame_is_caught_up_by_the_next():
+    clock = FakeClock()
+    pacer = FramePacer(target_ms=10.0, spin_ms=0.0, clock=clock, sleep=clock.sleep)
+    pacer.wait()
+    start = clock.now
+    clock.now += 0.015  # 5 ms late: no wait, the schedule stays
+    pacer.wait()
+    assert pacer.late == 1 and pacer.deadline == pytest.approx(start + 0.010)
+    clock.now += 0.002
+    pacer.wait()  # back on schedule: this frame only waits 3 ms
+    assert clock.sleeps == [pytest.approx(0.003)]
+    assert clock.now == pytest.approx(start + 0.020)
+
+
+def test_schedule_restarts_after_a_frame_more_than_a_period_late():
+    clock = FakeClock()
+    pacer = FramePacer(target_ms=10.0, spin_ms=0.0, clock=clock, sleep=clock.sleep)
+    pacer.wait()
+    clock.now += 0.035  # 25 ms past its deadline
+    pacer.wait()
+    assert pacer.late == 1 and pacer.deadline == clock.now
+    restart = clock.now
+    clock.now += 0.004
+    pacer.wait()  # a full period from the restart, not a burst of catch-up frames
+    assert clock.sleeps == [pytest.approx(0.006)]
+    assert clock.now == pytest.approx(restart + 0.010)
+    assert pacer.late == 1
+
+
+def test_jitter_stats():
+    clock = FakeClock()
+    stats = PacingStats(window=4, clock=clock)
+    assert stats.stats() == {} and stats.report() == "pacing: no frames"
+    assert stats.tick() == 0.0
+    for dt in (0.010, 0.020, 0.010, 0.020):
+        clock.now += dt
+        assert stats.tick() == pytest.approx(dt)
+    s = stats.stats()
+    assert s['mean'] == pytest.approx(15.0) and s['jitter'] == pytest.approx(5.0)
+    assert s['p50'] == pytest.approx(15.0) and s['p99'] == pytest.approx(20.0)
+    assert stats.report() == "frame 15.00 ms, jitter 5.00 ms (p99 20.00)"
+
+    # only the last `window` intervals count; steady frames have no jitter
+    for _ in range(4):
+        clock.now += 0.016
+        stats.tick()
+    s = stats.stats()
+    assert s['mean'] == pytest.approx(16.0) and s['jitter'] == pytest.approx(0.0, abs=1e-9)
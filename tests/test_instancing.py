@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+import instancing
+from instancing import (INSTANCE_FLOATS, INSTANCE_LOCATION, INSTANCE_STRIDE, InstanceBuffer, changed_ranges,
+                        normal_matrices, pack_instances)
+from sceneGraph import TransformTree
+
+
+def random_transforms(count, seed=0):
+    """Rotation about y, non-uniform scale and translation per instance, [row, column]."""
+    rng = np.random.default_rng(seed)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    scale = rng.uniform(0.5, 2.0, (count, 3))
+    t = np.tile(np.eye(4, dtype=np.float32), (count, 1, 1))
+    t[:, 0, 0], t[:, 0, 2] = np.cos(angle) * scale[:, 0], np.sin(angle) * scale[:, 2]
+    t[:, 2, 0], t[:, 2, 2] = -np.sin(angle) * scale[:, 0], np.cos(angle) * scale[:, 2]
+    t[:, 1, 1] = scale[:, 1]
+    t[:, :3, 3] = rng.uniform(-50, 50, (count, 3))
+    return t
+
+
+class FakeGL:
+    """A GL buffer in host memory plus the attribute pointers set on it."""
+
+    def __init__(self, monkeypatch):
+        self.buffer = np.zeros(0, dtype=np.uint8)
+        self.pointers = {}
+        self.divisors = {}
+        self.writes = []
+        for name in ('glBindVertexArray', 'glBindBuffer', 'glEnableVertexAttribArray', 'glDeleteBuffers'):
+            monkeypatch.setattr(instancing, name, lambda *args: None)
+        monkeypatch.setattr(instancing, 'glGenBuffers', lambda n: 1)
+        monkeypatch.setattr(instancing, 'glBufferData', self.buffer_data)
+        monkeypatch.setattr(instancing, 'glBufferSubData', self.buffer_sub_data)
+        monkeypatch.setattr(instancing, 'glVertexAttribPointer', self.attrib_pointer)
+        monkeypatch.setattr(instancing, 'glVertexAttribDivisor', lambda loc, d: self.divisors.__setitem__(loc, d))
+
+    def buffer_data(self, target, size, data, usage):
+        self.buffer = np.zeros(size, dtype=np.uint8)
+
+    def buffer_sub_data(self, target, offset, size, data):
+        self.buffer[offset:offset + size] = np.asarray(data).view(np.uint8).ravel()
+        self.writes.append((offset, size))
+
+    def attrib_pointer(self, location, size, type, normalized, stride, pointer):
+        self.pointers[location] = (size, stride, pointer.value or 0)
+
+    def fetch(self, location, instances):
+        """The attribute at `location` for each instance, as the vertex shader reads it."""
+        size, stride, offset = self.pointers[location]
+        floats = self.buffer[:instances * stride].reshape(instances, stride)[:, offset:offset + 4 * size]
+        return np.ascontiguousarray(floats).view(np.float32)
+
+
+def shader_matrices(gl, count):
+    """mat4 model (locations 3-6) and mat3 normalMatrix (7-9) per instance; each location is one column."""
+    model = np.stack([gl.fetch(INSTANCE_LOCATION + i, count) for i in range(4)], axis=2)
+    normal = np.stack([gl.fetch(INSTANCE_LOCATION + 4 + i, count) for i in range(3)], axis=2)
+    return model, normal
+
+
+def test_attribute_layout(monkeypatch):
+    gl = FakeGL(monkeypatch)
+    InstanceBuffer().attach(vao=1)
+    assert INSTANCE_STRIDE == INSTANCE_FLOATS * 4 == 100
+    assert set(gl.divisors.items()) == {(INSTANCE_LOCATION + i, 1) for i in range(7)}
+    assert [gl.pointers[INSTANCE_LOCATION + i][::2] for i in range(7)] == [
+        (4, 0), (4, 16), (4, 32), (4, 48), (3, 64), (3, 76), (3, 88)]
+
+
+def test_instanced_matches_per_object(monkeypatch):
+    gl = FakeGL(monkeypatch)
+    transforms = random_transforms(64)
+    buffer = InstanceBuffer()
+    buffer.attach(vao=1)
+    assert buffer.update(transforms) == 64
+    model, normal = shader_matrices(gl, 64)
+
+    rng = np.random.default_rng(1)
+    positions = np.c_[rng.normal(size=(30, 3)), np.ones(30)]
+    normals = rng.normal(size=(30, 3))
+    for i, m in enumerate(transforms.astype(np.float64)):
+        # per-object draw: the model matrix as a uniform, normals by the inverse transpose
+        expected_pos = positions @ m.T
+        expected_normal = normals @ np.linalg.inv(m[:3, :3])
+        np.testing.assert_allclose(positions @ model[i].T, expected_pos, rtol=1e-6, atol=1e-5)
+        np.testing.assert_allclose(normals @ normal[i].T, expected_normal, rtol=1e-4, atol=1e-5)
+
+
+def test_normal_matrices_match_inverse_transpose():
+    transforms = random_transforms(500, seed=2)
+    reference = np.linalg.inv(transforms[:, :3, :3].astype(np.float64)).transpose(0, 2, 1)
+    np.testing.assert_allclose(normal_matrices(transforms), reference, rtol=1e-5, atol=1e-6)
+    singular = np.zeros((1, 4, 4), dtype=np.float32)
+    assert np.isfinite(normal_matrices(singular)).all()
+
+
+def test_partial_updates_keep_buffer_in_sync(monkeypatch):
+    gl = FakeGL(monkeypatch)
+    transforms = random_transforms(200, seed=3)
+    buffer = InstanceBuffer()
+    buffer.attach(vao=1)
+    buffer.update(transforms)
+    moved = transforms.copy()
+    moved[[5, 6, 7, 120], 0, 3] += 1.0
+    gl.writes.clear()
+    buffer.update(moved)
+    assert gl.writes == [(5 * INSTANCE_STRIDE, 3 * INSTANCE_STRIDE), (120 * INSTANCE_STRIDE, INSTANCE_STRIDE)]
+    np.testing.assert_array_equal(gl.buffer[:200 * INSTANCE_STRIDE].view(np.float32).reshape(200, -1),
+                                  pack_instances(moved))
+    gl.writes.clear()
+    buffer.update(moved)
+    assert gl.writes == []
+
+
+def test_changed_ranges_merges_to_limit():
+    old = np.zeros((100, 4), dtype=np.float32)
+    new = old.copy()
+    new[[1, 3, 10, 11, 50, 99]] = 1.0
+    assert changed_ranges(old, new) == [(1, 2), (3, 4), (10, 12), (50, 51), (99, 100)]
+    assert changed_ranges(old, new, max_ranges=2) == [(1, 51), (99, 100)]
+    assert changed_ranges(old, np.ones((102, 4), dtype=np.float32), max_ranges=1) == [(0, 100), (100, 102)]
+    assert changed_ranges(None, new) == [(0, 100)]
+
+
+def test_scene_graph_feeds_the_same_normal_matrices():
+    tree = TransformTree(capacity=2)
+    local = random_transforms(6, seed=4)
+    root = tree.add(local[0])
+    nodes = [tree.add(local[i], parent=root if i < 4 else 2) for i in range(1, 6)]
+    assert tree.update() == 6
+    world = tree.world(np.arange(6))
+    np.testing.assert_allclose(world[nodes[-1]], local[0] @ local[2] @ local[5], rtol=1e-5, atol=1e-4)
+    np.testing.assert_array_equal(pack_instances(world, tree.normal(np.arange(6))), pack_instances(world))
+
+    tree.set_local(nodes[1], local[1])  # node 2: itself and its two children change
+    assert tree.update() == 3
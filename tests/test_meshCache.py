@@ -0,0 +1,122 @@
+import contextlib
+import io
+import os
+import threading
+
+import numpy as np
+import pytest
+
+import meshCache
+from benchmark import write_synthetic_obj
+from objLoader import Loader
+
+OPTIONS = {'numpy_loader': True, 'optimize_meshes': False, 'lod_ratios': []}
+
+
+@pytest.fixture
+def scene(tmp_path):
+    path = tmp_path / "scene.obj"
+    write_synthetic_obj(str(path), 400, groups=3)
+    text = path.read_text().replace("# synthetic benchmark mesh\n", "mtllib scene.mtl\n")
+    path.write_text(text)
+    (tmp_path / "scene.mtl").write_text("".join(f"newmtl mat_{i}\nKd 0.{i} 0.5 0.5\nmap_Kd t{i}.png\n"
+                                                for i in range(3)))
+    return str(path)
+
+
+def save(path, options=OPTIONS):
+    loader = Loader(progress=lambda progress: None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert loader.load_numpy(path)
+        coords = np.concatenate([m.as_arrays()[0] for m in loader.meshes])
+        assert meshCache.save(path, loader.meshes, loader.materials, loader.mtl_paths,
+                              coords.min(axis=0), coords.max(axis=0), options)
+    return loader, coords
+
+
+def load(path, options=OPTIONS):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return meshCache.load(path, options)
+
+
+def test_round_trip(scene):
+    loader, coords = save(scene)
+    cached = load(scene)
+    assert [m.name for m in cached.meshes] == [m.name for m in loader.meshes]
+    for original, mapped in zip(loader.meshes, cached.meshes):
+        assert isinstance(mapped.positions, np.memmap)
+        for a, b in zip(original.as_arrays(), mapped.as_arrays()):
+            np.testing.assert_array_equal(a, b)
+        assert mapped.materials == original.materials
+    assert cached.materials == loader.materials
+    np.testing.assert_array_equal(cached.box_min, coords.min(axis=0))
+    np.testing.assert_array_equal(cached.box_max, coords.max(axis=0))
+    assert [f for f in os.listdir(os.path.dirname(scene)) if f.endswith('.tmp')] == []
+
+
+def test_touched_but_unchanged_sources_stay_valid(scene):
+    save(scene)
+    os.utime(scene, ns=(0, 0))
+    assert load(scene) is not None
+
+
+@pytest.mark.parametrize("edit", ['obj', 'mtl'])
+def test_edited_sources_invalidate(scene, edit):
+    save(scene)
+    target = scene if edit == 'obj' else scene.replace('.obj', '.mtl')
+    with open(target) as f:
+        text = f.read()
+    with open(target, 'w') as f:  # same size, other content
+        f.write(text.replace('0.5', '0.6', 1))
+    assert load(scene) is None
+
+
+def test_mtl_created_later_invalidates(scene):
+    mtl = scene.replace('.obj', '.mtl')
+    text = open(mtl).read()
+    os.remove(mtl)
+    save(scene)
+    assert load(scene) is not None
+    with open(mtl, 'w') as f:
+        f.write(text)
+    assert load(scene) is None
+
+
+def test_options_and_version_invalidate(scene, monkeypatch):
+    save(scene)
+    assert load(scene, dict(OPTIONS, numpy_loader=False)) is None
+    assert load(scene, dict(OPTIONS, optimize_meshes=True)) is None
+    assert load(scene, dict(OPTIONS, lod_ratios=[0.5])) is None
+    monkeypatch.setattr(meshCache, 'CACHE_VERSION', meshCache.CACHE_VERSION + 1)
+    assert load(scene) is None
+
+
+def test_offline_options_serve_a_model_that_skips_them(scene):
+    save(scene, dict(OPTIONS, optimize_meshes=True, lod_ratios=[0.5]))
+    assert load(scene) is not None
+    assert load(scene, dict(OPTIONS, lod_ratios=[0.25])) is None
+
+
+def test_concurrent_writers_do_not_corrupt_the_cache(scene):
+    loader, coords = save(scene)
+    args = (scene, loader.meshes, loader.materials, loader.mtl_paths, coords.min(axis=0), coords.max(axis=0),
+            OPTIONS)
+    errors = []
+
+    def write():
+        for _ in range(10):
+            try:
+                assert meshCache.save(*args)
+            except Exception as e:
+                errors.append(e)
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert errors == []
+    cached = load(scene)
+    for original, mapped in zip(loader.meshes, cached.meshes):
+        np.testing.assert_array_equal(original.as_arrays()[0], mapped.as_arrays()[0])
+    assert [f for f in os.listdir(os.path.dirname(scene)) if f.endswith('.tmp')] == []
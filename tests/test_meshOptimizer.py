@@ -0,0 +1,83 @@
+import numpy as np
+
+from meshOptimizer import acmr, optimize_mesh, weld_vertices
+
+
+def grid_soup(side=24, seam=None):
+    """Unwelded per-corner arrays of a side x side quad grid, like Loader.load_numpy output.
+
+    With `seam`, texcoords of quads left of that column are shifted, so welding must keep the
+    vertices on the seam apart.
+    """
+    u, v = np.meshgrid(np.arange(side + 1), np.arange(side + 1))
+    quad = np.arange((side + 1) ** 2).reshape(side + 1, side + 1)[:-1, :-1].ravel()
+    tris = np.stack((np.stack((quad, quad + 1, quad + side + 2), axis=1),
+                     np.stack((quad, quad + side + 2, quad + side + 1), axis=1)), axis=1).reshape(-1, 3)
+    positions = np.stack((u.ravel(), np.sin(u.ravel() * 0.3), v.ravel()), axis=1).astype(np.float32)
+    corners = tris.ravel()
+    texcoords = np.stack((u.ravel(), v.ravel()), axis=1).astype(np.float32)[corners] / side
+    if seam is not None:
+        left = (np.repeat(quad % (side + 1), 6) < seam)
+        texcoords[left] += 0.5
+    normals = np.tile(np.float32([0.0, 1.0, 0.0]), (len(corners), 1))
+    return positions[corners], normals, texcoords, np.arange(len(corners), dtype=np.uint32)
+
+
+def triangles(positions, normals, texcoords, indices):
+    """Every triangle as one row of its corner attributes, in corner order, sorted (a multiset)."""
+    tris = np.asarray(indices).reshape(-1, 3)
+    rows = np.concatenate([a[tris].reshape(len(tris), -1) for a in (positions, normals, texcoords)], axis=1)
+    return rows[np.lexsort(rows.T[::-1])]
+
+
+def test_geometry_is_unchanged():
+    mesh = grid_soup()
+    *optimized, stats = optimize_mesh(*mesh)
+    np.testing.assert_array_equal(triangles(*mesh), triangles(*optimized))
+    assert stats.vertices_in == len(mesh[3])
+
+
+def test_texcoord_seam_is_kept():
+    mesh = grid_soup(seam=10)
+    *optimized, stats = optimize_mesh(*mesh)
+    np.testing.assert_array_equal(triangles(*mesh), triangles(*optimized))
+    # the seam column is duplicated: one more column of vertices than a seamless grid
+    seamless = optimize_mesh(*grid_soup())[-1]
+    assert stats.vertices_out == seamless.vertices_out + 25
+
+
+def test_vertices_are_welded_and_all_used():
+    positions, normals, texcoords, indices, stats = optimize_mesh(*grid_soup())
+    assert stats.vertices_out == len(positions) == 25 * 25
+    rows = np.hstack((positions, normals, texcoords))
+    assert len(np.unique(rows, axis=0)) == len(rows)
+    np.testing.assert_array_equal(np.unique(indices), np.arange(len(positions)))
+    # numbered in order of first use
+    first_use = np.unique(indices, return_index=True)[1]
+    assert np.all(np.diff(first_use) > 0)
+
+
+def test_cache_misses_go_down():
+    *_, indices, stats = optimize_mesh(*grid_soup())
+    assert stats.acmr_optimized <= stats.acmr_welded < stats.acmr_input == 3.0
+    assert acmr(indices) == stats.acmr_optimized
+    assert str(stats).startswith(f"vertices 3456 -> 625 (x5.53) | ACMR 3.000 -> {stats.acmr_welded:.3f}")
+
+    # an input that is already indexed reports its own ratio
+    positions, normals, texcoords, indices, _ = optimize_mesh(*grid_soup())
+    again = optimize_mesh(positions, normals, texcoords, indices)[-1]
+    assert again.acmr_input == acmr(indices) < 3.0
+
+
+def test_weld_keeps_first_use_order():
+    a = np.float32([[0, 0], [1, 1], [0, 0], [2, 2], [1, 1]])
+    (unique,), remap = weld_vertices(a)
+    np.testing.assert_array_equal(unique, [[0, 0], [1, 1], [2, 2]])
+    np.testing.assert_array_equal(remap, [0, 1, 0, 2, 1])
+
+
+def test_empty_mesh():
+    empty = (np.zeros((0, 3), np.float32), np.zeros((0, 3), np.float32), np.zeros((0, 2), np.float32),
+             np.zeros(0, np.uint32))
+    positions, _, _, indices, stats = optimize_mesh(*empty)
+    assert len(positions) == len(indices) == stats.vertices_out == 0
@@ -0,0 +1,116 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from bvh import BVH
+from meshOptimizer import optimize_mesh
+from meshSimplifier import simplify_lods
+
+RATIOS = (0.5, 0.25, 0.125)
+
+
+def seam_grid(faces):
+    """Welded wavy 10x10 grid whose right half is a separate UV island (a seam down x = 5)."""
+    side = int(np.ceil(np.sqrt(faces / 2.0))) + 1
+    u, v = np.meshgrid(np.linspace(0.0, 1.0, side), np.linspace(0.0, 1.0, side))
+    u, v = u.ravel(), v.ravel()
+    points = np.stack((u * 10.0, np.sin(u * 6.0) * np.cos(v * 5.0), v * 10.0), axis=1)
+    quad = np.arange(side * side).reshape(side, side)[:-1, :-1].ravel()
+    tris = np.concatenate((np.stack((quad, quad + side + 1, quad + 1), axis=1),
+                           np.stack((quad, quad + side, quad + side + 1), axis=1)))
+    corners = tris.ravel()
+    texcoords = np.stack((u, v), axis=1)[corners]
+    texcoords[np.repeat(points[tris].mean(axis=1)[:, 0] > 5.0, 3), 0] += 2.0
+    normals = np.tile([0.0, 1.0, 0.0], (len(corners), 1))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return optimize_mesh(points[corners].astype(np.float32), normals.astype(np.float32),
+                             texcoords.astype(np.float32), np.arange(len(corners)))[:4]
+
+
+@pytest.fixture(scope='module')
+def grid():
+    positions, normals, texcoords, indices = seam_grid(5000)
+    levels, errors = simplify_lods(positions, normals, texcoords, indices, RATIOS)
+    return positions, normals, texcoords, indices, levels, errors
+
+
+def test_triangle_counts(grid):
+    *_, indices, levels, errors = grid
+    assert len(indices) // 3 == 5000
+    assert [len(level) // 3 for level in levels] == [2500, 1250, 624]
+    assert all(level.dtype == np.uint32 for level in levels)
+    assert errors == sorted(errors)
+
+
+def test_levels_index_the_original_vertices(grid):
+    positions, _, _, indices, levels, _ = grid
+    for level in levels:
+        assert level.max() < len(positions)
+        assert set(level.tolist()) <= set(indices.tolist())
+
+
+def test_seam_kept(grid):
+    positions, _, texcoords, _, levels, _ = grid
+    for level in levels:
+        islands = texcoords[level.reshape(-1, 3)][:, :, 0] > 1.5
+        assert not np.any(islands.any(axis=1) & ~islands.all(axis=1))
+
+
+def test_border_kept(grid):
+    positions, _, _, _, levels, _ = grid
+    for level in levels:
+        corners = positions[level.reshape(-1, 3)].astype(np.float64)
+        area = np.abs(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])[:, 1]).sum() / 2
+        assert area == pytest.approx(100.0, abs=1e-3)
+
+
+def test_error_bounds_distance_to_original(grid):
+    positions, _, _, indices, levels, errors = grid
+    points = positions[np.unique(indices)].astype(np.float64)
+    for level, error in zip(levels, errors):
+        bvh = BVH.build(positions[level.reshape(-1, 3)])
+        distance = max(min(bvh.sphere_contacts(p, 10.0 * error + 1e-3)[2], default=np.inf) for p in points)
+        assert distance <= error
+    assert errors[-1] < 0.2
+
+
+def test_material_edge_matches(grid):
+    # the grid as two materials split along the seam: both sides must keep identical edges
+    positions, normals, texcoords, indices, _, _ = grid
+    tris = indices.reshape(-1, 3)
+    right = texcoords[tris][:, 0, 0] > 1.5
+    sides = [simplify_lods(positions, normals, texcoords, tris[mask].ravel(), RATIOS)[0]
+             for mask in (~right, right)]
+    for left_level, right_level in zip(*sides):
+        edge = [set(map(tuple, positions[level][np.isclose(positions[level][:, 0], 5.0)].tolist()))
+                for level in (left_level, right_level)]
+        assert edge[0] and edge[0] == edge[1]
+
+
+def test_empty_mesh():
+    empty = np.zeros((0, 3), dtype=np.float32)
+    levels, errors = simplify_lods(empty, empty, np.zeros((0, 2), dtype=np.float32), [], RATIOS)
+    assert [len(level) for level in levels] == [0, 0, 0]
+    assert errors == [0.0, 0.0, 0.0]
+
+
+def test_default_model_skips_lods_but_takes_them_from_an_offline_cache(tmp_path, monkeypatch, capsys):
+    from benchmark import write_synthetic_obj
+    import meshSimplifier
+    from model import Model
+
+    path = str(tmp_path / "grid.obj")
+    write_synthetic_obj(path, 2000, groups=2)
+    assert not any(Model().prepare(path).lod_index_arrays)
+
+    monkeypatch.setattr('sys.argv', ['meshSimplifier.py', path, '--ratios', '0.5'])
+    meshSimplifier.main()
+    capsys.readouterr()
+    payload = Model().prepare(path)
+    assert "Loaded mesh cache" in capsys.readouterr().out
+    assert [len(lods) for lods in payload.lod_index_arrays] == [1, 1]
+    assert all(len(lods[0]) < len(full) for lods, full in zip(payload.lod_index_arrays, payload.index_arrays))
+    # asking for other levels still rebuilds them
+    assert [len(lods) for lods in Model(lod_ratios=(0.5, 0.25)).prepare(path).lod_index_arrays] == [2, 2]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from OpenGL.GL import GL_FALSE, GL_FLOAT, GL_HALF_FLOAT, GL_INT_2_10_10_10_REV, GL_TRUE
+
+from model import VERTEX_FORMATS, _attribute_format, build_vertex_array, pack_normals
+
+
+def random_vertices(count=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-50.0, 50.0, (count, 3)).astype(np.float32)
+    normals = rng.normal(size=(count, 3)).astype(np.float32) * rng.uniform(0.1, 3.0, (count, 1)).astype(np.float32)
+    texcoords = rng.uniform(-4.0, 4.0, (count, 2)).astype(np.float32)
+    return positions, normals, texcoords
+
+
+def field(data, name):
+    """A field read back from the raw interleaved bytes, as GL would fetch it (stride/offset)."""
+    layout = data.dtype
+    dtype, offset = layout.fields[name]
+    raw = data.view(np.uint8).reshape(len(data), layout.itemsize)[:, offset:offset + dtype.itemsize]
+    return np.ascontiguousarray(raw).view(dtype.base).reshape(len(data), -1)
+
+
+def decode_2_10_10_10(words):
+    """Signed normalized 10:10:10:2 as GL 4.2+ decodes it: max(c / 511, -1)."""
+    shifts = np.array([0, 10, 20])
+    q = (words.astype(np.int64).reshape(-1, 1) >> shifts) & 0x3FF
+    return np.maximum(np.where(q >= 512, q - 1024, q) / 511.0, -1.0), words.astype(np.int64) >> 30
+
+
+def test_strides():
+    assert VERTEX_FORMATS['float'].itemsize == 32
+    assert VERTEX_FORMATS['packed'].itemsize == 20
+
+
+def test_float_layout_is_exact():
+    positions, normals, texcoords = random_vertices()
+    data = build_vertex_array(positions, normals, texcoords, 'float')
+    np.testing.assert_array_equal(field(data, 'position'), positions)
+    np.testing.assert_array_equal(field(data, 'normal'), normals)
+    np.testing.assert_array_equal(field(data, 'texcoord'), texcoords)
+
+
+def test_packed_layout_matches_float_layout():
+    positions, normals, texcoords = random_vertices()
+    reference = build_vertex_array(positions, normals, texcoords, 'float')
+    packed = build_vertex_array(positions, normals, texcoords, 'packed')
+    np.testing.assert_array_equal(field(packed, 'position'), field(reference, 'position'))
+
+    decoded, w = decode_2_10_10_10(field(packed, 'normal'))
+    unit = field(reference, 'normal') / np.linalg.norm(field(reference, 'normal'), axis=1, keepdims=True)
+    assert np.abs(decoded - unit).max() <= 0.5 / 511.0 + 1e-6
+    assert not w.any()
+
+    half = field(packed, 'texcoord').astype(np.float32)
+    np.testing.assert_allclose(half, field(reference, 'texcoord'), rtol=2.0 ** -11, atol=2.0 ** -24)
+
+
+def test_packed_normal_edge_cases():
+    normals = np.float32([[0, 0, 0], [1, 0, 0], [0, -1, 0], [0, 0, -1]])
+    decoded, _ = decode_2_10_10_10(pack_normals(normals))
+    np.testing.assert_array_equal(decoded, [[0, 0, 0], [1, 0, 0], [0, -1, 0], [0, 0, -1]])
+
+
+@pytest.mark.parametrize("name, expected", [
+    ('float', {'position': (3, GL_FLOAT, GL_FALSE), 'normal': (3, GL_FLOAT, GL_FALSE),
+               'texcoord': (2, GL_FLOAT, GL_FALSE)}),
+    ('packed', {'position': (3, GL_FLOAT, GL_FALSE), 'normal': (4, GL_INT_2_10_10_10_REV, GL_TRUE),
+                'texcoord': (2, GL_HALF_FLOAT, GL_FALSE)}),
+])
+def test_attribute_pointers(name, expected):
+    layout = VERTEX_FORMATS[name]
+    for attribute, pointer in expected.items():
+        assert _attribute_format(layout.fields[attribute][0]) == pointer
@@ -0,0 +1,201 @@
+import os
+import subprocess
+import sys
+import warnings
+
+import numpy as np
+import pytest
+
+from benchmark import write_synthetic_obj
+import objLoader
+from objLoader import _SHARED_FIELDS, Loader, ObjParseError, parse_obj_block, parse_obj_parallel
+
+
+def quiet_loader(**kwargs):
+    return Loader(progress=lambda progress: None, **kwargs)
+
+
+@pytest.mark.parametrize("text, record", [
+    (b"v 1 2 3\nv 1 x 3\nf 1 2 1\n", "'v 1 x 3'"),
+    (b"v 1 2\nf 1 1 1\n", "'v 1 2'"),
+    (b"v 0 0 0\nvt 0.5 nan0\nf 1/1 1/1 1/1\n", "'vt 0.5 nan0'"),
+])
+def test_malformed_coordinates_raise(text, record):
+    with pytest.raises(ObjParseError, match=record):
+        parse_obj_block(text)
+
+
+def test_malformed_face_index_raises_without_warning():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with pytest.raises(ObjParseError, match="face index"):
+            parse_obj_block(b"v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2a 3\n")
+
+
+def test_extra_components_are_ignored():
+    rec = parse_obj_block(b"v 0 0 0 1\nv 1 2 3 1\n")
+    np.testing.assert_array_equal(rec.positions, [[0, 0, 0], [1, 2, 3]])
+
+
+def test_loaders_report_parse_errors(tmp_path, capsys):
+    path = tmp_path / "bad.obj"
+    path.write_text("v 0 0 0\nv 1 x 0\nv 0 1 0\nf 1 2 3\n")
+    assert quiet_loader().load_numpy(str(path)) is False
+    assert quiet_loader().load_streaming(str(path)) is False
+    assert "Malformed 'v' record" in capsys.readouterr().out
+
+
+# Loads the OBJ in a fresh interpreter: prints peak RSS growth in MB and a digest of the meshes
+_LOAD_SCRIPT = r'''
+import contextlib, hashlib, io, sys
+from objLoader import Loader
+
+def peak_mb():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+
+path, budget = sys.argv[1], int(sys.argv[2])
+digest = hashlib.sha1()
+
+def consume(mesh):
+    digest.update(mesh.name.encode() + (mesh.materials.name.encode() if mesh.materials else b'-'))
+    for array in mesh.as_arrays():
+        digest.update(array.tobytes())
+
+baseline = peak_mb()
+loader = Loader(progress=lambda progress: None)
+with contextlib.redirect_stdout(io.StringIO()):
+    if budget:
+        ok = loader.load_streaming(path, consume, memory_budget=budget)
+    else:
+        ok = loader.load_numpy(path)
+        for mesh in loader.meshes:
+            consume(mesh)
+print(ok, peak_mb() - baseline, digest.hexdigest())
+'''
+
+
+def _load_in_child(path, budget):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', _LOAD_SCRIPT, str(path), str(budget)], cwd=root,
+                         capture_output=True, text=True, check=True).stdout.split()
+    return out[0] == 'True', float(out[1]), out[2]
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason="peak RSS is read from /proc")
+def test_streaming_matches_load_numpy_in_bounded_memory(tmp_path):
+    path = tmp_path / "synthetic.obj"
+    write_synthetic_obj(str(path), 200000)
+    ok, numpy_growth, reference = _load_in_child(path, 0)
+    assert ok
+    ok, stream_growth, digest = _load_in_child(path, 2 * 2**20)
+    assert ok
+    assert digest == reference
+    # the smallest parse block (1 MiB of text) expands ~20 times while it is parsed
+    assert stream_growth < 40.0
+    assert stream_growth < numpy_growth / 3
+
+
+def _same_records(a, b):
+    return a.events == b.events and all(
+        getattr(a, name).dtype == getattr(b, name).dtype and np.array_equal(getattr(a, name), getattr(b, name))
+        for name in _SHARED_FIELDS)
+
+
+def _shared_blocks():
+    """POSIX shared memory blocks of multiprocessing.shared_memory on Linux."""
+    return {name for name in os.listdir('/dev/shm') if name.startswith('psm_')} if os.path.isdir('/dev/shm') else set()
+
+
+def test_parallel_parse_matches_serial(tmp_path, monkeypatch):
+    path = tmp_path / "synthetic.obj"
+    write_synthetic_obj(str(path), 20000)
+    monkeypatch.setattr(objLoader, 'MIN_PARALLEL_RANGE', 1 << 16)  # many small ranges
+    before = _shared_blocks()
+    reference = parse_obj_block(path.read_bytes())
+    assert _same_records(parse_obj_parallel(str(path), 3), reference)
+
+    serial, parallel = quiet_loader(), quiet_loader()
+    assert serial.load_numpy(str(path)) and parallel.load_numpy(str(path), workers=3)
+    assert [m.name for m in parallel.meshes] == [m.name for m in serial.meshes]
+    for a, b in zip(serial.meshes, parallel.meshes):
+        for x, y in zip(a.as_arrays(), b.as_arrays()):
+            np.testing.assert_array_equal(x, y)
+    assert _shared_blocks() == before
+
+
+def test_parallel_parse_failure_unlinks_every_block(tmp_path, monkeypatch):
+    path = tmp_path / "broken.obj"
+    write_synthetic_obj(str(path), 20000)
+    with open(path, 'a') as f:
+        f.write("v 1 x 3\n")  # only the last range fails
+    monkeypatch.setattr(objLoader, 'MIN_PARALLEL_RANGE', 1 << 16)
+    before = _shared_blocks()
+    with pytest.raises(ObjParseError, match="'v 1 x 3'"):
+        parse_obj_parallel(str(path), 3)
+    assert _shared_blocks() == before
+
+
+PARITY_OBJ = """mtllib parity.mtl
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+vn 0 0 1
+vn 0 0 -1
+o quads
+usemtl red
+f 1/1/1 2/2/1 3/3/1 4/4/1
+f -4/-4/-2 -1/-1/-2 -2/-2/-2 -3/-3/-2
+g no_texcoords
+v 0 0 1
+v 1 0 1
+v 1 1 1
+usemtl blue
+f 5//1 6//1 7//1
+f -3//2 -1//2 -2//2
+usemtl red
+f 1//1 5//1 6//1 2//1
+o positions_only
+v 2 0 0
+v 3 0 0
+v 3 1 0
+v 2 1 0
+f -4 -3 -2 -1
+g positions_and_texcoords
+f 8/1 9/2 10/3
+usemtl missing
+f -1/-1 -2/-2 -3/-3
+"""
+
+PARITY_MTL = """newmtl red
+Kd 1 0 0
+map_Kd red.png
+newmtl blue
+Kd 0 0 1
+"""
+
+
+def test_load_numpy_matches_legacy_loader(tmp_path, capsys):
+    (tmp_path / "parity.mtl").write_text(PARITY_MTL)
+    path = tmp_path / "parity.obj"
+    path.write_text(PARITY_OBJ)
+    legacy, vectorized = quiet_loader(), quiet_loader()
+    assert legacy.load(str(path)) and vectorized.load_numpy(str(path))
+    capsys.readouterr()
+
+    assert vectorized.materials == legacy.materials
+    assert [m.name for m in vectorized.meshes] == [m.name for m in legacy.meshes]
+    # a usemtl switch inside a group starts a new mesh of the same name
+    assert [m.name for m in legacy.meshes] == ['quads', 'no_texcoords', 'no_texcoords', 'positions_only',
+                                               'positions_and_texcoords', 'positions_and_texcoords']
+    for a, b in zip(legacy.meshes, vectorized.meshes):
+        assert b.materials == a.materials
+        for x, y, name in zip(a.as_arrays(), b.as_arrays(), ('positions', 'normals', 'texcoords', 'indices')):
+            np.testing.assert_array_equal(np.asarray(x), np.asarray(y), err_msg=f"{a.name}: {name}")
+    # the quads were split into triangles
+    assert sum(len(m.as_arrays()[3]) for m in legacy.meshes) // 3 == 2 + 2 + 2 + 2 + 2 + 1 + 1
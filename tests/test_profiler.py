@@ -0,0 +1,227 @@
+import csv
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import profiler as profiler_module
+from profiler import Profiler
+
+
+class FakeGL:
+    """GL_TIME_ELAPSED queries whose results the test makes available; one active query at a time."""
+
+    def __init__(self, monkeypatch):
+        self.next_query = 1
+        self.active = None
+        self.ended = []
+        self.available = set()
+        self.elapsed = {}  # query -> ns
+        monkeypatch.setattr(profiler_module, 'glGenQueries', self.gen)
+        monkeypatch.setattr(profiler_module, 'glBeginQuery', self.begin)
+        monkeypatch.setattr(profiler_module, 'glEndQuery', self.end)
+        monkeypatch.setattr(profiler_module, 'glGetQueryObjectiv', self.get)
+        monkeypatch.setattr(profiler_module, '_get_query_ui64', self.get_ui64)
+        monkeypatch.setattr(profiler_module, 'glFinish', self.finish)
+
+    def gen(self, n):
+        query, self.next_query = self.next_query, self.next_query + 1
+        return query
+
+    def begin(self, target, query):
+        assert self.active is None, "nested GL_TIME_ELAPSED query"
+        self.active = query
+        self.available.discard(query)  # a reused query starts over
+
+    def end(self, target):
+        self.ended.append(self.active)
+        self.active = None
+
+    def get(self, query, pname):
+        assert pname == profiler_module.GL_QUERY_RESULT_AVAILABLE
+        return int(query in self.available)
+
+    def get_ui64(self, query, pname, result):
+        assert query in self.available
+        result._obj.value = self.elapsed[query]
+
+    def finish(self):
+        for query in self.ended:
+            self.elapsed.setdefault(query, 1_000_000)
+        self.available.update(self.ended)
+
+    def complete(self, ms_by_query):
+        for query, ms in ms_by_query.items():
+            self.elapsed[query] = int(ms * 1e6)
+            self.available.add(query)
+
+
+class FakeClock:
+    def __init__(self):
+        self.ns = 1_000_000_000
+
+    def __call__(self):
+        return self.ns
+
+    def advance(self, ms):
+        self.ns += int(ms * 1e6)
+
+
+@pytest.fixture
+def gl(monkeypatch):
+    return FakeGL(monkeypatch)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(profiler_module, 'time', SimpleNamespace(perf_counter_ns=clock))
+    return clock
+
+
+def frame(prof, clock, shadow_ms=2.0, main_ms=3.0, culling_ms=0.5):
+    prof.begin_frame()
+    with prof.scope('shadow', gpu=True):
+        clock.advance(shadow_ms)
+    with prof.scope('main', gpu=True):
+        with prof.scope('culling', gpu=True):  # a GPU scope inside another: CPU time only
+            clock.advance(culling_ms)
+        clock.advance(main_ms - culling_ms)
+    clock.advance(1.0)
+    prof.end_frame()
+
+
+def test_nested_scopes_and_cpu_times(gl, clock):
+    prof = Profiler(enabled=True)
+    frame(prof, clock)
+    record = prof.frames[-1]
+    assert record['cpu'] == pytest.approx({'shadow': 2.0, 'main': 3.0, 'main/culling': 0.5, 'frame': 6.0})
+    # first seen: an inner scope is recorded when it exits, before its parent
+    assert prof.paths() == ['frame', 'shadow', 'main/culling', 'main']
+    # two queries: the nested GPU scope did not start a second one
+    assert gl.ended == [1, 2] and gl.active is None
+    assert [(path, depth) for _, path, depth, _, _ in prof.events] == [('shadow', 0), ('main/culling', 1),
+                                                                      ('main', 0)]
+    # repeated scopes in a frame add up
+    prof.begin_frame()
+    for _ in range(3):
+        with prof.scope('upload'):
+            clock.advance(1.0)
+    prof.end_frame()
+    assert prof.frames[-1]['cpu']['upload'] == pytest.approx(3.0)
+
+
+def test_gpu_results_are_read_two_frames_later(gl, clock):
+    prof = Profiler(enabled=True)
+    frame(prof, clock)  # queries 1 (shadow) and 2 (main)
+    gl.complete({1: 1.5, 2: 4.0})
+    frame(prof, clock)  # frame 2 does not touch frame 1's queries
+    assert prof.frames[0]['gpu'] == {}
+    assert gl.ended[2:] == [3, 4]
+    frame(prof, clock)  # frame 3 reads frame 1 and reuses its queries
+    assert prof.frames[0]['gpu'] == pytest.approx({'shadow': 1.5, 'main': 4.0})
+    assert sorted(gl.ended[4:]) == [1, 2]
+    assert gl.next_query == 5
+    assert prof.gpu_late == 0
+
+
+def test_late_results_are_checked_again_without_waiting(gl, clock):
+    prof = Profiler(enabled=True)
+    frame(prof, clock)
+    gl.complete({1: 1.0})  # main's query 2 is not done
+    frame(prof, clock)
+    frame(prof, clock)
+    assert prof.frames[0]['gpu'] == pytest.approx({'shadow': 1.0})
+    assert prof.gpu_late == 1
+    gl.complete({2: 5.0})
+    frame(prof, clock)
+    frame(prof, clock)  # next turn of frame 1's set
+    assert prof.frames[0]['gpu'] == pytest.approx({'shadow': 1.0, 'main': 5.0})
+    # frame 1's main, then frame 3's pair and frame 4's pair (still running) when each was first checked
+    assert prof.gpu_late == 1 + 2 + 2
+
+    # finish() waits for the GPU and collects everything
+    prof.finish()
+    assert all(set(record['gpu']) == {'shadow', 'main'} for record in prof.frames)
+
+
+def test_disabled_records_nothing_and_toggles_at_the_next_frame(gl, clock, capsys):
+    prof = Profiler(enabled=False)
+    assert prof.scope('a') is prof.scope('b', gpu=True)  # one shared no-op context
+    frame(prof, clock)
+    prof.count('draws', 5)
+    assert not prof.frames and not prof.events and gl.ended == []
+
+    draws = [100]
+    prof.track('draws', lambda: draws[0])
+    assert prof.toggle() is True
+    with prof.scope('between'):  # still off until the frame starts
+        pass
+    assert not prof.events
+    draws[0] = 150  # counted before the profiler came on: not part of the first frame
+    prof.begin_frame()
+    assert prof.enabled
+    draws[0] += 7
+    prof.count('uniforms', 2)
+    prof.count('uniforms')
+    prof.end_frame()
+    assert prof.frames[-1]['counters'] == {'draws': 7, 'uniforms': 3}
+    assert capsys.readouterr().out == "Profiler on\n"
+
+    prof.toggle()
+    with prof.scope('still on'):
+        pass
+    prof.begin_frame()
+    assert not prof.enabled and prof.scope('x') is prof.scope('y')
+    assert len(prof.frames) == 1 and prof.events[-1][1] == 'still on'
+
+
+def test_statistics(gl, clock):
+    prof = Profiler(enabled=True, window=4)
+    for main_ms in (1.0, 2.0, 3.0, 4.0, 5.0):
+        frame(prof, clock, main_ms=main_ms, culling_ms=0.0)
+    assert [r['frame'] for r in prof.frames] == [2, 3, 4, 5]
+    assert prof.percentiles('cpu', 'main', (0, 50, 100)) == pytest.approx([2.0, 3.5, 5.0])
+    assert prof.percentiles('gpu', 'main') is None
+    stats = prof.stats()
+    assert stats['cpu']['main'] == {'p50': pytest.approx(3.5), 'p95': pytest.approx(4.85),
+                                    'p99': pytest.approx(4.97)}
+    assert stats['gpu'] == {}
+    assert prof.report().startswith("frame 6.50/7.85 | shadow 2.00/2.00 | main 3.50/4.85")
+    assert prof.summary().splitlines()[0].split() == ['scope', 'cpu', 'p50', 'p95', 'p99', 'gpu', 'p50', 'p95',
+                                                      'p99']
+
+
+def test_csv_and_trace_export(gl, clock, tmp_path, capsys):
+    prof = Profiler(enabled=True)
+    prof.track('draws', lambda: 0)
+    for _ in range(3):
+        frame(prof, clock)
+        gl.available.update(gl.ended)
+        gl.elapsed.update({q: 2_000_000 for q in gl.ended})
+    prof.finish()
+
+    csv_path = tmp_path / "profile.csv"
+    prof.export_csv(str(csv_path))
+    rows = list(csv.reader(open(csv_path)))
+    assert rows[0] == ['frame'] + [f"{p} cpu ms" for p in prof.paths()] + [f"{p} gpu ms" for p in prof.paths()] \
+        + ['draws']
+    assert len(rows) == 4 and rows[1][0] == '1'
+    header = rows[0]
+    assert float(rows[1][header.index('main cpu ms')]) == pytest.approx(3.0)
+    assert float(rows[1][header.index('main gpu ms')]) == pytest.approx(2.0)
+    assert rows[1][header.index('main/culling gpu ms')] == ''
+
+    trace_path = tmp_path / "trace.json"
+    prof.export_chrome_trace(str(trace_path))
+    events = json.load(open(trace_path))['traceEvents']
+    cpu = [e for e in events if e.get('cat') == 'cpu']
+    gpu = [e for e in events if e.get('cat') == 'gpu']
+    assert len(cpu) == 3 * 3 and len(gpu) == 3 * 2
+    main = next(e for e in cpu if e['args']['path'] == 'main')
+    assert main['dur'] == pytest.approx(3000.0) and main['tid'] == 1
+    gpu_main = next(e for e in gpu if e['name'] == 'main' and e['args']['frame'] == main['args']['frame'])
+    assert gpu_main['ts'] == main['ts'] and gpu_main['dur'] == pytest.approx(2000.0)
+    assert sum(e['ph'] == 'C' for e in events) == 3
+    assert {e['args']['name'] for e in events if e['ph'] == 'M'} == {'CPU', 'GPU'}
+    assert "Wrote" in capsys.readouterr().out
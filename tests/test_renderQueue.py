@@ -0,0 +1,154 @@
+import numpy as np
+
+from renderQueue import PASS_MAIN, PASS_SHADOW, RenderQueue
+
+
+class RecordingBackend:
+    def __init__(self, log):
+        self.log = log
+
+    def use_program(self, program):
+        self.log.append(('program', program))
+
+    def bind_vertex_array(self, vao):
+        self.log.append(('vao', vao))
+
+    def bind_texture(self, texture_id):
+        self.log.append(('texture', texture_id))
+
+
+def make_queue():
+    log = []
+    return RenderQueue(backend=RecordingBackend(log)), log
+
+
+def draw(log, name):
+    return lambda *args: log.append(('draw', name) + args)
+
+
+class Draws(dict):
+    """One callable per name, the same object every frame like a mesh's bound draw method."""
+
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    def __missing__(self, name):
+        self[name] = draw(self.log, name)
+        return self[name]
+
+
+def submit_scene(queue, log, args=1, draws=None):
+    draws = draws if draws is not None else Draws(log)
+    queue.begin_frame()
+    queue.begin_pass(PASS_SHADOW, lambda: log.append(('setup', 'shadow')), 'depth', 'shadow')
+    queue.begin_pass(PASS_MAIN, lambda: log.append(('setup', 'main')), 'lit', 'main')
+    # submitted out of order: main before shadow, textures and VAOs interleaved, far before near
+    queue.add(PASS_MAIN, 'lit', 20, 200, 900, draws['far rock'], args)
+    queue.add(PASS_MAIN, 'lit', 10, 100, 50, draws['wood'], args)
+    queue.add(PASS_MAIN, 'lit', 20, 200, 10, draws['near rock'], args)
+    queue.add(PASS_MAIN, 'lit', 10, 300, 5, draws['wood 2'], args)
+    queue.add(PASS_SHADOW, 'depth', None, 100, 0, draws['wood depth'], args)
+    queue.add(PASS_SHADOW, 'depth', None, 200, 0, draws['rock depth'], args)
+
+
+def test_sorted_with_redundant_binds_skipped():
+    queue, log = make_queue()
+    submit_scene(queue, log)
+    changes = queue.execute()
+    # key indices follow first submission: VAO 200 and texture 20 sort first
+    assert log == [
+        ('program', 'depth'), ('setup', 'shadow'),
+        ('vao', 200), ('draw', 'rock depth', 1),
+        ('vao', 100), ('draw', 'wood depth', 1),
+        ('program', 'lit'), ('setup', 'main'),
+        ('vao', 200), ('texture', 20), ('draw', 'near rock', 1),
+        ('draw', 'far rock', 1),
+        ('vao', 100), ('texture', 10), ('draw', 'wood', 1),
+        ('vao', 300), ('draw', 'wood 2', 1),
+        ('vao', 0),
+    ]
+    binds = [entry for entry in log if entry[0] in ('program', 'vao', 'texture')]
+    assert changes == len(binds) == 10
+    # program on every item (6), far rock's VAO and texture (2), wood 2's texture (1)
+    assert queue.last_frame['redundant'] == 9
+    assert queue.redundant == 9
+
+
+def test_setup_runs_with_program_bound():
+    queue, log = make_queue()
+    queue.begin_frame()
+    queue.begin_pass(PASS_MAIN, lambda: log.append(('setup', 'empty')), 'lit')
+    queue.execute()
+    assert log == [('program', 'lit'), ('setup', 'empty')]
+
+
+def test_replay_and_invalidation():
+    queue, log = make_queue()
+    draws = Draws(log)
+    submit_scene(queue, log, draws=draws)
+    queue.execute()
+    first = list(log)
+
+    log.clear()
+    submit_scene(queue, log, draws=draws)
+    queue.execute()
+    assert log == first  # every frame starts with a full set of binds
+    assert (queue.compiled, queue.replayed) == (1, 1)
+    assert queue.last_frame['replayed']
+
+    log.clear()
+    submit_scene(queue, log, args=np.array([1, 2]), draws=draws)  # different draw arguments: compiled again
+    queue.execute()
+    assert (queue.compiled, queue.replayed) == (2, 1)
+
+    log.clear()
+    submit_scene(queue, log, args=np.array([1, 2]), draws=draws)
+    queue.execute()
+    assert (queue.compiled, queue.replayed) == (2, 2)
+
+    queue.forget(vaos=[300])
+    submit_scene(queue, log, args=np.array([1, 2]), draws=draws)
+    queue.execute()
+    assert (queue.compiled, queue.replayed) == (3, 2)
+
+
+def test_forget_reuses_indices():
+    queue, log = make_queue()
+    queue.begin_frame()
+    for frame in range(50):
+        # a streamed chunk: new VAO each time, the old one deleted
+        queue.add(PASS_MAIN, 'lit', None, 1000 + frame, 0, draw(log, 'chunk'))
+        queue.forget(vaos=[1000 + frame])
+    assert queue._ids[2] == {}
+    queue.add(PASS_MAIN, 'lit', None, 7, 0, draw(log, 'a'))
+    queue.add(PASS_MAIN, 'lit', None, 8, 0, draw(log, 'b'))
+    assert sorted(queue._ids[2].values()) == [1, 2]
+    queue.forget(vaos=[7, 999])  # unknown handles are ignored
+    queue.add(PASS_MAIN, 'lit', None, 9, 0, draw(log, 'c'))
+    assert queue._ids[2] == {8: 2, 9: 1}
+
+
+def test_depth_bits():
+    queue, _ = make_queue()
+    queue.begin_frame(eye=(0.0, 0.0, 0.0), far=100.0)
+    near, far = queue.depth_bits([[0, 0, 10], [0, 0, 50]]), queue.depth_bits([0, 0, 80])
+    assert 0 < near < far
+    assert queue.depth_bits([0, 0, 1000]) == (1 << 20) - 1
+
+
+def test_deleted_chunk_vaos_forgotten():
+    from types import SimpleNamespace
+
+    from chunkStreaming import GLChunkUploader
+
+    queue, log = make_queue()
+    queue.begin_frame()
+    queue.add(PASS_MAIN, 'lit', None, 41, 0, draw(log, 'chunk'))
+    queue.add(PASS_MAIN, 'lit', None, 42, 0, draw(log, 'other chunk'))
+    deleted = []
+    model = SimpleNamespace(meshes=[SimpleNamespace(VAO=41), SimpleNamespace(VAO=41)],
+                            delete=lambda: deleted.append(True))
+    GLChunkUploader(queue).delete(model)
+    assert deleted == [True]
+    assert queue._ids[2] == {42: 2}
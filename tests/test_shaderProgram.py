@@ -0,0 +1,90 @@
+import glm
+import numpy as np
+import pytest
+
+import shaderProgram
+from shaderProgram import ShaderProgram
+
+ACTIVE = [b'model', b'lightPos', b'cascadeSplits[0]', b'shadowMap']
+
+
+@pytest.fixture
+def gl(monkeypatch):
+    """Records every uniform call a ShaderProgram makes instead of touching GL."""
+    calls = []
+    lookups = []
+
+    def location(program, name):
+        lookups.append(name)
+        return {'model': 0, 'lightPos': 1, 'cascadeSplits[0]': 2, 'shadowMap': 3,
+                'cascadeSplits[1]': 4}.get(name, -1)
+
+    monkeypatch.setattr(shaderProgram, 'glGetProgramiv', lambda program, pname: len(ACTIVE))
+    monkeypatch.setattr(shaderProgram, 'glGetActiveUniform', lambda program, i: (ACTIVE[i], 1, 0))
+    monkeypatch.setattr(shaderProgram, 'glGetUniformLocation', location)
+    for name in ('glUniform1i', 'glUniform1f', 'glUniform3f', 'glUniformMatrix4fv', 'glUniform2fv'):
+        monkeypatch.setattr(shaderProgram, name, lambda *args, name=name: calls.append((name,) + args))
+    return calls, lookups
+
+
+def make_program():
+    program = ShaderProgram.__new__(ShaderProgram)
+    program.program = 7
+    program.locations = {}
+    program.values = {}
+    program._warned = set()
+    program.uploads = 0
+    program.skipped = 0
+    program._query_uniforms()
+    return program
+
+
+def test_locations_queried_once(gl):
+    calls, lookups = gl
+    program = make_program()
+    assert program.locations == {'model': 0, 'lightPos': 1, 'cascadeSplits[0]': 2,
+                                 'cascadeSplits': 2, 'shadowMap': 3}
+    assert sorted(lookups) == sorted(name.decode() for name in ACTIVE)
+
+    for frame in range(3):
+        program.set_int('shadowMap', 1)
+        program.set_float('cascadeSplits[1]', 0.5 + frame)
+    # only the array element missing from the active list is looked up, and only once
+    assert lookups[len(ACTIVE):] == ['cascadeSplits[1]']
+
+
+def test_unchanged_values_skipped(gl):
+    calls, _ = gl
+    program = make_program()
+    model = glm.translate(glm.mat4(1.0), glm.vec3(1, 2, 3))
+    for _ in range(4):
+        program.set_mat4('model', model)
+        program.set_vec3('lightPos', glm.vec3(1, 2, 3))
+        program.set_int('shadowMap', 2)
+    assert [c[0] for c in calls] == ['glUniformMatrix4fv', 'glUniform3f', 'glUniform1i']
+    assert (program.uploads, program.skipped) == (3, 9)
+
+    program.set_vec3('lightPos', (1, 2, 4))
+    program.set_mat4('model', np.asarray(model))  # same matrix from numpy: still skipped
+    assert calls[-1] == ('glUniform3f', 1, 1.0, 2.0, 4.0)
+    assert (program.uploads, program.skipped) == (4, 10)
+
+
+def test_mat4_uploaded_column_major(gl):
+    calls, _ = gl
+    program = make_program()
+    program.set_mat4('model', glm.translate(glm.mat4(1.0), glm.vec3(5, 6, 7)))
+    name, loc, count, transpose, data = calls[0]
+    assert (name, loc, count, transpose) == ('glUniformMatrix4fv', 0, 1, shaderProgram.GL_FALSE)
+    np.testing.assert_array_equal(data.ravel()[12:15], [5, 6, 7])
+
+
+def test_missing_uniform_warns_once(gl, capsys):
+    calls, lookups = gl
+    program = make_program()
+    for _ in range(3):
+        program.set_float('fogDensity', 0.1)
+    assert calls == []
+    assert lookups.count('fogDensity') == 1
+    assert capsys.readouterr().out.count("uniform 'fogDensity' not found") == 1
+    assert (program.uploads, program.skipped) == (0, 0)
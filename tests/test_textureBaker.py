@@ -0,0 +1,225 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import textureBaker
+from textureBaker import BakedTexture, bake, build_mip_chain, compress, open_baked
+from textureManager import DecodedImage, decode_image
+
+
+# --- reference decoders (the GPU's side of the formats)
+
+def decode_bc1(block):
+    c0, c1 = (int.from_bytes(block[i:i + 2], 'little') for i in (0, 2))
+    bits = int.from_bytes(block[4:8], 'little')
+
+    def rgb(v):
+        r, g, b = v >> 11, (v >> 5) & 63, v & 31
+        return np.array([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)])
+    e0, e1 = rgb(c0), rgb(c1)
+    palette = [e0, e1, (2 * e0 + e1) // 3, (e0 + 2 * e1) // 3] if c0 > c1 else [e0, e1, (e0 + e1) // 2, 0 * e0]
+    return np.array([palette[(bits >> 2 * i) & 3] for i in range(16)])
+
+
+def decode_bc4(block):
+    a0, a1 = int(block[0]), int(block[1])
+    bits = int.from_bytes(block[2:8], 'little')
+    if a0 > a1:
+        palette = [a0, a1] + [((7 - c) * a0 + c * a1) // 7 for c in range(1, 7)]
+    else:
+        palette = [a0, a1] + [((5 - c) * a0 + c * a1) // 5 for c in range(1, 5)] + [0, 255]
+    return np.array([palette[(bits >> 3 * i) & 7] for i in range(16)])
+
+
+def decode(data, fmt, width, height):
+    """Compressed level -> (height, width, channels) int array."""
+    block_bytes = 8 if fmt == 'bc1' else 16
+    blocks = np.frombuffer(bytes(data), np.uint8).reshape(-1, block_bytes)
+    texels = []
+    for b in blocks:
+        if fmt == 'bc1':
+            texels.append(decode_bc1(b))
+        elif fmt == 'bc3':
+            texels.append(np.concatenate((decode_bc1(b[8:]), decode_bc4(b[:8])[:, None]), axis=1))
+        else:
+            texels.append(np.stack((decode_bc4(b[:8]), decode_bc4(b[8:])), axis=1))
+    bw, bh = -(-width // 4), -(-height // 4)
+    texels = np.array(texels).reshape(bh, bw, 4, 4, -1).transpose(0, 2, 1, 3, 4)
+    return texels.reshape(bh * 4, bw * 4, -1)[:height, :width]
+
+
+def gradient(width, height, alpha=True):
+    """Smooth RGBA test image: channels ramp in different directions."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float64)
+    rgba = np.stack((x / max(width - 1, 1), y / max(height - 1, 1), (x + y) / max(width + height - 2, 1),
+                     0.5 + 0.5 * np.sin(x / 3.0) if alpha else np.ones_like(x)), axis=-1)
+    return np.round(rgba * 255).astype(np.uint8)
+
+
+# --- block compression
+
+@pytest.mark.parametrize("fmt, channels, block_bytes, max_error, mean_error", [
+    ('bc1', slice(0, 3), 8, 20, 6.0),
+    ('bc3', slice(0, 4), 16, 20, 6.0),
+    ('bc5', slice(0, 2), 16, 8, 2.0),
+])
+def test_block_formats_within_error_bounds(fmt, channels, block_bytes, max_error, mean_error):
+    img = gradient(32, 24)
+    data = compress(img, fmt)
+    assert len(data) == 8 * 6 * block_bytes
+    error = np.abs(decode(data, fmt, 32, 24) - img[..., channels].astype(int))
+    assert error.max() <= max_error
+    assert error.mean() <= mean_error
+
+
+def test_flat_and_two_colour_blocks_are_exact():
+    img = np.zeros((4, 8, 4), np.uint8)
+    img[:, :4] = (255, 0, 255, 255)  # every channel at an end of its 5/6-bit range
+    img[:, 4:, :3] = np.where(np.indices((4, 4))[1][..., None] % 2, 255, 0)  # black/white stripes
+    img[:, 4:, 3] = np.where(np.indices((4, 4))[0] % 2, 255, 0)
+    decoded = decode(compress(img, 'bc3'), 'bc3', 8, 4)
+    np.testing.assert_array_equal(decoded, img)
+    # equal endpoints keep 4-colour mode (c0 > c1 fails): every index must be 0
+    flat = compress(np.full((4, 4, 4), 255, np.uint8), 'bc1')
+    assert flat[4:] == b'\0\0\0\0'
+
+
+def test_partial_blocks_are_edge_padded():
+    img = gradient(6, 5)
+    data = compress(img, 'bc5')
+    assert len(data) == 4 * 16
+    # a steep ramp: within half a step of the 8-value palette
+    assert np.abs(decode(data, 'bc5', 6, 5) - img[..., :2].astype(int)).max() <= 255 // 14
+
+
+def test_unknown_block_format_raises():
+    with pytest.raises(ValueError):
+        compress(gradient(4, 4), 'bc7')
+
+
+# --- mip chains
+
+def test_box_chain_averages_pairs():
+    img = np.arange(16, dtype=np.uint8).reshape(4, 4, 1) * 10
+    levels = build_mip_chain(img)
+    assert [lvl.shape for lvl in levels] == [(4, 4, 1), (2, 2, 1), (1, 1, 1)]
+    np.testing.assert_array_equal(levels[1][..., 0], [[25, 45], [105, 125]])
+    assert levels[2][0, 0, 0] == 75
+
+
+def test_chain_down_to_one_texel_for_any_size():
+    for shape in ((16, 8), (5, 3), (1, 7)):
+        levels = build_mip_chain(np.zeros(shape + (4,), np.uint8))
+        assert levels[-1].shape[:2] == (1, 1)
+        for a, b in zip(levels, levels[1:]):
+            assert b.shape[:2] == (max(a.shape[0] // 2, 1), max(a.shape[1] // 2, 1))
+    assert len(build_mip_chain(np.zeros((16, 8, 4), np.uint8))) == 5
+
+
+@pytest.mark.parametrize("filter", ['box', 'kaiser'])
+def test_filters_keep_flat_images_and_the_mean(filter):
+    flat = np.full((16, 16, 4), 77, np.uint8)
+    assert all(np.all(lvl == 77) for lvl in build_mip_chain(flat, filter))
+    img = gradient(32, 32)
+    levels = build_mip_chain(img, filter)
+    # the average brightness survives the whole chain
+    for lvl in levels:
+        assert np.abs(lvl.reshape(-1, 4).mean(axis=0) - img.reshape(-1, 4).mean(axis=0)).max() < 4.0
+
+
+def stripes(period):
+    row = 127.5 + 127.5 * np.sin(2 * np.pi * np.arange(64) / period)
+    return np.repeat(np.repeat(row[None, :, None], 8, axis=0), 4, axis=2).round().astype(np.uint8)
+
+
+def test_kaiser_aliases_less_and_keeps_the_pass_band():
+    def amplitude(img, filter):
+        return build_mip_chain(img, filter)[1][..., 0].astype(float).std()
+    # above the new Nyquist limit, what survives is aliasing
+    for period in (2.3, 2.6, 3.0):
+        assert amplitude(stripes(period), 'kaiser') < 0.5 * amplitude(stripes(period), 'box')
+    # low frequencies pass at least as well as with the box filter
+    assert amplitude(stripes(16), 'kaiser') >= amplitude(stripes(16), 'box')
+
+
+def test_normal_map_levels_stay_unit_length():
+    y, x = np.mgrid[0:16, 0:16] / 15.0
+    n = np.stack((np.sin(x * 3), np.cos(y * 2), np.ones_like(x)), axis=-1)
+    n /= np.linalg.norm(n, axis=-1, keepdims=True)
+    img = np.concatenate((np.round((n + 1) * 127.5), np.full((16, 16, 1), 255)), axis=-1).astype(np.uint8)
+    for lvl in build_mip_chain(img, normal_map=True)[1:]:
+        length = np.linalg.norm(lvl[..., :3] / 127.5 - 1.0, axis=-1)
+        assert np.abs(length - 1.0).max() < 0.02
+
+
+# --- container
+
+def write_png(path, img):
+    Image.fromarray(img, 'RGBA').save(path)
+
+
+@pytest.mark.parametrize("fmt, compressed, alpha, expected", [
+    ('auto', False, False, 'rgb8'),
+    ('auto', False, True, 'rgba8'),
+    ('auto', True, False, 'bc1'),
+    ('auto', True, True, 'bc3'),
+    ('bc5', True, True, 'bc5'),
+])
+def test_bake_round_trip(tmp_path, fmt, compressed, alpha, expected):
+    img = gradient(20, 12, alpha)
+    src = tmp_path / "wall.png"
+    write_png(src, img)
+    baked = open_baked(bake(str(src), fmt=fmt, compressed=compressed))
+    assert isinstance(baked, BakedTexture)
+    assert (baked.format, baked.width, baked.height) == (expected, 20, 12)
+    assert [(lvl.width, lvl.height) for lvl in baked.levels] == [(20, 12), (10, 6), (5, 3), (2, 1), (1, 1)]
+    assert all(isinstance(lvl.data, np.memmap) for lvl in baked.levels)
+    assert baked.gpu_bytes(True) == baked.nbytes == sum(lvl.data.nbytes for lvl in baked.levels)
+    chain = build_mip_chain(img, normal_map=expected == 'bc5')
+    for lvl, reference in zip(baked.levels, chain):
+        if baked.compressed:
+            # the error bounds of each format are checked above; here the stored blocks must be the encoder's
+            assert bytes(lvl.data) == compress(reference, baked.format)
+        else:
+            stored = np.asarray(lvl.data).reshape(lvl.height, lvl.width, baked.channels)
+            np.testing.assert_array_equal(stored, reference[..., :baked.channels])
+    assert [f for f in os.listdir(tmp_path) if f.endswith('.tmp')] == []
+
+
+def test_normal_maps_pick_bc5(tmp_path):
+    src = tmp_path / "brick_normal.png"
+    write_png(src, gradient(8, 8))
+    assert open_baked(bake(str(src), compressed=True)).format == 'bc5'
+
+
+def test_open_baked_rejects_other_files(tmp_path):
+    path = tmp_path / "bad.mtex"
+    path.write_bytes(b'NOPE' + bytes(64))
+    with pytest.raises(ValueError):
+        open_baked(str(path))
+    src = tmp_path / "a.png"
+    write_png(src, gradient(4, 4))
+    baked = bake(str(src))
+    data = bytearray(open(baked, 'rb').read())
+    data[4:8] = (textureBaker.VERSION + 1).to_bytes(4, 'little')
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        open_baked(str(path))
+
+
+def test_decode_image_prefers_a_fresh_baked_sibling(tmp_path):
+    src = tmp_path / "wood.png"
+    img = gradient(8, 8)
+    write_png(src, img)
+    decoded = decode_image(str(src))
+    assert isinstance(decoded, DecodedImage)
+    np.testing.assert_array_equal(decoded.data, img)
+
+    baked = bake(str(src), compressed=True)
+    assert isinstance(decode_image(str(src)), BakedTexture)
+    # a source edited after the bake wins again
+    stamp = os.path.getmtime(baked)
+    os.utime(src, (stamp + 10, stamp + 10))
+    assert isinstance(decode_image(str(src)), DecodedImage)
@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+from textureManager import DecodedImage, SamplerSettings, TextureManager
+
+
+class StubUploader:
+    def __init__(self):
+        self.next_id = 1
+        self.live = {}
+        self.deleted = []
+
+    def upload(self, image, sampler):
+        texture, self.next_id = self.next_id, self.next_id + 1
+        self.live[texture] = sampler
+        return texture
+
+    def delete(self, texture):
+        del self.live[texture]
+        self.deleted.append(texture)
+
+
+def image(side):
+    return DecodedImage(side, side, np.zeros((side, side, 4), np.uint8))
+
+
+def make_manager(budget_bytes=1 << 30, sizes=None):
+    """Paths decode to 16x16 images (1 KiB, 1364 B with mipmaps) unless `sizes` says otherwise."""
+    decoded = []
+
+    def decoder(path):
+        decoded.append(path)
+        return image((sizes or {}).get(path, 16))
+    manager = TextureManager(StubUploader(), budget_bytes, decoder)
+    return manager, decoded
+
+
+MIP_BYTES = 16 * 16 * 4 * 4 // 3
+
+
+def test_shared_and_reference_counted():
+    manager, decoded = make_manager()
+    a = manager.acquire('a.png')
+    assert manager.acquire('./a.png') == a  # the same file under another spelling
+    b = manager.acquire('b.png')
+    assert a != b and decoded == ['a.png', 'b.png']
+    assert manager.entries[manager.key('a.png')].refs == 2
+    assert (manager.hits, manager.misses) == (1, 2)
+
+    manager.release(a)
+    assert manager.entries[manager.key('a.png')].refs == 1
+    manager.release(a)
+    manager.release(a)  # extra releases do not go negative
+    assert manager.entries[manager.key('a.png')].refs == 0
+    assert manager.retain(b) == b and manager.entries[manager.key('b.png')].refs == 2
+    manager.release(12345)  # unknown ids are ignored
+    # released textures stay resident while the budget allows
+    assert manager.contains('a.png') and manager.evictions == 0
+
+
+def test_preloaded_image_skips_the_decoder():
+    manager, decoded = make_manager()
+    manager.acquire('a.png', image=image(32))
+    assert decoded == []
+    assert manager.resident_bytes == manager.uploaded_bytes == 32 * 32 * 4 * 4 // 3
+
+
+def test_lru_eviction_down_to_budget():
+    manager, _ = make_manager(budget_bytes=3 * MIP_BYTES)
+    ids = {path: manager.acquire(path) for path in 'abc'}
+    for path in 'abc':
+        manager.release(ids[path])
+    assert manager.resident_bytes == 3 * MIP_BYTES and manager.evictions == 0
+
+    manager.acquire('a')  # a is now the most recently used
+    manager.release(ids['a'])
+    manager.acquire('d')
+    assert not manager.contains('b')  # least recently used goes first
+    assert all(manager.contains(p) for p in 'acd')
+    assert manager.uploader.deleted == [ids['b']]
+    assert manager.resident_bytes == 3 * MIP_BYTES
+    assert (manager.hits, manager.misses, manager.evictions) == (1, 4, 1)
+
+    # a big texture pushes out every released one; d and big are in use and stay over budget
+    manager.acquire('big', image=image(32))
+    assert manager.resident_bytes == MIP_BYTES + 32 * 32 * 4 * 4 // 3 > manager.budget_bytes
+    assert sorted(manager.entries) == sorted([manager.key('d'), manager.key('big')])
+    assert manager.evictions == 3
+    assert set(manager.uploader.live) == set(manager.by_id) == {e.texture_id for e in manager.entries.values()}
+
+
+def test_referenced_textures_are_never_evicted():
+    manager, _ = make_manager(budget_bytes=MIP_BYTES)
+    ids = [manager.acquire(path) for path in 'abc']
+    # over budget, but every texture is in use
+    assert manager.resident_bytes == 3 * MIP_BYTES and manager.evictions == 0
+    manager.release(ids[1])
+    assert not manager.contains('b') and manager.contains('a') and manager.contains('c')
+    assert manager.resident_bytes == 2 * MIP_BYTES
+    # the first release of a shared texture keeps it
+    manager.retain(ids[0])
+    manager.release(ids[0])
+    assert manager.contains('a')
+    manager.release(ids[0])
+    assert not manager.contains('a')
+    assert manager.evictions == 2
+
+
+def test_separate_entries_per_sampler():
+    manager, decoded = make_manager()
+    repeat = manager.acquire('a.png')
+    clamp = SamplerSettings(wrap=0x812F, mipmaps=False)  # GL_CLAMP_TO_EDGE
+    clamped = manager.acquire('a.png', clamp)
+    assert clamped != repeat and decoded == ['a.png', 'a.png']
+    assert manager.uploader.live[clamped] == clamp
+    assert manager.acquire('a.png', SamplerSettings(wrap=0x812F, mipmaps=False)) == clamped
+    assert manager.contains('a.png', clamp) and not manager.contains('b.png', clamp)
+    # no mip chain: level 0 only
+    assert manager.resident_bytes == MIP_BYTES + 16 * 16 * 4
+
+
+def test_report_counts():
+    manager, _ = make_manager(budget_bytes=0)
+    manager.release(manager.acquire('a'))
+    manager.acquire('a')
+    assert manager.report() == "Textures: 1 resident (0.0 MB) | hits 0 | misses 2 | evictions 1"
+
+
+def test_retain_unknown_id_raises():
+    manager, _ = make_manager()
+    with pytest.raises(KeyError):
+        manager.retain(7)
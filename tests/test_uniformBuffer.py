@@ -0,0 +1,102 @@
+import os
+import re
+import struct
+
+import glm
+import numpy as np
+import pytest
+
+import shaderProgram
+import uniformBuffer
+from shaderProgram import ShaderProgram
+from uniformBuffer import FRAME_BLOCK, FRAME_LAYOUT, UniformBuffer, std140_layout
+
+SHADERS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shaders')
+
+
+def test_frame_layout_offsets():
+    offsets = {name: (f.offset, f.stride, f.count) for name, f in FRAME_LAYOUT.fields.items()}
+    assert offsets == {
+        'view': (0, 64, 1),
+        'projection': (64, 64, 1),
+        'lightSpaceMatrices': (128, 64, 4),
+        'cascadeSplits': (384, 16, 1),
+        'lightPos': (400, 12, 1),
+        'viewPos': (416, 12, 1),
+        'cascadeCount': (428, 4, 1),
+    }
+    assert FRAME_LAYOUT.size == 432
+
+
+@pytest.mark.parametrize('shader', ['vertex_shader.glsl', 'fragment_shader.glsl', 'depth_vertex.glsl'])
+def test_shader_blocks_match_layout(shader):
+    with open(os.path.join(SHADERS, shader)) as f:
+        source = f.read()
+    body = re.search(r'uniform\s+%s\s*\{(.*?)\};' % FRAME_BLOCK, source, re.S).group(1)
+    declared = re.findall(r'^\s*(\w+)\s+(\w+)(\[\d+\])?;', body, re.M)
+    assert [(name, type + size) for type, name, size in declared] == [
+        (name, f.type if f.count == 1 else f'{f.type}[{f.count}]') for name, f in FRAME_LAYOUT.fields.items()]
+
+
+def test_mat4_written_column_major(monkeypatch):
+    # translation plus a shear: not symmetric, so a transposed write would show
+    mat = glm.translate(glm.mat4(1.0), glm.vec3(5, 6, 7))
+    mat[1][0] = 2.0  # column 1, row 0
+    buf = np.zeros(FRAME_LAYOUT.size, dtype=np.uint8)
+    FRAME_LAYOUT.write(buf, 'view', mat)
+    columns = [[1, 0, 0, 0], [2, 1, 0, 0], [0, 0, 1, 0], [5, 6, 7, 1]]
+    assert buf[:64].tobytes() == struct.pack('<16f', *sum(columns, []))
+
+    # numpy input is [row, column]: the same matrix gives the same bytes
+    again = np.zeros_like(buf)
+    FRAME_LAYOUT.write(again, 'view', np.asarray(mat))
+    assert again.tobytes() == buf.tobytes()
+
+    # ShaderProgram.set_mat4 hands GL the same column-major bytes
+    program = ShaderProgram.__new__(ShaderProgram)
+    program.locations, program.values, program.uploads = {'view': 0}, {}, 0
+    uploaded = []
+    monkeypatch.setattr(shaderProgram, 'glUniformMatrix4fv', lambda loc, n, transpose, data: uploaded.append(data))
+    program.set_mat4('view', mat)
+    assert uploaded[0].tobytes() == buf[:64].tobytes()
+
+
+def test_array_and_scalar_writes():
+    buf = np.zeros(FRAME_LAYOUT.size, dtype=np.uint8)
+    matrices = [glm.translate(glm.mat4(1.0), glm.vec3(i, 0, 0)) for i in range(4)]
+    FRAME_LAYOUT.write(buf, 'lightSpaceMatrices', np.stack([np.asarray(m) for m in matrices]))
+    FRAME_LAYOUT.write(buf, 'lightPos', glm.vec3(1, 2, 3))
+    FRAME_LAYOUT.write(buf, 'viewPos', (4, 5, 6))
+    FRAME_LAYOUT.write(buf, 'cascadeCount', 3)
+    for i in range(4):
+        assert struct.unpack_from('<f', buf, 128 + 64 * i + 48)[0] == i
+    assert struct.unpack_from('<3f', buf, 400) == (1, 2, 3)
+    assert struct.unpack_from('<3f', buf, 416) == (4, 5, 6)
+    assert struct.unpack_from('<i', buf, 428)[0] == 3
+
+
+def test_std140_alignment_rules():
+    layout = std140_layout([('a', 'float'), ('b', 'vec2'), ('c', 'vec3'), ('d', 'float'),
+                            ('e', 'float[2]'), ('f', 'vec3')])
+    assert {name: f.offset for name, f in layout.fields.items()} == {
+        'a': 0, 'b': 8, 'c': 16, 'd': 28, 'e': 32, 'f': 64}
+    assert layout.fields['e'].stride == 16
+    assert layout.size == 80
+
+
+def test_upload_skipped_when_unchanged(monkeypatch):
+    uploads = []
+    for name in ('glBindBuffer', 'glBufferData', 'glBindBufferBase', 'glDeleteBuffers'):
+        monkeypatch.setattr(uniformBuffer, name, lambda *args: None)
+    monkeypatch.setattr(uniformBuffer, 'glGenBuffers', lambda n: 1)
+    monkeypatch.setattr(uniformBuffer, 'glBufferSubData', lambda *args: uploads.append(args[3].tobytes()))
+
+    frame = UniformBuffer(FRAME_LAYOUT, 0)
+    frame['cascadeCount'] = 2
+    frame.upload()
+    frame['cascadeCount'] = 2
+    frame.upload()
+    frame['viewPos'] = (0, 1, 0)
+    frame.upload()
+    assert len(uploads) == 2
+    assert (frame.uploads, frame.skipped, frame.uploaded_bytes) == (2, 1, 2 * 432)
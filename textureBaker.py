@@ -0,0 +1,271 @@
+"""Offline texture baker: full mip chains, optional CPU block compression, memory-mappable container.
+
+    python textureBaker.py textures/*.png --filter kaiser --compress
+"""
+import argparse
+import glob
+import os
+import struct
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+MAGIC = b'MTEX'
+VERSION = 1
+ALIGN = 16
+HEADER = struct.Struct('<4sIIIII')   # magic, version, format, width, height, levels
+LEVEL = struct.Struct('<QQII')        # offset, size, width, height
+
+# format code -> (name, channels kept, bytes per 4x4 block or 0 for uncompressed)
+FORMATS = {
+    1: ('rgba8', 4, 0),
+    2: ('rgb8', 3, 0),
+    3: ('bc1', 3, 8),
+    4: ('bc3', 4, 16),
+    5: ('bc5', 2, 16),
+}
+FORMAT_CODES = {name: code for code, (name, _, _) in FORMATS.items()}
+
+
+# --- Mip chain ---
+def _box_axis(img, axis):
+    n = img.shape[axis]
+    if n == 1:
+        return img
+    even = np.take(img, np.arange(n // 2 * 2), axis=axis)
+    a = np.take(even, np.arange(0, even.shape[axis], 2), axis=axis)
+    b = np.take(even, np.arange(1, even.shape[axis], 2), axis=axis)
+    return (a + b) * 0.5
+
+
+def _kaiser_taps(size=8, beta=4.0):
+    x = np.arange(size) - (size - 1) / 2.0
+    w = np.sinc(x / 2.0) * np.kaiser(size, beta)
+    return (w / w.sum()).astype(np.float32)
+
+
+KAISER_TAPS = _kaiser_taps()
+
+
+def _kaiser_axis(img, axis):
+    n = img.shape[axis]
+    if n == 1:
+        return img
+    half = len(KAISER_TAPS) // 2
+    pad = [(0, 0)] * img.ndim
+    pad[axis] = (half - 1, half)
+    padded = np.pad(img, pad, mode='edge')
+    out_n = n // 2
+    out = np.zeros(img.shape[:axis] + (out_n,) + img.shape[axis + 1:], dtype=np.float32)
+    for k, w in enumerate(KAISER_TAPS):
+        out += w * np.take(padded, np.arange(out_n) * 2 + k, axis=axis)
+    return out
+
+
+def build_mip_chain(img: np.ndarray, filter: str = 'box', normal_map: bool = False) -> List[np.ndarray]:
+    """(H, W, C) uint8 image -> list of uint8 levels down to 1x1."""
+    down = _kaiser_axis if filter == 'kaiser' else _box_axis
+    level = img.astype(np.float32)
+    levels = [img]
+    while level.shape[0] > 1 or level.shape[1] > 1:
+        level = down(down(level, 0), 1)
+        if normal_map:
+            n = level[..., :3] / 127.5 - 1.0
+            n /= np.maximum(np.linalg.norm(n, axis=-1, keepdims=True), 1e-6)
+            level = level.copy()
+            level[..., :3] = (n + 1.0) * 127.5
+        levels.append(np.clip(np.round(level), 0, 255).astype(np.uint8))
+    return levels
+
+
+# --- Block compression (BC1 / BC3 / BC5), vectorized over 4x4 blocks ---
+def _blocks(img: np.ndarray) -> np.ndarray:
+    """(H, W, C) -> (blocks, 16, C), edge-padded to a multiple of 4, row-major blocks and texels."""
+    h, w, c = img.shape
+    padded = np.pad(img, ((0, -h % 4), (0, -w % 4), (0, 0)), mode='edge')
+    bh, bw = padded.shape[0] // 4, padded.shape[1] // 4
+    return padded.reshape(bh, 4, bw, 4, c).transpose(0, 2, 1, 3, 4).reshape(bh * bw, 16, c)
+
+
+def _encode_bc1_colors(rgb: np.ndarray) -> np.ndarray:
+    """(n, 16, 3) uint8 -> (n, 8) uint8 BC1 blocks, bounding-box endpoints, 4-colour mode."""
+    px = rgb.astype(np.int32)
+    hi, lo = px.max(axis=1), px.min(axis=1)
+
+    def to565(c):
+        r = (c[:, 0] * 31 + 127) // 255
+        g = (c[:, 1] * 63 + 127) // 255
+        b = (c[:, 2] * 31 + 127) // 255
+        return (r << 11) | (g << 5) | b
+
+    def from565(v):
+        r, g, b = (v >> 11) & 31, (v >> 5) & 63, v & 31
+        return np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=1)
+
+    c0, c1 = to565(hi), to565(lo)
+    swap = c0 < c1
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+    e0, e1 = from565(c0), from565(c1)
+    palette = np.stack((e0, e1, (2 * e0 + e1) // 3, (e0 + 2 * e1) // 3), axis=1)  # (n, 4, 3)
+    dist = ((px[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=-1)
+    idx = np.argmin(dist, axis=-1).astype(np.uint32)
+    idx[c0 == c1] = 0  # equal endpoints would select 3-colour mode
+    bits = (idx << (2 * np.arange(16, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+
+    out = np.empty((len(px), 8), dtype=np.uint8)
+    out[:, 0:2] = c0.astype('<u2').view(np.uint8).reshape(-1, 2)
+    out[:, 2:4] = c1.astype('<u2').view(np.uint8).reshape(-1, 2)
+    out[:, 4:8] = bits.astype('<u4').view(np.uint8).reshape(-1, 4)
+    return out
+
+
+def _encode_bc4(values: np.ndarray) -> np.ndarray:
+    """(n, 16) uint8 single channel -> (n, 8) uint8 BC4 blocks in 8-value mode."""
+    v = values.astype(np.int32)
+    a0, a1 = v.max(axis=1), v.min(axis=1)
+    # codes: 0 -> a0, 1 -> a1, 2..7 -> ((8-c)*a0 + (c-1)*a1) / 7
+    weights0 = np.array([7, 0, 6, 5, 4, 3, 2, 1])
+    palette = (weights0[None, :] * a0[:, None] + (7 - weights0)[None, :] * a1[:, None]) // 7
+    idx = np.argmin(np.abs(v[:, :, None] - palette[:, None, :]), axis=-1).astype(np.uint64)
+    idx[a0 == a1] = 0
+    bits = (idx << (3 * np.arange(16, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+
+    out = np.empty((len(v), 8), dtype=np.uint8)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    out[:, 2:8] = bits.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :6]
+    return out
+
+
+def compress(img: np.ndarray, fmt: str, chunk: int = 1 << 15) -> bytes:
+    blocks = _blocks(img)
+    parts = []
+    for s in range(0, len(blocks), chunk):
+        b = blocks[s:s + chunk]
+        if fmt == 'bc1':
+            parts.append(_encode_bc1_colors(b[..., :3]))
+        elif fmt == 'bc3':
+            parts.append(np.hstack((_encode_bc4(b[..., 3]), _encode_bc1_colors(b[..., :3]))))
+        elif fmt == 'bc5':
+            parts.append(np.hstack((_encode_bc4(b[..., 0]), _encode_bc4(b[..., 1]))))
+        else:
+            raise ValueError(f"Unknown block format: {fmt}")
+    return np.concatenate(parts).tobytes()
+
+
+# --- Container ---
+def choose_format(img: np.ndarray, path: str, compressed: bool) -> str:
+    opaque = img.shape[2] < 4 or bool(np.all(img[..., 3] == 255))
+    if not compressed:
+        return 'rgb8' if opaque else 'rgba8'
+    if 'normal' in os.path.basename(path).lower():
+        return 'bc5'
+    return 'bc1' if opaque else 'bc3'
+
+
+def bake(src: str, dst: str = None, fmt: str = 'auto', filter: str = 'box', compressed: bool = False) -> str:
+    dst = dst or os.path.splitext(src)[0] + '.mtex'
+    with Image.open(src) as im:
+        img = np.asarray(im.convert('RGBA'), dtype=np.uint8)
+    if fmt == 'auto':
+        fmt = choose_format(img, src, compressed)
+    code = FORMAT_CODES[fmt]
+    _, channels, block_bytes = FORMATS[code]
+    levels = build_mip_chain(img, filter, normal_map=(fmt == 'bc5'))
+
+    payloads = [compress(lvl, fmt) if block_bytes else np.ascontiguousarray(lvl[..., :channels]).tobytes()
+                for lvl in levels]
+    table_end = HEADER.size + LEVEL.size * len(levels)
+    offset = -(-table_end // ALIGN) * ALIGN
+    table = []
+    for lvl, data in zip(levels, payloads):
+        table.append((offset, len(data), lvl.shape[1], lvl.shape[0]))
+        offset = -(-(offset + len(data)) // ALIGN) * ALIGN
+
+    tmp = dst + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, code, img.shape[1], img.shape[0], len(levels)))
+        for entry in table:
+            f.write(LEVEL.pack(*entry))
+        for (off, _, _, _), data in zip(table, payloads):
+            f.seek(off)
+            f.write(data)
+    os.replace(tmp, dst)
+    return dst
+
+
+@dataclass
+class BakedLevel:
+    width: int
+    height: int
+    data: np.ndarray  # uint8 view into the mapped file
+
+
+@dataclass
+class BakedTexture:
+    format: str
+    width: int
+    height: int
+    levels: List[BakedLevel]
+
+    @property
+    def compressed(self) -> bool:
+        return FORMATS[FORMAT_CODES[self.format]][2] > 0
+
+    @property
+    def channels(self) -> int:
+        return FORMATS[FORMAT_CODES[self.format]][1]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.data.nbytes for level in self.levels)
+
+    def gpu_bytes(self, mipmaps: bool) -> int:
+        return self.nbytes
+
+
+def open_baked(path: str) -> BakedTexture:
+    """Memory-map a baked texture; level data is only read when it is uploaded."""
+    mm = np.memmap(path, dtype=np.uint8, mode='r')
+    magic, version, code, width, height, count = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != VERSION or code not in FORMATS:
+        raise ValueError(f"Not a baked texture (or wrong version): {path}")
+    levels = []
+    for i in range(count):
+        offset, size, w, h = LEVEL.unpack_from(mm, HEADER.size + i * LEVEL.size)
+        levels.append(BakedLevel(w, h, mm[offset:offset + size]))
+    return BakedTexture(FORMATS[code][0], width, height, levels)
+
+
+def find_baked(path: str):
+    """The baked sibling of `path` (same name, .mtex) if it exists and is not older than the source."""
+    baked = os.path.splitext(path)[0] + '.mtex'
+    try:
+        if os.path.getmtime(baked) >= os.path.getmtime(path):
+            return baked
+    except OSError:
+        pass
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake textures into mip-mapped .mtex containers")
+    parser.add_argument('inputs', nargs='+', help="image files or glob patterns")
+    parser.add_argument('--format', default='auto', choices=['auto'] + list(FORMAT_CODES))
+    parser.add_argument('--filter', default='box', choices=['box', 'kaiser'])
+    parser.add_argument('--compress', action='store_true',
+                        help="auto format picks BC1/BC3, or BC5 for *normal* maps")
+    args = parser.parse_args()
+
+    paths = [p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])]
+    for src in paths:
+        dst = bake(src, fmt=args.format, filter=args.filter, compressed=args.compress)
+        baked = open_baked(dst)
+        print(f"{src} -> {dst} [{baked.format}, {len(baked.levels)} levels, "
+              f"{os.path.getsize(src) // 1024} KB -> {os.path.getsize(dst) // 1024} KB]")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import (GL_COMPRESSED_RGB_S3TC_DXT1_EXT,
+                                                   GL_COMPRESSED_RGBA_S3TC_DXT5_EXT)
+
+from textureBaker import BakedTexture, find_baked, open_baked
+
+BAKED_INTERNAL_FORMATS = {
+    'rgba8': (GL_RGBA8, GL_RGBA),
+    'rgb8': (GL_RGB8, GL_RGB),
+    'bc1': GL_COMPRESSED_RGB_S3TC_DXT1_EXT,
+    'bc3': GL_COMPRESSED_RGBA_S3TC_DXT5_EXT,
+    'bc5': GL_COMPRESSED_RG_RGTC2,
+}
+
+
+@dataclass(frozen=True)
+class SamplerSettings:
+    min_filter: int = GL_LINEAR_MIPMAP_LINEAR
+    mag_filter: int = GL_LINEAR
+    wrap: int = GL_REPEAT
+    mipmaps: bool = True
+
+
+DEFAULT_SAMPLER = SamplerSettings()
+
+
+@dataclass
+class DecodedImage:
+    width: int
+    height: int
+    data: np.ndarray  # (height, width, 4) uint8 RGBA
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def gpu_bytes(self, mipmaps: bool) -> int:
+        # a full mip chain adds a third on top of level 0
+        return self.nbytes * 4 // 3 if mipmaps else self.nbytes
+
+
+def decode_image(path: str):
+    """Decode stage, no GL involved: a baked .mtex sibling is memory-mapped, anything else goes to Pillow."""
+    baked = find_baked(path)
+    if baked:
+        return open_baked(baked)
+    with Image.open(path) as img:
+        rgba = img.convert("RGBA")
+        return DecodedImage(rgba.width, rgba.height, np.asarray(rgba, dtype=np.uint8))
+
+
+class GLUploader:
+    """Creates/deletes GL textures; swap for a stub to run the manager without a context."""
+
+    def upload(self, image, sampler: SamplerSettings) -> int:
+        tex = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, tex)
+        if isinstance(image, BakedTexture):
+            self._upload_levels(image, sampler)
+        else:
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.width, image.height,
+                         0, GL_RGBA, GL_UNSIGNED_BYTE, image.data)
+            if sampler.mipmaps:
+                glGenerateMipmap(GL_TEXTURE_2D)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, sampler.min_filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, sampler.mag_filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, sampler.wrap)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, sampler.wrap)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        return tex
+
+    def _upload_levels(self, image: BakedTexture, sampler: SamplerSettings):
+        """Stream pre-baked mip levels straight from the mapped file."""
+        levels = image.levels if sampler.mipmaps else image.levels[:1]
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        for i, level in enumerate(levels):
+            if image.compressed:
+                glCompressedTexImage2D(GL_TEXTURE_2D, i, BAKED_INTERNAL_FORMATS[image.format],
+                                       level.width, level.height, 0, level.data.nbytes, level.data)
+            else:
+                internal, fmt = BAKED_INTERNAL_FORMATS[image.format]
+                glTexImage2D(GL_TEXTURE_2D, i, internal, level.width, level.height,
+                             0, fmt, GL_UNSIGNED_BYTE, level.data)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, 0)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+
+    def delete(self, tex: int):
+        glDeleteTextures([tex])
+
+
+class TextureEntry:
+    def __init__(self, texture_id, nbytes):
+        self.texture_id = texture_id
+        self.nbytes = nbytes
+        self.refs = 0
+
+
+class TextureManager:
+    """Process-wide texture cache keyed by (resolved path, sampler settings).
+
+    Textures are shared and reference counted; released textures stay resident until the
+    estimated VRAM use exceeds `budget_bytes`, then the least recently used ones are deleted.
+    """
+
+    def __init__(self, uploader=None, budget_bytes=512 * 2**20, decoder=decode_image):
+        self.uploader = uploader or GLUploader()
+        self.decoder = decoder
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()  # key -> TextureEntry, least recently used first
+        self.by_id = {}
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uploaded_bytes = 0
+
+    @staticmethod
+    def key(path: str, sampler: SamplerSettings = DEFAULT_SAMPLER):
+        return os.path.realpath(path), sampler
+
+    def contains(self, path: str, sampler: SamplerSettings = DEFAULT_SAMPLER) -> bool:
+        return self.key(path, sampler) in self.entries
+
+    def acquire(self, path: str, sampler: SamplerSettings = DEFAULT_SAMPLER, image: DecodedImage = None) -> int:
+        """Texture id for `path`; `image` skips the decode when it was done elsewhere (asset pipeline)."""
+        key = self.key(path, sampler)
+        entry = self.entries.get(key)
+        if entry:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        else:
+            self.misses += 1
+            if image is None:
+                image = self.decoder(path)
+            nbytes = image.gpu_bytes(sampler.mipmaps)
+            entry = TextureEntry(self.uploader.upload(image, sampler), nbytes)
+            self.entries[key] = entry
+            self.by_id[entry.texture_id] = key
+            self.resident_bytes += nbytes
+            self.uploaded_bytes += nbytes
+        entry.refs += 1
+        self.evict()
+        return entry.texture_id
+
+    def retain(self, texture_id: int) -> int:
+        """One more reference to a texture acquired before."""
+        key = self.by_id[texture_id]
+        self.entries[key].refs += 1
+        self.entries.move_to_end(key)
+        return texture_id
+
+    def release(self, texture_id: int):
+        key = self.by_id.get(texture_id)
+        if key is None:
+            return
+        entry = self.entries[key]
+        entry.refs = max(entry.refs - 1, 0)
+        self.evict()
+
+    def evict(self):
+        """Delete unreferenced textures, oldest first, until the budget is met."""
+        for key in list(self.entries):
+            if self.resident_bytes <= self.budget_bytes:
+                break
+            entry = self.entries[key]
+            if entry.refs:
+                continue
+            self.uploader.delete(entry.texture_id)
+            del self.entries[key]
+            del self.by_id[entry.texture_id]
+            self.resident_bytes -= entry.nbytes
+            self.evictions += 1
+
+    def report(self) -> str:
+        return (f"Textures: {len(self.entries)} resident ({self.resident_bytes / 2**20:.1f} MB)"
+                f" | hits {self.hits} | misses {self.misses} | evictions {self.evictions}")
+
+
+texture_manager = TextureManager()
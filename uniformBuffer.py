@@ -0,0 +1,117 @@
+import re
+from dataclasses import dataclass
+from typing import Dict
+
+import numpy as np
+from OpenGL.GL import *
+
+# std140 base alignment, size in bytes and component dtype of each supported type
+STD140_TYPES = {
+    'float': (4, 4, np.float32),
+    'int': (4, 4, np.int32),
+    'vec2': (8, 8, np.float32),
+    'vec3': (16, 12, np.float32),
+    'vec4': (16, 16, np.float32),
+    'mat4': (16, 64, np.float32),
+}
+
+
+def _round_up(value, align):
+    return -(-value // align) * align
+
+
+@dataclass
+class Std140Field:
+    type: str
+    offset: int
+    count: int   # 1 for non-arrays
+    stride: int  # bytes between array elements
+
+
+@dataclass
+class Std140Layout:
+    fields: Dict[str, Std140Field]
+    size: int
+
+    def write(self, buf: np.ndarray, name: str, value):
+        """Pack `value` into the uint8 block `buf`; glm types and (4, 4) [row, column] arrays accepted."""
+        field = self.fields[name]
+        _, nbytes, dtype = STD140_TYPES[field.type]
+        data = np.asarray(value, dtype=dtype)
+        if field.type == 'mat4':
+            # std140 matrices are column-major: one vec4 per column
+            data = np.swapaxes(data.reshape(-1, 4, 4), 1, 2)
+        data = np.ascontiguousarray(data).reshape(field.count, -1).view(np.uint8)
+        for i in range(field.count):
+            start = field.offset + i * field.stride
+            buf[start:start + nbytes] = data[i]
+
+
+def std140_layout(fields) -> Std140Layout:
+    """Offsets for a `layout(std140) uniform` block from [(name, 'type' or 'type[n]'), ...] in declaration order."""
+    offset = 0
+    out = {}
+    for name, decl in fields:
+        match = re.fullmatch(r'(\w+)(?:\[(\d+)\])?', decl)
+        type, count = match.group(1), match.group(2)
+        align, nbytes, _ = STD140_TYPES[type]
+        if count is None:
+            offset = _round_up(offset, align)
+            out[name] = Std140Field(type, offset, 1, nbytes)
+            offset += nbytes
+        else:
+            # array elements are aligned and padded to vec4
+            stride = _round_up(nbytes, 16)
+            offset = _round_up(offset, 16)
+            out[name] = Std140Field(type, offset, int(count), stride)
+            offset += stride * int(count)
+    return Std140Layout(out, _round_up(offset, 16))
+
+
+class UniformBuffer:
+    """One std140 uniform block in a GL buffer, filled on the CPU and uploaded at most once per change."""
+
+    def __init__(self, layout: Std140Layout, binding: int):
+        self.layout = layout
+        self.binding = binding
+        self.data = np.zeros(layout.size, dtype=np.uint8)
+        self.uploaded = None
+        self.uploads = 0
+        self.skipped = 0
+        self.uploaded_bytes = 0
+        self.ubo = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferData(GL_UNIFORM_BUFFER, layout.size, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, binding, self.ubo)
+
+    def __setitem__(self, name, value):
+        self.layout.write(self.data, name, value)
+
+    def upload(self):
+        if self.uploaded is not None and np.array_equal(self.data, self.uploaded):
+            self.skipped += 1
+            return
+        glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, self.layout.size, self.data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.uploaded = self.data.copy()
+        self.uploads += 1
+        self.uploaded_bytes += self.layout.size
+
+    def delete(self):
+        glDeleteBuffers(1, [self.ubo])
+
+
+# Per-frame camera/light data, declared identically as `FrameData` in the shaders
+FRAME_BLOCK = "FrameData"
+FRAME_BINDING = 0
+FRAME_LAYOUT = std140_layout([
+    ("view", "mat4"),
+    ("projection", "mat4"),
+    ("lightSpaceMatrices", "mat4[4]"),  # cascades.MAX_CASCADES
+    ("cascadeSplits", "vec4"),
+    ("lightPos", "vec3"),
+    ("viewPos", "vec3"),
+    ("cascadeCount", "int"),
+])